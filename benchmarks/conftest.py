@@ -0,0 +1,58 @@
+import pytest
+
+from .synthetic import write_synthetic_data
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("quail benchmarks")
+    group.addoption(
+        "--station-years",
+        default="10,150",
+        help="Comma-separated lengths in years of the synthetic stations",
+    )
+    group.addoption(
+        "--stations",
+        type=int,
+        default=10,
+        help="Number of synthetic stations given to the multi-file processes",
+    )
+    group.addoption(
+        "--grid-size",
+        type=int,
+        default=4,
+        help="Side of the synthetic grid given to climdex_gridded, in cells",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "years" in metafunc.fixturenames:
+        years = [
+            int(value)
+            for value in metafunc.config.getoption("station_years").split(",")
+        ]
+        metafunc.parametrize("years", years, ids=[f"{value}y" for value in years])
+
+
+@pytest.fixture(scope="session")
+def synthetic_data(request, tmp_path_factory):
+    """Returns a function that writes the synthetic data of a station length
+    on first use
+    """
+    written = {}
+
+    def data(years):
+        if years not in written:
+            written[years] = write_synthetic_data(
+                tmp_path_factory.mktemp(f"synthetic_{years}y"),
+                years,
+                request.config.getoption("stations"),
+                request.config.getoption("grid_size"),
+            )
+        return written[years]
+
+    return data
+
+
+@pytest.fixture
+def data(synthetic_data, years):
+    return synthetic_data(years)
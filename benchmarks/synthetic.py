@@ -0,0 +1,195 @@
+"""
+Synthetic station data for the benchmarks.
+
+Daily maximum and minimum temperature and precipitation are generated with
+NumPy from a seasonal cycle plus noise, with about 1% of days missing, so
+stations of any length can be benchmarked without downloading data. The
+series are written in each of the forms the processes take as input:
+climdexInput objects, data frames in an Rdata file, CSV files and a gridded
+NetCDF file.
+"""
+
+import csv
+import numpy as np
+from dataclasses import dataclass
+from netCDF4 import Dataset
+from rpy2 import robjects
+
+from quail.utils import save_rdata
+from quail.views import float_vector
+from quail.workers import init_worker
+
+
+START_YEAR = 1950
+MISSING_FRACTION = 0.01
+
+# CSV column of each variable, as in the test data of station 1018935
+COLUMNS = {"tmax": "MAX_TEMP", "tmin": "MIN_TEMP", "prec": "ONE_DAY_PRECIPITATION"}
+
+
+@dataclass
+class SyntheticData:
+    years: int
+    base_range: str
+    climdex_inputs: list
+    frames: str
+    frame_name: str
+    csv_files: dict
+    append_csv_files: dict
+    gridded: str
+
+
+def daily_series(years, start=START_YEAR, seed=0):
+    """Returns `years` years of synthetic daily data from `start`, as a
+    dictionary of the dates and of the "tmax", "tmin" and "prec" values
+    (with NaN for missing days)
+    """
+    rng = np.random.default_rng(seed)
+    dates = np.arange(
+        np.datetime64(f"{start}-01-01"), np.datetime64(f"{start + years}-01-01")
+    )
+    n = len(dates)
+    jday = (dates - dates.astype("datetime64[Y]")).astype(int) + 1
+
+    season = np.cos(2 * np.pi * (jday - 200) / 365.25)
+    tmax = 12 + 10 * season + rng.normal(0, 3, n)
+    tmin = tmax - 8 - rng.gamma(2, 1, n)
+    prec = np.where(rng.random(n) < 0.35, rng.gamma(0.8, 8, n), 0.0)
+
+    series = {"dates": dates, "tmax": tmax, "tmin": tmin, "prec": prec}
+    for var in COLUMNS:
+        series[var][rng.random(n) < MISSING_FRACTION] = np.nan
+    return series
+
+
+def year_jday(dates):
+    years = dates.astype("datetime64[Y]")
+    return years.astype(int) + 1970, (dates - years).astype(int) + 1
+
+
+def save_climdex_input(path, series, base_range):
+    """Builds a climdexInput from `series` and saves it to `path` as "ci" """
+    dates = robjects.r["as.PCICt"](
+        robjects.StrVector(series["dates"].astype(str)), cal="gregorian"
+    )
+    ci = robjects.r["climdexInput.raw"](
+        tmax=float_vector(series["tmax"]),
+        tmin=float_vector(series["tmin"]),
+        prec=float_vector(series["prec"]),
+        **{
+            "tmax.dates": dates,
+            "tmin.dates": dates,
+            "prec.dates": dates,
+            "base.range": robjects.IntVector(base_range),
+        },
+    )
+    save_rdata("ci", ci, path)
+
+
+def save_frames(path, name, series):
+    """Saves a data frame of each variable of `series`, with year and day of
+    year columns, to `path` as "<name>.tmax", "<name>.tmin" and "<name>.prec"
+    """
+    year, jday = year_jday(series["dates"])
+    env = robjects.r["new.env"]()
+    for var, column in COLUMNS.items():
+        env[f"{name}.{var}"] = robjects.DataFrame(
+            {
+                "year": robjects.IntVector(year),
+                "jday": robjects.IntVector(jday),
+                column: float_vector(series[var]),
+            }
+        )
+    robjects.r["save"](list=robjects.StrVector(list(env.keys())), file=path, envir=env)
+
+
+def save_csv(directory, prefix, series):
+    """Writes a CSV file of each variable of `series`, in the layout of the
+    station 1018935 test files. Returns the paths by variable.
+    """
+    year, jday = year_jday(series["dates"])
+    paths = {}
+    for var, column in COLUMNS.items():
+        paths[var] = str(directory / f"{prefix}_{column}.csv")
+        with open(paths[var], "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["year", "jday", column, "flags"])
+            for row in zip(year, jday, series[var]):
+                if not np.isnan(row[2]):
+                    writer.writerow([row[0], row[1], f"{row[2]:.6f}", ""])
+    return paths
+
+
+def save_gridded(path, years, size, seed=0):
+    """Writes a `size` by `size` grid of synthetic stations to a NetCDF file
+    with CF units (K and kg m-2 s-1)
+    """
+    cells = [daily_series(years, seed=seed + cell) for cell in range(size * size)]
+    with Dataset(path, "w", format="NETCDF4") as nc:
+        nc.createDimension("time", len(cells[0]["dates"]))
+        nc.createDimension("lat", size)
+        nc.createDimension("lon", size)
+
+        time = nc.createVariable("time", "f8", ("time",))
+        time.setncatts(
+            {
+                "units": f"days since {START_YEAR}-01-01 00:00:00",
+                "calendar": "standard",
+                "standard_name": "time",
+                "axis": "T",
+            }
+        )
+        time[:] = np.arange(len(cells[0]["dates"]))
+        for dim, units, standard_name in (
+            ("lat", "degrees_north", "latitude"),
+            ("lon", "degrees_east", "longitude"),
+        ):
+            variable = nc.createVariable(dim, "f8", (dim,))
+            variable.setncatts({"units": units, "standard_name": standard_name})
+            variable[:] = 49 + np.arange(size)
+
+        for var, name, units, convert in (
+            ("tmax", "tasmax", "K", lambda values: values + 273.15),
+            ("tmin", "tasmin", "K", lambda values: values + 273.15),
+            ("prec", "pr", "kg m-2 s-1", lambda values: values / 86400),
+        ):
+            variable = nc.createVariable(
+                name, "f4", ("time", "lat", "lon"), fill_value=1.0e20
+            )
+            variable.units = units
+            values = np.stack([convert(cell[var]) for cell in cells], axis=1)
+            variable[:] = np.ma.masked_invalid(values.reshape(-1, size, size))
+
+
+def write_synthetic_data(directory, years, stations, grid_size):
+    """Writes `stations` synthetic stations of `years` years to `directory`
+    in every input form used by the benchmarks
+    """
+    init_worker()
+    base_years = min(years, 30)
+    base_range = (START_YEAR, START_YEAR + base_years - 1)
+
+    climdex_inputs = []
+    for station in range(stations):
+        path = str(directory / f"station{station}.rda")
+        save_climdex_input(path, daily_series(years, seed=station), base_range)
+        climdex_inputs.append(path)
+
+    series = daily_series(years)
+    frames = str(directory / "frames.rda")
+    save_frames(frames, "station0", series)
+
+    appended = daily_series(1, start=START_YEAR + years, seed=stations)
+    gridded = str(directory / "gridded.nc")
+    save_gridded(gridded, years, grid_size)
+
+    return SyntheticData(
+        years=years,
+        base_range=f"c({base_range[0]}, {base_range[1]})",
+        climdex_inputs=climdex_inputs,
+        frames=frames,
+        frame_name="station0",
+        csv_files=save_csv(directory, "station0", series),
+        append_csv_files=save_csv(directory, "append", appended),
+        gridded=gridded,
+    )
@@ -0,0 +1,143 @@
+import pytest
+from wps_tools.file_handling import csv_handler
+from wps_tools.testing import run_wps_process
+
+from quail.metrics import REGISTRY
+from quail.processes import processes
+from tests.common import build_file_input
+from .synthetic import COLUMNS
+
+
+def csv_inputs(csv_files):
+    return "".join(
+        f"{var}_file_content={csv_handler(path)};{var}_column={COLUMNS[var]};"
+        for var, path in csv_files.items()
+    )
+
+
+def raw_inputs(data):
+    return "".join(
+        f"{var}_file=@xlink:href={data.frames};"
+        f"{var}_name={data.frame_name}.{var};"
+        f"{var}_column={column};"
+        for var, column in COLUMNS.items()
+    )
+
+
+# Inputs of each process, given the synthetic data and an output file
+DATAINPUTS = {
+    "climdex_batch": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}"
+        "indices=su;indices=tx90p;indices=rx5day;indices=cdd;"
+        f"output_file={out};"
+    ),
+    "climdex_days": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}days_type=su;output_file={out};"
+    ),
+    "climdex_dtr": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}freq=monthly;output_file={out};"
+    ),
+    "climdex_get_available_indices": lambda data, out: (
+        f"climdex_input=@xlink:href={data.climdex_inputs[0]};"
+        f"ci_name=ci;output_file={out};"
+    ),
+    "climdex_gridded": lambda data, out: (
+        f"netcdf_file=@xlink:href={data.gridded};"
+        "indices=su;indices=tx90p;indices=rx5day;"
+        f"base_range={data.base_range};output_file={out};"
+    ),
+    "climdex_gsl": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}gsl_mode=GSL;output_file={out};"
+    ),
+    "climdex_input_append": lambda data, out: (
+        f"climdex_input=@xlink:href={data.climdex_inputs[0]};ci_name=ci;"
+        f"{csv_inputs(data.append_csv_files)}"
+        f"vector_name=ci;output_file={out};"
+    ),
+    "climdex_input_csv": lambda data, out: (
+        f"{csv_inputs(data.csv_files)}"
+        f"base_range={data.base_range};vector_name=ci;output_file={out};"
+    ),
+    "climdex_input_raw": lambda data, out: (
+        f"{raw_inputs(data)}"
+        f"base_range={data.base_range};vector_name=ci;output_file={out};"
+    ),
+    "climdex_mmdmt": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}"
+        f"month_type=txx;freq=monthly;output_file={out};"
+    ),
+    "climdex_ptot": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}threshold=95;output_file={out};"
+    ),
+    "climdex_quantile": lambda data, out: (
+        f"data_file=@xlink:href={data.frames};"
+        f"data_vector=unlist({data.frame_name}.tmax['{COLUMNS['tmax']}']);"
+        "quantiles_vector=c(0.1, 0.5, 0.9);"
+        f"vector_name=tmax_quantiles;output_file={out};"
+    ),
+    "climdex_rmm": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}threshold=10.0;output_file={out};"
+    ),
+    "climdex_rxnday": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}"
+        f"num_days=5;freq=monthly;output_file={out};"
+    ),
+    "climdex_sdii": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}output_file={out};"
+    ),
+    "climdex_spells": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}"
+        f"func=wsdi;span_years=False;output_file={out};"
+    ),
+    "climdex_temp_pctl": lambda data, out: (
+        f"{build_file_input(data.climdex_inputs)}"
+        f"func=tx90p;freq=monthly;output_file={out};"
+    ),
+}
+
+
+def step_totals(identifier):
+    """Returns the total time and count of each step of a process recorded
+    so far by ``quail.metrics``
+    """
+    totals = {}
+    for metric in REGISTRY.collect():
+        if metric.name != "quail_step_duration_seconds":
+            continue
+        for sample in metric.samples:
+            if sample.labels.get("process") != identifier:
+                continue
+            if sample.name.endswith("_sum"):
+                totals.setdefault(sample.labels["step"], [0, 0])[0] = sample.value
+            elif sample.name.endswith("_count"):
+                totals.setdefault(sample.labels["step"], [0, 0])[1] = sample.value
+    return totals
+
+
+def step_means(identifier, before):
+    """Returns the mean time of each step of a process since `before`"""
+    means = {}
+    for step, (total, count) in step_totals(identifier).items():
+        previous_total, previous_count = before.get(step, (0, 0))
+        if count > previous_count:
+            means[step] = (total - previous_total) / (count - previous_count)
+    return means
+
+
+def test_datainputs_cover_processes():
+    assert sorted(DATAINPUTS) == sorted(process.identifier for process in processes)
+
+
+@pytest.mark.parametrize(
+    "process", processes, ids=[process.identifier for process in processes]
+)
+def test_benchmark_process(benchmark, process, data, tmp_path):
+    suffix = ".nc" if process.identifier == "climdex_gridded" else ".rda"
+    datainputs = DATAINPUTS[process.identifier](data, tmp_path / f"output{suffix}")
+    before = step_totals(process.identifier)
+
+    benchmark(run_wps_process, process, datainputs)
+
+    benchmark.extra_info["years"] = data.years
+    benchmark.extra_info["stations"] = len(data.climdex_inputs)
+    benchmark.extra_info["steps"] = step_means(process.identifier, before)
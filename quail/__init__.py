@@ -4,4 +4,12 @@
 
 from .__version__ import __author__, __email__, __version__  # noqa: F401
 
-from .wsgi import application  # noqa: F401
+
+def __getattr__(name):
+    # The service is only created when it is asked for, so that importing a
+    # module of the package (e.g. in an R worker) does not start it
+    if name == "application":
+        from .wsgi import application
+
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
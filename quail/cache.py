@@ -0,0 +1,118 @@
+"""
+Content-addressed caches of R objects kept by each R worker.
+
+Each R worker keeps the climdexInputs it has loaded, keyed by a hash of the
+input file's content, so repeated requests on the same station file skip
+reading and decompressing it. Entries are evicted least recently used first
+once the total R object size exceeds ``ci_cache_mb`` megabytes (``[quail]``
+configuration section). A size of 0 disables the cache.
+
+The baseline quantiles of climdexInputs are cached the same way (see
+``quail.quantiles``), within ``quantiles_cache_mb`` megabytes.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pywps import configuration
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_:
+        for chunk in iter(lambda: file_.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe least recently used cache bounded by the total size of its
+    entries (in bytes), with hit, miss and eviction counters.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Returns the value cached under `key`, or None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value, size):
+        """Caches `value`, evicting old entries to stay under max_size.
+        Values larger than the cache itself are not stored.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+
+            if size > self.max_size:
+                return
+
+            while self.size + size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+            self._entries[key] = (value, size)
+            self.size += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(option):
+    """Returns this process' cache sized by the `option` setting (in
+    megabytes) of the [quail] section, creating it on first use
+    """
+    with _caches_lock:
+        if option not in _caches:
+            max_mb = int(configuration.get_config_value("quail", option, 0))
+            _caches[option] = LRUCache(max_mb * 1024 * 1024)
+
+        return _caches[option]
+
+
+def get_ci_cache():
+    """Returns this process' climdexInput cache"""
+    return get_cache("ci_cache_mb")
+
+
+def get_quantiles_cache():
+    """Returns this process' baseline quantiles cache"""
+    return get_cache("quantiles_cache_mb")
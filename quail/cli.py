@@ -75,6 +75,8 @@ def run_process_action(action=None):
 def _run(application, bind_host=None, daemon=False):
     from werkzeug.serving import run_simple
 
+    # R is started by the process that serves, with the final configuration
+    wsgi.start_r()
     # call this *after* app is initialized ... needs pywps config.
     host, port = get_host()
     bind_host = bind_host or host
@@ -155,6 +157,12 @@ def stop():
     default="2",
     help="parallelprocesses in PyWPS configuration.",
 )
+@click.option(
+    "--r-workers",
+    metavar="INT",
+    default="2",
+    help="number of R worker processes (0 runs R in the server process).",
+)
 @click.option(
     "--log-level",
     metavar="LEVEL",
@@ -181,6 +189,7 @@ def start(
     maxsingleinputsize,
     maxprocesses,
     parallelprocesses,
+    r_workers,
     log_level,
     log_file,
     database,
@@ -199,6 +208,7 @@ def start(
             wps_maxsingleinputsize=maxsingleinputsize,
             wps_maxprocesses=maxprocesses,
             wps_parallelprocesses=parallelprocesses,
+            quail_r_workers=r_workers,
             wps_log_level=log_level,
             wps_log_file=log_file,
             wps_database=database,
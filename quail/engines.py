@@ -0,0 +1,378 @@
+"""
+NumPy implementations of climdex.pcic indices.
+
+Each index function here computes the same values as its climdex.pcic
+counterpart directly from the slots of a climdexInput object, so requests
+that select the ``numpy`` engine skip the R function calls. Results are
+converted back to named R vectors, and saved like those of the R engine.
+"""
+
+import operator
+import numpy as np
+from rpy2 import robjects
+from pywps.app.exceptions import ProcessError
+
+from quail.utils import load_cis
+from quail.views import r_view, ci_date_factor, ci_namasks, ci_jdays
+
+
+# Variable, comparison and threshold (degrees Celsius) of each day count
+DAYS_THRESHOLDS = {
+    "su": ("tmax", operator.gt, 25),
+    "id": ("tmax", operator.lt, 0),
+    "fd": ("tmin", operator.lt, 0),
+    "tr": ("tmin", operator.gt, 20),
+}
+
+
+# Variable, comparison and threshold of each spell index. Warm and cold spells
+# are measured against the base period's 90th and 10th daily percentiles.
+SPELLS = {
+    "wsdi": ("tmax", operator.gt, "q90"),
+    "csdi": ("tmin", operator.lt, "q10"),
+    "cdd": ("prec", operator.lt, 1),
+    "cwd": ("prec", operator.ge, 1),
+}
+
+# Default of the spells.can.span.years argument of each spell index's
+# climdex.pcic function
+SPAN_YEARS_DEFAULTS = {"wsdi": False, "csdi": False, "cdd": True, "cwd": True}
+
+
+def count_days(data, namasks, codes, n_levels, days_types=tuple(DAYS_THRESHOLDS)):
+    """Counts the days in each period where each of `days_types` holds.
+
+    `data` and `namasks` map variable names to the daily values and to the
+    per period NA masks (1 or NaN), `codes` gives the 0-based period of each
+    day and `n_levels` the number of periods. Returns a dictionary of float
+    arrays, NaN where the period has too much missing data.
+    """
+    counts = {}
+    for days_type in days_types:
+        var, op, threshold = DAYS_THRESHOLDS[days_type]
+        # Comparisons with NaN are False, like the NAs climdex.pcic removes
+        # with na.rm=TRUE before summing
+        days = codes[op(data[var], threshold)]
+        counts[days_type] = np.bincount(days, minlength=n_levels) * namasks[var]
+    return counts
+
+
+def group_max(values, codes, n_levels):
+    """Returns the maximum of `values` in each period, ignoring NaN, and -inf
+    for periods without any values (as R's max with na.rm=TRUE)
+    """
+    maxima = np.full(n_levels, -np.inf)
+    np.maximum.at(maxima, codes, np.where(np.isnan(values), -np.inf, values))
+    return maxima
+
+
+def running_sum(prec, ndays, center_mean_on_last_day=False):
+    """Returns the `ndays` day running sums of `prec` the way climdex.pcic
+    computes them, to the last bit: NaN counts as 0, each window is centered
+    on its day (or ends on it if `center_mean_on_last_day`) and windows that
+    run past the ends of the data are 0.
+
+    As in climdex.pcic's running.mean, the window shrinks to the length of
+    the data, and a window of one day leaves the data as they are. The sums
+    come from a single cumulative sum over the sum of the first window, taken
+    as a double like R's sum, and the differences between days `ndays` apart,
+    accumulated in long double like R's cumsum. They are then divided by the
+    window and multiplied by `ndays`.
+    """
+    prec = np.where(np.isnan(prec), 0.0, prec)
+    window = min(ndays, len(prec))
+
+    if window <= 1:
+        sums = prec
+    else:
+        left = window // 2
+        right = window - left - 1
+        steps = np.empty(len(prec) - window + 1, dtype=np.longdouble)
+        steps[0] = float(np.sum(prec[:window], dtype=np.longdouble))
+        steps[1:] = prec[window:] - prec[:-window]
+        means = np.cumsum(steps).astype(float) / window
+        sums = np.concatenate([np.zeros(left), means, np.zeros(right)])
+
+    if center_mean_on_last_day:
+        shift = ndays // 2
+        sums = np.concatenate([np.zeros(shift), sums[: len(sums) - shift]])
+    return sums * ndays
+
+
+def rxnday_maxima(prec, periods, ndays, center_mean_on_last_day=False):
+    """Computes the maximum `ndays` day precipitation in each period.
+
+    `periods` maps each frequency to the (codes, number of periods, NA mask)
+    of its periods (see `count_days`), so monthly and annual maxima can be
+    taken from a single running sum. Returns a dictionary of float arrays by
+    frequency.
+    """
+    if ndays == 1:
+        sums = prec
+    else:
+        sums = running_sum(prec, ndays, center_mean_on_last_day)
+
+    return {
+        freq: group_max(sums, codes, n_levels) * namask
+        for freq, (codes, n_levels, namask) in periods.items()
+    }
+
+
+def run_bounds(condition, codes=None, runs=None):
+    """Returns the indices of the first and last days of each run of True in
+    `condition`. If period `codes` are given, runs are also split where the
+    period changes. `runs` are the unsplit bounds, if already known.
+    """
+    if runs is None:
+        padded = np.concatenate([[False], condition, [False]])
+        changes = np.flatnonzero(padded[1:] != padded[:-1])
+        runs = changes[::2], changes[1::2] - 1
+    starts, ends = runs
+
+    if codes is not None:
+        cuts = np.flatnonzero(
+            (codes[1:] != codes[:-1]) & condition[1:] & condition[:-1]
+        )
+        starts = np.sort(np.concatenate([starts, cuts + 1]))
+        ends = np.sort(np.concatenate([ends, cuts]))
+
+    return starts, ends
+
+
+def spell_duration(condition, codes, n_levels, span_years, min_length=6, runs=None):
+    """Counts the days in each period that are part of a spell of at least
+    `min_length` days where `condition` holds. Unless `span_years`, spells
+    end at period boundaries. `runs` are as for `run_bounds`.
+    """
+    starts, ends = run_bounds(condition, None if span_years else codes, runs)
+    spells = ends - starts + 1 >= min_length
+
+    # +1 where each spell starts and -1 after it ends, so the cumulative sum
+    # flags the days inside spells
+    edges = np.zeros(len(condition) + 1)
+    edges[starts[spells]] += 1
+    edges[ends[spells] + 1] -= 1
+    return np.bincount(codes, weights=np.cumsum(edges[:-1]), minlength=n_levels)
+
+
+def spell_max(condition, missing, codes, n_levels, span_years, runs=None):
+    """Returns the length of the longest spell where `condition` holds in
+    each period. With `span_years`, a spell counts towards the period it ends
+    in, and a period with no spell ending in it and no day where `condition`
+    is false (ignoring `missing` days) is NaN, being inside a longer spell.
+    Otherwise spells end at period boundaries. `runs` are as for `run_bounds`.
+    """
+    starts, ends = run_bounds(condition, None if span_years else codes, runs)
+    lengths = np.zeros(len(condition))
+    lengths[ends] = ends - starts + 1
+    longest = group_max(lengths, codes, n_levels)
+
+    if span_years:
+        false_days = np.bincount(
+            codes, weights=~(condition | missing), minlength=n_levels
+        )
+        longest[(longest == 0) & (false_days == 0)] = np.nan
+    return longest
+
+
+def spell_indices(
+    data,
+    thresholds,
+    namasks,
+    codes,
+    n_levels,
+    max_missing_days,
+    funcs=tuple(SPELLS),
+    span_years=False,
+    runs=None,
+):
+    """Computes the spell indices `funcs` from one pass over each variable's
+    spells.
+
+    `data` maps variables to daily values, `thresholds` maps the wsdi and
+    csdi variables to their daily thresholds, and `namasks`, `codes` and
+    `n_levels` describe the annual periods (see `count_days`). The condition
+    and unsplit runs of each spell definition are kept in the `runs`
+    dictionary, which calls on the same data may share to find them once.
+    Returns a dictionary of float arrays by index.
+    """
+    runs = {} if runs is None else runs
+    results = {}
+    for func in funcs:
+        var, op, threshold = SPELLS[func]
+        values = data[var]
+        if isinstance(threshold, str):
+            threshold = thresholds[var]
+
+        key = SPELLS[func]
+        if key not in runs:
+            condition = op(values, threshold)
+            runs[key] = condition, run_bounds(condition)
+        condition, bounds = runs[key]
+
+        if func in ("wsdi", "csdi"):
+            missing = np.isnan(values + threshold)
+            missing_days = np.bincount(codes, weights=missing, minlength=n_levels)
+            namask = np.where(missing_days > max_missing_days, np.nan, 1)
+            days = spell_duration(condition, codes, n_levels, span_years, runs=bounds)
+            results[func] = days * namask * namasks[var]
+        else:
+            longest = spell_max(
+                condition, np.isnan(values), codes, n_levels, span_years, bounds
+            )
+            results[func] = longest * namasks[var]
+
+    return results
+
+
+def ci_variable(ci, var):
+    """Returns a view of the daily values of `var` in a climdexInput"""
+    data = ci.slots["data"]
+    if var not in data.names:
+        raise ProcessError(f"climdexInput has no {var} data")
+    return np.asarray(r_view(data.rx2(var)), dtype=float)
+
+
+def ci_period(ci, freq="annual"):
+    """Returns the 0-based period codes of each day, the period names and
+    views of the NA masks of each variable of a climdexInput for `freq`
+    ("annual" or "monthly").
+    """
+    codes, levels = ci_date_factor(ci, freq)
+    return codes - 1, levels, ci_namasks(ci, freq)
+
+
+def r_vector(values, names):
+    """Converts an array to a named R numeric vector, with NaN as NA"""
+    vector = robjects.FloatVector(
+        [robjects.NA_Real if np.isnan(value) else value for value in values]
+    )
+    vector.names = robjects.StrVector(names)
+    return vector
+
+
+def days_numpy(r_file, days_type):
+    """Loads the climdexInputs in `r_file` and computes the `days_type` day
+    count (su, id, fd or tr) for each one. Returns a dictionary of the results
+    by climdexInput name. Meant to be dispatched to an R worker with
+    `quail.workers.map_in_workers`.
+    """
+    var = DAYS_THRESHOLDS[days_type][0]
+    results = {}
+
+    for ci_name, ci in load_cis(r_file).items():
+        codes, levels, namasks = ci_period(ci)
+        counts = count_days(
+            {var: ci_variable(ci, var)}, namasks, codes, len(levels), [days_type]
+        )
+        results[ci_name] = r_vector(counts[days_type], levels)
+
+    return results
+
+
+def rxnday_numpy(r_file, num_days, freq, center_mean_on_last_day=False):
+    """Loads the climdexInputs in `r_file` and computes the `freq` maximum
+    `num_days` day precipitation for each one. Returns a dictionary of the
+    results by climdexInput name. Meant to be dispatched to an R worker with
+    `quail.workers.map_in_workers`.
+    """
+    results = {}
+
+    for ci_name, ci in load_cis(r_file).items():
+        codes, levels, namasks = ci_period(ci, freq)
+        maxima = rxnday_maxima(
+            ci_variable(ci, "prec"),
+            {freq: (codes, len(levels), namasks["prec"])},
+            num_days,
+            center_mean_on_last_day,
+        )
+        results[ci_name] = r_vector(maxima[freq], levels)
+
+    return results
+
+
+def ci_thresholds(ci, var, quantile):
+    """Returns the out of base `quantile` ("q10" or "q90") of `var` for each
+    day of a climdexInput. Its quantiles are computed by R when first used.
+    """
+    quantiles = ci.slots["quantiles"]
+    if not robjects.r["exists"](var, envir=quantiles, inherits=False)[0]:
+        raise ProcessError(f"climdexInput has no {var} quantiles")
+
+    by_jday = np.asarray(
+        robjects.r["get"](var, envir=quantiles).rx2("outbase").rx2(quantile),
+        dtype=float,
+    )
+    return by_jday[ci_jdays(ci).astype(np.intp) - 1]
+
+
+def ci_spell_indices(ci, funcs, span_years, runs=None):
+    """Computes the spell indices `funcs` of a climdexInput with
+    `spell_indices`, reading only the variables and thresholds they use.
+    Returns a dictionary of named R vectors by index.
+    """
+    codes, levels, namasks = ci_period(ci)
+    data, thresholds = {}, {}
+    for func in funcs:
+        var, _, threshold = SPELLS[func]
+        if var not in data:
+            data[var] = ci_variable(ci, var)
+        if isinstance(threshold, str) and var not in thresholds:
+            thresholds[var] = ci_thresholds(ci, var, threshold)
+
+    spells = spell_indices(
+        data,
+        thresholds,
+        namasks,
+        codes,
+        len(levels),
+        ci.slots["max.missing.days"].rx2("annual")[0],
+        funcs,
+        span_years,
+        runs,
+    )
+    return {func: r_vector(spells[func], levels) for func in funcs}
+
+
+def spells_numpy(r_file, func, span_years):
+    """Loads the climdexInputs in `r_file` and computes the `func` spell index
+    (wsdi, csdi, cdd or cwd) for each one. Returns a dictionary of the results
+    by climdexInput name. Meant to be dispatched to an R worker with
+    `quail.workers.map_in_workers`.
+    """
+    return {
+        ci_name: ci_spell_indices(ci, [func], span_years)[func]
+        for ci_name, ci in load_cis(r_file).items()
+    }
+
+
+def is_spell_spec(spec):
+    """Returns whether a parsed index specification (see
+    `quail.utils.parse_index_spec`) is a spell index that `spell_specs_numpy`
+    can compute
+    """
+    index, args, _ = spec
+    return index in SPELLS and set(args) <= {"spells.can.span.years"}
+
+
+def spell_specs_numpy(cis, specs):
+    """Computes the spell index specifications `specs` (see `is_spell_spec`)
+    for each of the climdexInputs `cis`, finding the runs of each spell
+    condition once per climdexInput for all of them. Returns a dictionary of
+    {label: {climdexInput name: result}}.
+    """
+    by_span = {}
+    for index, args, label in specs:
+        span_years = bool(args.get("spells.can.span.years", SPAN_YEARS_DEFAULTS[index]))
+        by_span.setdefault(span_years, {}).setdefault(index, []).append(label)
+
+    results = {label: {} for _, _, label in specs}
+    for ci_name, ci in cis.items():
+        runs = {}
+        for span_years, labels in by_span.items():
+            spells = ci_spell_indices(ci, list(labels), span_years, runs)
+            for index, index_labels in labels.items():
+                for label in index_labels:
+                    results[label][ci_name] = spells[index]
+
+    return results
@@ -0,0 +1,327 @@
+"""
+Gridded NetCDF input for the climdex indices.
+
+A NetCDF file of daily maximum and minimum temperature and precipitation on
+a grid is processed in blocks of cells. Each block is read on its own from
+the file by an R worker, which builds a climdexInput for each of its cells
+with climdexInput.raw and computes the requested indices with their
+climdex.pcic functions, like the station processes do. The server writes the
+results of each block to the output NetCDF file as they arrive, so memory
+use depends on the block size and on the number of blocks in flight
+(``fan_out``), not on the size of the grid.
+"""
+
+import numpy as np
+from netCDF4 import Dataset, num2date
+from rpy2 import robjects
+from pywps.app.exceptions import ProcessError
+from rpy2.rinterface_lib.embedded import RRuntimeError
+
+from wps_tools.R import get_package
+from quail.utils import logger
+from quail.views import float_vector
+from quail.netcdf import create_time
+from quail.literals import r_vector
+
+
+# Offsets to degrees Celsius, and factors to mm/day, by CF units
+TEMPERATURE_UNITS = {
+    "K": -273.15,
+    "degK": -273.15,
+    "degC": 0,
+    "degree_Celsius": 0,
+    "celsius": 0,
+}
+PRECIPITATION_UNITS = {
+    "kg m-2 s-1": 86400,
+    "kg/m2/s": 86400,
+    "mm s-1": 86400,
+    "kg m-2 d-1": 1,
+    "kg m-2 day-1": 1,
+    "mm/day": 1,
+    "mm day-1": 1,
+    "mm d-1": 1,
+    "mm": 1,
+}
+GRID_UNITS = {
+    "tmax": TEMPERATURE_UNITS,
+    "tmin": TEMPERATURE_UNITS,
+    "prec": PRECIPITATION_UNITS,
+}
+
+# PCICt names of the CF calendars that differ
+PCICT_CALENDARS = {"standard": "gregorian", "all_leap": "366_day"}
+
+# Indices whose climdex.pcic function takes a freq argument, by default
+# "monthly"; the others are annual
+FREQ_INDICES = {
+    "txx",
+    "tnx",
+    "txn",
+    "tnn",
+    "tn10p",
+    "tx10p",
+    "tn90p",
+    "tx90p",
+    "dtr",
+    "rx1day",
+    "rx5day",
+}
+
+
+def convert_units(values, units, var):
+    """Converts the `values` of `var` ("tmax", "tmin" or "prec") from their
+    CF `units` to the degrees Celsius or mm/day of climdex.pcic. Values
+    without units are assumed to be in those already.
+    """
+    if units is None:
+        return values
+
+    conversions = GRID_UNITS[var]
+    if units not in conversions:
+        raise ProcessError(f"Unsupported units for {var}: {units}")
+    elif var == "prec":
+        return values * conversions[units]
+    return values + conversions[units]
+
+
+def grid_dimensions(nc, var_names):
+    """Returns the time dimension and the two grid dimensions (y, x) of the
+    variables `var_names` in a NetCDF dataset, which must be the same for
+    each of them
+    """
+    dimensions = []
+    for var_name in var_names:
+        if var_name not in nc.variables:
+            raise ProcessError(f"No variable {var_name} in NetCDF file")
+        dimensions.append(nc.variables[var_name].dimensions)
+
+    if len(set(dimensions)) != 1 or len(dimensions[0]) != 3:
+        raise ProcessError(
+            "Variables must have the same time and two grid dimensions, "
+            f"not {dimensions}"
+        )
+
+    time_dims = [
+        dim
+        for dim in dimensions[0]
+        if dim in nc.variables and " since " in getattr(nc.variables[dim], "units", "")
+    ]
+    if len(time_dims) != 1:
+        raise ProcessError("No time dimension in NetCDF file")
+
+    y_dim, x_dim = [dim for dim in dimensions[0] if dim != time_dims[0]]
+    return time_dims[0], y_dim, x_dim
+
+
+def read_dates(nc, time_dim):
+    """Returns the dates of the time steps in a NetCDF dataset as
+    "YYYY-MM-DD" strings, and their CF calendar
+    """
+    time = nc.variables[time_dim]
+    calendar = getattr(time, "calendar", "standard")
+    dates = num2date(time[:], time.units, calendar=calendar)
+    return [date.strftime("%Y-%m-%d") for date in dates], calendar
+
+
+def grid_periods(dates):
+    """Returns the names of the annual and monthly periods of the index
+    values computed from "YYYY-MM-DD" `dates`. climdexInput.raw extends the
+    dates to whole years, so these are the same for every cell.
+    """
+    first, last = int(min(dates)[:4]), int(max(dates)[:4])
+    years = [str(year) for year in range(first, last + 1)]
+    return {
+        "annual": years,
+        "monthly": [f"{year}-{month:02d}" for year in years for month in range(1, 13)],
+    }
+
+
+def spec_freq(spec):
+    """Returns the frequency ("annual" or "monthly") of the values of a
+    parsed index specification (see `quail.utils.parse_index_spec`)
+    """
+    index, args, _ = spec
+    if index not in FREQ_INDICES:
+        return "annual"
+    # climdex.pcic matches freq with match.arg, which allows abbreviations
+    return "annual" if str(args.get("freq", "monthly")).startswith("a") else "monthly"
+
+
+def grid_blocks(shape, chunk_size):
+    """Splits a grid of `shape` (y, x) into blocks of at most `chunk_size`
+    cells, as (y start, y end, x start, x end) tuples, row by row
+    """
+    ny, nx = shape
+    columns = min(nx, chunk_size)
+    rows = max(1, chunk_size // columns)
+
+    return [
+        (y, min(y + rows, ny), x, min(x + columns, nx))
+        for y in range(0, ny, rows)
+        for x in range(0, nx, columns)
+    ]
+
+
+def read_block(nc, var_name, var, dims, block):
+    """Reads the cells of `block` of the NetCDF variable `var_name` holding
+    `var` ("tmax", "tmin" or "prec") for all time steps. Returns an array of
+    (time, y, x) in climdex.pcic units, with NaN for missing values.
+    """
+    time_dim, y_dim, x_dim = dims
+    y0, y1, x0, x1 = block
+    variable = nc.variables[var_name]
+    slices = {time_dim: slice(None), y_dim: slice(y0, y1), x_dim: slice(x0, x1)}
+
+    values = variable[tuple(slices[dim] for dim in variable.dimensions)]
+    values = np.ma.filled(np.ma.asarray(values, dtype=float), np.nan)
+    values = np.transpose(values, [variable.dimensions.index(dim) for dim in dims])
+    return convert_units(values, getattr(variable, "units", None), var)
+
+
+def block_latitudes(nc, dims, block):
+    """Returns the latitude of each cell of `block`, as an array of (y, x),
+    or None if the NetCDF dataset has no latitude variable on its grid
+    """
+    _, y_dim, x_dim = dims
+    y0, y1, x0, x1 = block
+
+    for variable in nc.variables.values():
+        is_latitude = getattr(
+            variable, "standard_name", None
+        ) == "latitude" or variable.name in ("lat", "latitude")
+        if not is_latitude or not set(variable.dimensions) <= {y_dim, x_dim}:
+            continue
+
+        shape = (y1 - y0, x1 - x0)
+        if variable.dimensions == (y_dim,):
+            return np.broadcast_to(variable[y0:y1][:, np.newaxis], shape)
+        elif variable.dimensions == (x_dim,):
+            return np.broadcast_to(variable[x0:x1][np.newaxis, :], shape)
+        elif variable.dimensions == (y_dim, x_dim):
+            return np.asarray(variable[y0:y1, x0:x1])
+        return np.asarray(variable[x0:x1, y0:y1]).T
+
+    return None
+
+
+def compute_grid_block(
+    block,
+    nc_file,
+    var_names,
+    specs,
+    periods,
+    base_range,
+    n,
+    northern_hemisphere,
+    temp_qtiles,
+    prec_qtiles,
+    max_missing_days,
+    min_base_data_fraction_present,
+):
+    """Computes the index specifications `specs` (see
+    `quail.utils.parse_index_spec`) for each cell of a `block` of the
+    NetCDF file `nc_file`. `var_names` maps "tmax", "tmin" and "prec" to
+    the names of the NetCDF variables, and `periods` maps the label of each
+    spec to the names of its periods (see `grid_periods`). Cells without any
+    data, or where climdex.pcic fails, are left as NaN, and the hemisphere
+    of each cell is taken from its latitude when the file has one. Returns a
+    dictionary of {label: array of (period, y, x)}. Meant to be dispatched
+    to an R worker with `quail.workers.map_in_workers`.
+    """
+    climdex = get_package("climdex.pcic")
+    y0, y1, x0, x1 = block
+
+    with Dataset(nc_file) as nc:
+        dims = grid_dimensions(nc, var_names.values())
+        dates, calendar = read_dates(nc, dims[0])
+        data = {
+            var: read_block(nc, var_name, var, dims, block)
+            for var, var_name in var_names.items()
+        }
+        latitudes = block_latitudes(nc, dims, block)
+
+    dates = robjects.r["as.PCICt"](
+        robjects.StrVector(dates),
+        format="%Y-%m-%d",
+        cal=PCICT_CALENDARS.get(calendar, calendar),
+    )
+    results = {
+        label: np.full((len(periods[label]), y1 - y0, x1 - x0), np.nan)
+        for _, _, label in specs
+    }
+
+    for y, x in np.ndindex(y1 - y0, x1 - x0):
+        series = {var: values[:, y, x] for var, values in data.items()}
+        if all(np.isnan(values).all() for values in series.values()):
+            continue
+
+        params = {}
+        for var, values in series.items():
+            params[var] = float_vector(values)
+            params[f"{var}_dates"] = dates
+        if latitudes is not None:
+            northern_hemisphere = bool(latitudes[y, x] >= 0)
+
+        try:
+            ci = climdex.climdexInput_raw(
+                **params,
+                base_range=r_vector(base_range),
+                n=n,
+                northern_hemisphere=northern_hemisphere,
+                temp_qtiles=r_vector(temp_qtiles),
+                prec_qtiles=r_vector(prec_qtiles),
+                max_missing_days=r_vector(max_missing_days),
+                min_base_data_fraction_present=min_base_data_fraction_present,
+            )
+            for index, args, label in specs:
+                result = robjects.r[f"climdex.{index}"](ci, **args)
+                if list(result.names) != periods[label]:
+                    raise ProcessError(
+                        f"Periods of {label} in cell ({y0 + y}, {x0 + x}) do not "
+                        "match the input dates"
+                    )
+                results[label][:, y, x] = np.asarray(result, dtype=float)
+        except RRuntimeError as e:
+            logger.warning(
+                f"Skipping cell ({y0 + y}, {x0 + x}): {type(e).__name__}: {str(e)}"
+            )
+            for values in results.values():
+                values[:, y, x] = np.nan
+
+    return results
+
+
+def create_grid_output(out, nc, dims, var_names):
+    """Creates the grid dimensions of the output dataset `out`, and copies the
+    coordinate variables on them (e.g. lat and lon) from the input dataset
+    `nc`
+    """
+    _, y_dim, x_dim = dims
+    for dim in (y_dim, x_dim):
+        out.createDimension(dim, len(nc.dimensions[dim]))
+
+    for name, variable in nc.variables.items():
+        if name in var_names or not set(variable.dimensions) <= {y_dim, x_dim}:
+            continue
+        if not variable.dimensions:
+            continue
+
+        attributes = {
+            attr: variable.getncattr(attr)
+            for attr in variable.ncattrs()
+            if attr != "_FillValue"
+        }
+        copy = out.createVariable(name, variable.dtype, variable.dimensions)
+        copy.setncatts(attributes)
+        copy[:] = variable[:]
+
+
+def period_dimension(out, periods, freq, calendar):
+    """Returns the name of the time dimension of the `freq` ("annual" or
+    "monthly") `periods` in the output dataset `out`, creating it if needed
+    """
+    dim = f"time_{freq}"
+    if dim not in out.dimensions:
+        create_time(out, dim, periods, calendar)
+    return dim
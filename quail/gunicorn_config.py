@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for serving quail from a preloaded master process:
+
+    gunicorn -c python:quail.gunicorn_config quail.wsgi:application
+
+The master process creates the application, starting R with ``climdex.pcic``
+and ``PCICt`` attached and loading the climdexInput files of the
+``preload_files`` option (see ``quail.workers.preload``), before it forks the
+server processes. These share the master's memory pages copy-on-write rather
+than each starting R and loading the files again. This needs
+``r_workers = 0``, so that the server processes run the R code themselves;
+the server does not start otherwise. Other gunicorn settings, such as
+``--workers`` and ``--bind``, are given on the command line as usual.
+"""
+
+import gc
+import os
+
+
+# Tells quail.wsgi.start_r to preload rather than start the R workers
+os.environ["QUAIL_PRELOAD"] = "1"
+
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Objects the garbage collector visits are written to, and so copied
+    gc.freeze()
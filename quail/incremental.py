@@ -0,0 +1,225 @@
+"""
+Incremental recomputation of climdex indices.
+
+The index vectors of the processes that support it carry a digest of the
+daily data of each of their periods in their ``period_digests`` attribute,
+whether or not they were updated from a previous output. Given that
+vector back (from a previous ``rda_output``) together with an updated
+climdexInput, only the years containing periods whose digest changed, or
+that are new, are recomputed, and the results are spliced into the prior
+vector. Digests also cover the base period data, the index arguments and
+the baseline quantiles the index uses, so a rebuilt baseline or a different
+threshold recomputes every period.
+
+Only indices whose value for a period depends on that period's days alone
+may be updated this way.
+"""
+
+import hashlib
+import numpy as np
+from rpy2 import robjects
+from pywps.app.exceptions import ProcessError
+from rpy2.rinterface_lib.embedded import RRuntimeError
+
+from quail.views import r_view, ci_data, ci_date_factor
+from quail.netcdf import period_freq
+from quail.utils import load_cis, load_rdata
+
+
+PERIOD_DIGESTS = "period_digests"
+
+# Variables whose baseline quantiles each index is computed against
+INDEX_QUANTILES = {
+    "climdex.r95ptot": ["prec"],
+    "climdex.r99ptot": ["prec"],
+    "climdex.tn10p": ["tmin"],
+    "climdex.tn90p": ["tmin"],
+    "climdex.tx10p": ["tmax"],
+    "climdex.tx90p": ["tmax"],
+}
+
+# Bytes (as integers) of the serialized quantiles of `vars` in a quantiles
+# environment
+SERIALIZE_QUANTILES = """
+function(quantiles, vars) {
+    vars <- sort(intersect(vars, ls(quantiles)))
+    as.integer(serialize(mget(vars, envir=quantiles), NULL))
+}
+"""
+
+# climdexInput restricted to the days of the given years
+SUBSET_YEARS = """
+function(ci, years) {
+    keep <- ci@date.factors$annual %in% years
+    keep.years <- levels(ci@date.factors$annual) %in% years
+    keep.months <- substr(levels(ci@date.factors$monthly), 1, 4) %in% years
+    ci@data <- lapply(ci@data, function(x) x[keep])
+    ci@namasks <- list(
+        annual=lapply(ci@namasks$annual, function(x) x[keep.years]),
+        monthly=lapply(ci@namasks$monthly, function(x) x[keep.months])
+    )
+    ci@dates <- ci@dates[keep]
+    ci@jdays <- ci@jdays[keep]
+    ci@date.factors <- lapply(ci@date.factors, function(f) droplevels(f[keep]))
+    ci
+}
+"""
+
+# Values of `prior` for `periods`, replaced by those of `recomputed`
+SPLICE = """
+function(prior, periods, recomputed=NULL) {
+    result <- as.numeric(prior[periods])
+    names(result) <- periods
+    if (!is.null(recomputed)) {
+        result[names(recomputed)] <- recomputed
+    }
+    result
+}
+"""
+
+
+def period_digests(ci, freq, context):
+    """Returns a dictionary of the SHA-256 digests of the daily data of each
+    `freq` period of a climdexInput, by period name. Each digest also covers
+    `context` (a string describing the index computed), the base period data
+    and the max missing days.
+    """
+    codes, levels = ci_date_factor(ci, freq)
+    variables = ci_data(ci)
+
+    dates = r_view(ci.slots["dates"])
+    base_range = r_view(ci.slots["base.range"])
+    in_base = (dates >= base_range[0]) & (dates <= base_range[-1])
+
+    shared = hashlib.sha256(context.encode())
+    shared.update(r_view(ci.slots["max.missing.days"]).tobytes())
+    for var, values in variables.items():
+        shared.update(var.encode())
+        shared.update(values[in_base].tobytes())
+
+    # Days are in date order, so each period is a contiguous run of days
+    bounds = np.searchsorted(codes, np.arange(1, len(levels) + 2))
+    digests = {}
+    for period, start, end in zip(levels, bounds[:-1], bounds[1:]):
+        digest = shared.copy()
+        for values in variables.values():
+            digest.update(values[start:end].tobytes())
+        digests[period] = digest.hexdigest()
+
+    return digests
+
+
+def quantiles_digest(ci, variables):
+    """Returns the SHA-256 digest of the baseline quantiles of `variables` in
+    a climdexInput, or an empty string if there are none. Quantiles still
+    pending in the climdexInput are computed.
+    """
+    if not variables:
+        return ""
+
+    serialized = robjects.r(SERIALIZE_QUANTILES)(
+        ci.slots["quantiles"], robjects.StrVector(variables)
+    )
+    return hashlib.sha256(r_view(serialized).tobytes()).hexdigest()
+
+
+def with_digests(result, digests):
+    """Returns the index vector `result` with its period digests attached"""
+    periods = robjects.StrVector(list(digests.values()))
+    periods.names = robjects.StrVector(list(digests))
+    return robjects.r["structure"](result, **{PERIOD_DIGESTS: periods})
+
+
+def update_index(ci, prior, climdex_func, context, *args, **kwargs):
+    """Computes the index `climdex_func` for a climdexInput, reusing the
+    values of the `prior` vector (computed in incremental mode) for periods
+    whose data is unchanged. Without a prior vector, or one without period
+    digests, every period is computed. Returns the vector with its period
+    digests.
+    """
+    prior_digests = None
+    if prior is not None:
+        prior_digests = robjects.r["attr"](prior, PERIOD_DIGESTS)
+
+    if prior_digests is None or robjects.r["is.null"](prior_digests)[0]:
+        result = climdex_func(ci, *args, **kwargs)
+        return with_digests(
+            result, period_digests(ci, period_freq(result.names), context)
+        )
+
+    digests = period_digests(ci, period_freq(prior.names), context)
+    prior_digests = dict(zip(prior_digests.names, prior_digests))
+    years = sorted(
+        {
+            period[:4]
+            for period, digest in digests.items()
+            if prior_digests.get(period) != digest
+        }
+    )
+
+    periods = robjects.StrVector(list(digests))
+    if not years:
+        return with_digests(robjects.r(SPLICE)(prior, periods), digests)
+
+    subset = robjects.r(SUBSET_YEARS)(ci, robjects.StrVector(years))
+    recomputed = climdex_func(subset, *args, **kwargs)
+    return with_digests(robjects.r(SPLICE)(prior, periods, recomputed), digests)
+
+
+def compute_index_incremental(item, func, *args, **kwargs):
+    """Incremental counterpart of `quail.utils.compute_index`. `item` is a
+    tuple of an input file and a dictionary of the prior vectors of its
+    climdexInputs by name (see `incremental_items`). Returns a dictionary of
+    the results by climdexInput name. Meant to be dispatched to an R worker
+    with `quail.workers.map_in_workers`.
+    """
+    r_file, previous = item
+    climdex_func = robjects.r[func]
+    context = repr((func, args, sorted(kwargs.items())))
+    results = {}
+
+    for ci_name, ci in load_cis(r_file).items():
+        try:
+            ci_context = context + quantiles_digest(ci, INDEX_QUANTILES.get(func))
+            results[ci_name] = update_index(
+                ci, previous.get(ci_name), climdex_func, ci_context, *args, **kwargs
+            )
+        except RRuntimeError as e:
+            raise ProcessError(msg=f"{type(e).__name__} in file {r_file}: {str(e)}")
+
+    return results
+
+
+def incremental_items(climdex_input, previous_output, prefix):
+    """Pairs each input file with its vectors in the `previous_output` Rdata
+    file, which are named "<prefix><counter>_<climdexInput name>" like the
+    outputs of the index processes. Without a `previous_output` the files
+    have no prior vectors, and all their periods are computed. Returns a list
+    of (file, {climdexInput name: vector}) tuples for
+    `compute_index_incremental`.
+    """
+    if not previous_output:
+        return [(r_file, {}) for r_file in climdex_input]
+
+    try:
+        previous = load_rdata(previous_output)
+    except RRuntimeError as e:
+        raise ProcessError(
+            msg=f"{type(e).__name__}: previous_output must be an Rdata file"
+        )
+    items = []
+
+    for counter, r_file in enumerate(climdex_input, start=1):
+        vector_prefix = f"{prefix}{counter}_"
+        items.append(
+            (
+                r_file,
+                {
+                    name.removeprefix(vector_prefix): previous[name]
+                    for name in previous.keys()
+                    if name.startswith(vector_prefix)
+                },
+            )
+        )
+
+    return items
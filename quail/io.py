@@ -1,4 +1,4 @@
-from pywps import LiteralInput, ComplexInput, ComplexOutput, Format
+from pywps import LiteralInput, ComplexInput, LiteralOutput, ComplexOutput, Format
 from wps_tools.io import log_level
 
 
@@ -30,6 +30,33 @@ output_file = LiteralInput(
     data_type="string",
 )
 
+output_format = LiteralInput(
+    "output_format",
+    "Output file format",
+    abstract="Format of the output file: an Rdata file ('rda', rda_output), a CF "
+    "NetCDF4 file ('netcdf', netcdf_output) with a time axis built from the periods "
+    "of the index vectors, a Parquet table ('parquet', parquet_output) with a row "
+    "per value, or JSON returned in the response ('json', json_output) for small "
+    "results. All but the first can be read without R.",
+    allowed_values=["rda", "netcdf", "parquet", "json"],
+    default="rda",
+    min_occurs=0,
+    max_occurs=1,
+    data_type="string",
+)
+
+previous_output = ComplexInput(
+    "previous_output",
+    "Previous output file",
+    abstract="Rdata file output by an earlier run of this process with the same "
+    "arguments. Its vectors are updated incrementally: only the years whose daily "
+    "data changed, or that are new, are recomputed. Vectors without period "
+    "digests, saved by older versions of quail, are recomputed in full.",
+    min_occurs=0,
+    max_occurs=1,
+    supported_formats=[Format("application/x-gzip", encoding="base64")],
+)
+
 rda_output = ComplexOutput(
     "rda_output",
     "Rda output file",
@@ -128,6 +155,17 @@ quantiles = LiteralInput(
     data_type="string",
 )
 
+quantiles_file = ComplexInput(
+    "quantiles_file",
+    "baseline quantiles file",
+    abstract="Rdata file of baseline quantiles saved by an earlier climdexInput build "
+    "(its quantiles_output). They are reused if the base period data and quantile "
+    "parameters are unchanged, instead of being computed again.",
+    min_occurs=0,
+    max_occurs=1,
+    supported_formats=[Format("application/x-gzip", encoding="base64")],
+)
+
 temp_qtiles = LiteralInput(
     "temp_qtiles",
     "precipitation quantiles",
@@ -179,6 +217,47 @@ ci_output = ComplexOutput(
     ],
 )
 
+quantiles_output = ComplexOutput(
+    "quantiles_output",
+    "baseline quantiles",
+    abstract="Output R data file of the baseline quantiles of the generated climdexInput, "
+    "to pass as quantiles_file when rebuilding it with more data",
+    supported_formats=[
+        Format("application/x-gzip", extension=".rda", encoding="base64")
+    ],
+)
+
+netcdf_output = ComplexOutput(
+    "netcdf_output",
+    "NetCDF output file",
+    abstract="NetCDF file of the computed indices, one variable per index vector (per "
+    "index on the input grid for gridded input) with a time dimension of its annual or "
+    "monthly periods",
+    supported_formats=[
+        Format("application/x-netcdf", extension=".nc", encoding="base64")
+    ],
+)
+
+parquet_output = ComplexOutput(
+    "parquet_output",
+    "Parquet output file",
+    abstract="Parquet file of the computed indices as one table, with a row for each "
+    "value and columns file, station (climdexInput name), index, period and value",
+    supported_formats=[
+        Format(
+            "application/vnd.apache.parquet", extension=".parquet", encoding="base64"
+        )
+    ],
+)
+
+json_output = LiteralOutput(
+    "json_output",
+    "JSON output",
+    abstract="JSON object of the computed index vectors by name, each mapping its "
+    "periods to its values, returned in the response for small results",
+    data_type="string",
+)
+
 freq = LiteralInput(
     "freq",
     "Frequency",
@@ -328,6 +407,18 @@ days_type = LiteralInput(
     data_type="string",
 )
 
+engine = LiteralInput(
+    "engine",
+    "Computation engine",
+    abstract="Compute the index with the climdex.pcic R function ('R') or with "
+    "quail's NumPy implementation of it ('numpy'), which gives the same results.",
+    allowed_values=["R", "numpy"],
+    default="R",
+    min_occurs=0,
+    max_occurs=1,
+    data_type="string",
+)
+
 ci_name = LiteralInput(
     "ci_name",
     "climdexInput name",
@@ -455,6 +546,72 @@ temp_pctl_func = LiteralInput(
     data_type="string",
 )
 
+indices = LiteralInput(
+    "indices",
+    "Indices to compute",
+    abstract="Climdex indices to compute, each optionally followed by arguments "
+    "for its climdex.pcic function, e.g. 'su', 'rnnmm(threshold=15)', "
+    "'rx5day(freq=annual, center_mean_on_last_day=TRUE)'. Arguments may also be "
+    "written name:value.",
+    min_occurs=1,
+    max_occurs=30,
+    data_type="string",
+)
+
+netcdf_file = ComplexInput(
+    "netcdf_file",
+    "gridded daily data file",
+    abstract="NetCDF file of daily maximum and minimum temperature and precipitation "
+    "on a grid, with dimensions of time and two grid dimensions (e.g. lat and lon). "
+    "Temperatures in K or degC and precipitation in kg m-2 s-1 or mm/day are converted.",
+    min_occurs=1,
+    max_occurs=1,
+    supported_formats=[Format("application/x-netcdf", extension=".nc")],
+)
+
+tasmax_var = LiteralInput(
+    "tasmax_var",
+    "tasmax variable",
+    default="tasmax",
+    abstract="Name of the NetCDF variable of daily maximum temperature.",
+    data_type="string",
+)
+
+tasmin_var = LiteralInput(
+    "tasmin_var",
+    "tasmin variable",
+    default="tasmin",
+    abstract="Name of the NetCDF variable of daily minimum temperature.",
+    data_type="string",
+)
+
+pr_var = LiteralInput(
+    "pr_var",
+    "pr variable",
+    default="pr",
+    abstract="Name of the NetCDF variable of daily precipitation.",
+    data_type="string",
+)
+
+chunk_size = LiteralInput(
+    "chunk_size",
+    "cells per block",
+    default=100,
+    abstract="Number of grid cells read and computed together by each worker. "
+    "Memory use grows with it and with the number of blocks in flight.",
+    data_type="integer",
+)
+
+nc_output_file = LiteralInput(
+    "output_file",
+    "Output file name",
+    abstract="Filename to store the output NetCDF (extension .nc)",
+    min_occurs=0,
+    max_occurs=1,
+    default="output.nc",
+    data_type="string",
+)
+
 csv_inputs = [
     tmax_file_content,
     tmin_file_content,
@@ -472,6 +629,7 @@ csv_inputs = [
     n,
     northern_hemisphere,
     quantiles,
+    quantiles_file,
     temp_qtiles,
     prec_qtiles,
     max_missing_days,
@@ -501,6 +659,7 @@ raw_inputs = [
     n,
     northern_hemisphere,
     quantiles,
+    quantiles_file,
     temp_qtiles,
     prec_qtiles,
     max_missing_days,
@@ -510,16 +669,38 @@ raw_inputs = [
     log_level,
 ]
 
+append_inputs = [
+    climdex_single_input,
+    ci_name,
+    tmax_file_content,
+    tmin_file_content,
+    prec_file_content,
+    tavg_file_content,
+    na_strings,
+    tmax_column,
+    tmin_column,
+    prec_column,
+    tavg_column,
+    date_fields,
+    date_format,
+    output_file,
+    vector_name,
+    log_level,
+]
+
 days_inputs = [
     climdex_input,
     output_file,
+    output_format,
     days_type,
+    engine,
     log_level,
 ]
 
 dtr_inputs = [
     climdex_input,
     output_file,
+    output_format,
     freq,
     log_level,
 ]
@@ -531,11 +712,13 @@ avail_indices_inputs = [
     log_level,
 ]
 
-gsl_inputs = [climdex_input, output_file, gsl_mode, log_level]
+gsl_inputs = [climdex_input, output_file, output_format, gsl_mode, log_level]
 
 mmdmt_inputs = [
     climdex_input,
     output_file,
+    output_format,
+    previous_output,
     month_type,
     freq,
     log_level,
@@ -544,6 +727,8 @@ mmdmt_inputs = [
 ptot_inputs = [
     climdex_input,
     output_file,
+    output_format,
+    previous_output,
     threshold,
     log_level,
 ]
@@ -553,6 +738,7 @@ quantile_inputs = [
     data_vector,
     quantiles_vector,
     output_file,
+    output_format,
     vector_name,
     log_level,
 ]
@@ -560,6 +746,7 @@ quantile_inputs = [
 rmm_inputs = [
     climdex_input,
     output_file,
+    output_format,
     mm_threshold,
     log_level,
 ]
@@ -567,30 +754,64 @@ rmm_inputs = [
 rxnday_inputs = [
     climdex_input,
     output_file,
+    output_format,
     freq,
     num_days,
     center_mean_on_last_day,
+    engine,
     log_level,
 ]
 
 sdii_inputs = [
     climdex_input,
     output_file,
+    output_format,
+    previous_output,
     log_level,
 ]
 
 spells_inputs = [
     climdex_input,
     output_file,
+    output_format,
     wsdi_func,
     span_years,
+    engine,
     log_level,
 ]
 
 temp_pctl_inputs = [
     climdex_input,
     output_file,
+    output_format,
     temp_pctl_func,
     freq,
     log_level,
 ]
+
+batch_inputs = [
+    climdex_input,
+    output_file,
+    output_format,
+    indices,
+    engine,
+    log_level,
+]
+
+gridded_inputs = [
+    netcdf_file,
+    tasmax_var,
+    tasmin_var,
+    pr_var,
+    indices,
+    base_range,
+    n,
+    northern_hemisphere,
+    temp_qtiles,
+    prec_qtiles,
+    max_missing_days,
+    min_base_data_fraction_present,
+    chunk_size,
+    nc_output_file,
+    log_level,
+]
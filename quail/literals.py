@@ -0,0 +1,212 @@
+"""
+R vector literals in Python.
+
+Process inputs such as ``base_range``, ``temp_qtiles`` or
+``max_missing_days`` are R vectors written as text, e.g. ``c(1961, 1990)``
+or ``c(annual = 15, monthly = 3)``. They are parsed here rather than
+evaluated by R, so that a request is validated before it reaches an R
+worker and no R code in an input is ever run. The subset accepted is a
+single constant or a flat ``c(...)`` of constants, each optionally named:
+numbers (with an ``L`` suffix for integers), quoted strings, ``TRUE``,
+``FALSE``, ``NA``, ``Inf`` and ``NaN``. Elements of different types are
+coerced to a common type as R would.
+"""
+
+import re
+from dataclasses import dataclass
+from pywps.app.exceptions import ProcessError
+from rpy2 import robjects
+
+
+INVALID_VECTOR = "RParsingError: Invalid vector format, follow R vector syntax"
+
+TOKEN = re.compile(
+    r"""\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?L?)
+    |(?P<name>(?:[A-Za-z]|\.(?![0-9]))[A-Za-z0-9._]*)
+    |(?P<symbol>[-+(),=])
+    )""",
+    re.VERBOSE,
+)
+
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0"}
+
+CONSTANTS = {
+    "TRUE": ("logical", True),
+    "T": ("logical", True),
+    "FALSE": ("logical", False),
+    "F": ("logical", False),
+    "NA": ("logical", None),
+    "NA_integer_": ("integer", None),
+    "NA_real_": ("double", None),
+    "NA_character_": ("character", None),
+    "Inf": ("double", float("inf")),
+    "NaN": ("double", float("nan")),
+}
+
+# Vector types from the lowest to the highest in R's coercion order
+TYPES = ("logical", "integer", "double", "character")
+
+
+@dataclass
+class RVector:
+    type: str
+    values: list
+    names: list = None
+
+
+def tokenize(text):
+    """Returns the (kind, text) tokens of `text`"""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ProcessError(INVALID_VECTOR)
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def unquote(string):
+    """Returns the value of a quoted R string"""
+    return re.sub(r"\\(.)", lambda match: ESCAPES.get(match[1], match[1]), string[1:-1])
+
+
+def constant(tokens, position):
+    """Returns the (type, value) of the constant at `position` in `tokens`,
+    and the position after it
+    """
+    sign = 1
+    while position < len(tokens) and tokens[position][1] in "+-":
+        sign = -sign if tokens[position][1] == "-" else sign
+        position += 1
+    if position == len(tokens):
+        raise ProcessError(INVALID_VECTOR)
+
+    kind, text = tokens[position]
+    signed = position > 0 and tokens[position - 1][1] in "+-"
+    if kind == "number":
+        value = float(text.rstrip("L"))
+        if text.endswith("L") and value.is_integer():
+            return ("integer", sign * int(value)), position + 1
+        return ("double", sign * value), position + 1
+    elif kind == "string" and not signed:
+        return ("character", unquote(text)), position + 1
+    elif kind == "name" and text in CONSTANTS:
+        type_, value = CONSTANTS[text]
+        if signed:
+            if type_ == "character":
+                raise ProcessError(INVALID_VECTOR)
+            # Arithmetic on logicals gives integers, as in R
+            type_ = "integer" if type_ == "logical" else type_
+            value = None if value is None else sign * value
+        return (type_, value), position + 1
+
+    raise ProcessError(INVALID_VECTOR)
+
+
+def elements(tokens):
+    """Returns the (name, type, value) elements of the ``c(...)`` call in
+    `tokens`
+    """
+    position = 2
+    items = []
+    if tokens[position:] == [("symbol", ")")]:
+        # c() is NULL, which is not a vector
+        raise ProcessError(INVALID_VECTOR)
+
+    while True:
+        name = ""
+        if (
+            position + 1 < len(tokens)
+            and tokens[position][0] in ("name", "string")
+            and tokens[position + 1] == ("symbol", "=")
+        ):
+            kind, text = tokens[position]
+            name = unquote(text) if kind == "string" else text
+            position += 2
+
+        (type_, value), position = constant(tokens, position)
+        items.append((name, type_, value))
+
+        if position >= len(tokens):
+            raise ProcessError(INVALID_VECTOR)
+        if tokens[position] == ("symbol", ")") and position == len(tokens) - 1:
+            return items
+        if tokens[position] != ("symbol", ","):
+            raise ProcessError(INVALID_VECTOR)
+        position += 1
+
+
+def as_character(type_, value):
+    """Returns `value` of `type_` as R's as.character would"""
+    if value is None or type_ == "character":
+        return value
+    elif type_ == "logical":
+        return "TRUE" if value else "FALSE"
+    elif value != value:
+        return "NaN"
+    elif value in (float("inf"), float("-inf")):
+        return "Inf" if value > 0 else "-Inf"
+    return f"{value:.15g}"
+
+
+def coerce(type_, value, to):
+    """Returns `value` of `type_` coerced to the type `to`"""
+    if value is None or type_ == to:
+        return value
+    elif to == "character":
+        return as_character(type_, value)
+    elif to == "double":
+        return float(value)
+    return int(value)
+
+
+def parse_vector(text):
+    """Parses the R vector literal `text` into an RVector. Raises a
+    ProcessError if `text` is not a constant or a ``c(...)`` of constants.
+    """
+    tokens = tokenize(text)
+    if len(tokens) > 2 and tokens[:2] == [("name", "c"), ("symbol", "(")]:
+        items = elements(tokens)
+    else:
+        (type_, value), position = constant(tokens, 0)
+        if position != len(tokens):
+            raise ProcessError(INVALID_VECTOR)
+        items = [("", type_, value)]
+
+    type_ = max((item[1] for item in items), key=TYPES.index)
+    values = [coerce(item_type, value, type_) for _, item_type, value in items]
+    names = [name for name, _, _ in items]
+    return RVector(type_, values, names if any(names) else None)
+
+
+def r_vector(text):
+    """Returns the R vector of the literal `text` (see `parse_vector`),
+    built without evaluating `text` in R
+    """
+    vector = parse_vector(text)
+    if vector.type == "character":
+        result = robjects.StrVector(
+            [robjects.NA_Character if v is None else v for v in vector.values]
+        )
+    elif vector.type == "double":
+        result = robjects.FloatVector(
+            [robjects.NA_Real if v is None else v for v in vector.values]
+        )
+    elif vector.type == "integer":
+        result = robjects.IntVector(
+            [robjects.NA_Integer if v is None else v for v in vector.values]
+        )
+    else:
+        result = robjects.BoolVector(
+            [robjects.NA_Logical if v is None else v for v in vector.values]
+        )
+
+    if vector.names is not None:
+        result.names = robjects.StrVector(vector.names)
+    return result
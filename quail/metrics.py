@@ -0,0 +1,180 @@
+"""
+Prometheus metrics of process requests.
+
+Every request of a ``ScheduledProcess`` is timed step by step: a step
+(``load_rdata``, ``process``, ``save_rdata``, ``build_output``, ...) starts
+when the handler logs it with ``log_handler`` and lasts until the next step
+is logged. Along with the step durations, the total duration of each request,
+the size of its input files and, with the ``r_memory_metrics`` option, the
+peak R memory of each task run by the R workers are kept as histograms
+labelled by process, and served in the Prometheus text format at
+``/metrics``.
+
+When the server runs in several processes (e.g. gunicorn workers), set the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable to an empty directory so
+that ``/metrics`` adds up the metrics of all of them.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from contextlib import contextmanager
+from pywps import ComplexInput, configuration
+from prometheus_client import CollectorRegistry, Histogram, make_wsgi_app
+from prometheus_client import multiprocess
+from wps_tools.logging import log_handler as wps_log_handler
+
+
+REGISTRY = CollectorRegistry()
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# 1 KiB to 4 GiB
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(12))
+
+# Bytes per R cons cell and vector cell, as in the output of gc()
+R_CELL_BYTES = "c(56, 8)"
+
+STEP_SECONDS = Histogram(
+    "quail_step_duration_seconds",
+    "Duration of each step of a process request",
+    ["process", "step"],
+    buckets=DURATION_BUCKETS,
+    registry=REGISTRY,
+)
+REQUEST_SECONDS = Histogram(
+    "quail_request_duration_seconds",
+    "Duration of process requests",
+    ["process", "status"],
+    buckets=DURATION_BUCKETS,
+    registry=REGISTRY,
+)
+INPUT_BYTES = Histogram(
+    "quail_input_size_bytes",
+    "Total size of the input files of process requests",
+    ["process"],
+    buckets=SIZE_BUCKETS,
+    registry=REGISTRY,
+)
+R_MEMORY_BYTES = Histogram(
+    "quail_r_memory_peak_bytes",
+    "Peak R memory use of the tasks run by the R workers",
+    ["process"],
+    buckets=SIZE_BUCKETS,
+    registry=REGISTRY,
+)
+
+
+class StepTimer:
+    """Times the steps of a request of `process`"""
+
+    def __init__(self, process):
+        self.process = process
+        self.started = time.perf_counter()
+        self.step_name = None
+        self.step_started = self.started
+
+    def step(self, name):
+        """Ends the current step, if `name` is a new one, and starts `name`"""
+        if name == self.step_name:
+            return
+
+        now = time.perf_counter()
+        if self.step_name is not None:
+            STEP_SECONDS.labels(self.process, self.step_name).observe(
+                now - self.step_started
+            )
+        self.step_name = None if name == "complete" else name
+        self.step_started = now
+
+    def finish(self, status, input_size=None):
+        """Ends the current step and the request, which ended with `status`"""
+        self.step("complete")
+        REQUEST_SECONDS.labels(self.process, status).observe(
+            time.perf_counter() - self.started
+        )
+        if input_size is not None:
+            INPUT_BYTES.labels(self.process).observe(input_size)
+
+
+_current_timer = ContextVar("current_timer", default=None)
+
+
+@contextmanager
+def timed(process):
+    """Times the enclosed request of `process` with a StepTimer"""
+    timer = StepTimer(process)
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+def log_handler(
+    process, response, message, logger, log_level="DEBUG", process_step=None
+):
+    """wps_tools ``log_handler``, which also starts timing `process_step`"""
+    timer = _current_timer.get()
+    if timer is not None and process_step is not None:
+        timer.step(process_step)
+
+    wps_log_handler(
+        process,
+        response,
+        message,
+        logger,
+        log_level=log_level,
+        process_step=process_step,
+    )
+
+
+def input_size(wps_request):
+    """Returns the total size in bytes of the complex inputs of a request that
+    have been read into files
+    """
+    size = 0
+    for inputs in wps_request.inputs.values():
+        for inpt in inputs:
+            if isinstance(inpt, ComplexInput):
+                try:
+                    size += os.path.getsize(inpt.file)
+                except (OSError, TypeError):
+                    pass
+    return size
+
+
+def r_memory_enabled():
+    """Returns whether the peak R memory of tasks is recorded, which takes two
+    R garbage collections per task (the ``r_memory_metrics`` option)
+    """
+    return bool(configuration.get_config_value("quail", "r_memory_metrics", False))
+
+
+def reset_r_memory():
+    """Resets the peak R memory use to the current use"""
+    from rpy2 import robjects
+
+    robjects.r("invisible(gc(reset = TRUE))")
+
+
+def r_memory_peak():
+    """Returns the peak R memory use in bytes since the last reset"""
+    from rpy2 import robjects
+
+    return robjects.r(f'sum(gc()[, "max used"] * {R_CELL_BYTES})')[0]
+
+
+def observe_r_memory(peak):
+    """Records the peak R memory of a task of the current request"""
+    timer = _current_timer.get()
+    process = timer.process if timer is not None else ""
+    R_MEMORY_BYTES.labels(process).observe(peak)
+
+
+def metrics_app():
+    """Returns a WSGI application serving the metrics"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return make_wsgi_app(registry)
+    return make_wsgi_app(REGISTRY)
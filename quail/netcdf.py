@@ -0,0 +1,144 @@
+"""
+CF-compliant NetCDF output of climdex index vectors.
+
+Index vectors are named by the periods they cover ("1991" for years,
+"1991-01" for months), which become the time coordinates of the NetCDF
+variables, with bounds from the start of each period to the start of the
+next. Vectors of the same frequency share one time dimension spanning all of
+their periods, so the variables of several stations or indices line up and
+can be sliced by time without reading the others.
+"""
+
+import re
+import numpy as np
+from cftime import datetime as cf_datetime
+from netCDF4 import Dataset, date2num
+from rpy2 import robjects
+
+
+CONVENTIONS = "CF-1.8"
+FILL_VALUE = 1.0e20
+
+PERIOD = re.compile(r"^\d{4}(-\d{2})?$")
+
+
+def is_periods(names):
+    """Returns whether index vector `names` are year or month periods"""
+    return len(names) > 0 and all(PERIOD.match(name) for name in names)
+
+
+def period_freq(periods):
+    """Returns the frequency of index values named by `periods`"""
+    return "monthly" if "-" in periods[0] else "annual"
+
+
+def period_bounds(periods, calendar="standard"):
+    """Returns the start and end dates of each period, as two lists of cftime
+    datetimes in `calendar`
+    """
+    starts, ends = [], []
+    for period in periods:
+        year, month = int(period[:4]), int(period[5:7] or 0)
+        if month:
+            start = (year, month)
+            end = (year + month // 12, month % 12 + 1)
+        else:
+            start, end = (year, 1), (year + 1, 1)
+        starts.append(cf_datetime(*start, 1, calendar=calendar))
+        ends.append(cf_datetime(*end, 1, calendar=calendar))
+
+    return starts, ends
+
+
+def create_time(nc, dim, periods, calendar="standard"):
+    """Creates the time dimension `dim` of `periods` in the NetCDF dataset
+    `nc`, with a coordinate variable of the start of each period and a bounds
+    variable
+    """
+    starts, ends = period_bounds(periods, calendar)
+    units = f"days since {periods[0][:4]}-01-01 00:00:00"
+
+    if "bnds" not in nc.dimensions:
+        nc.createDimension("bnds", 2)
+    nc.createDimension(dim, len(periods))
+
+    time = nc.createVariable(dim, "f8", (dim,))
+    time.setncatts(
+        {
+            "units": units,
+            "calendar": calendar,
+            "standard_name": "time",
+            "axis": "T",
+            "bounds": f"{dim}_bnds",
+        }
+    )
+    time[:] = date2num(starts, units, calendar=calendar)
+
+    bounds = nc.createVariable(f"{dim}_bnds", "f8", (dim, "bnds"))
+    bounds[:] = np.column_stack(
+        [
+            date2num(starts, units, calendar=calendar),
+            date2num(ends, units, calendar=calendar),
+        ]
+    )
+
+
+def vector_values(vector):
+    """Returns the values of an R index vector as a float array, with NaN for
+    NA values, and its names (or None)
+    """
+    values = np.array(robjects.r["as.numeric"](vector), dtype=float)
+    names = robjects.r["names"](vector)
+    if robjects.r["is.null"](names)[0]:
+        return values, None
+    return values, list(names)
+
+
+def save_netcdf(env, vectors, output_path):
+    """Saves the index `vectors` in the R environment `env` to a NetCDF4 file
+    with one compressed variable per vector. Vectors named by year or month
+    are put on an annual ("time_annual") or monthly ("time_monthly") time
+    axis; any other vector gets a dimension of its own.
+    """
+    contents = {name: vector_values(env[name]) for name in vectors}
+    freqs = {}
+    for name, (_, names) in contents.items():
+        if names is not None and is_periods(names):
+            freqs.setdefault(period_freq(names), set()).update(names)
+
+    with Dataset(output_path, "w", format="NETCDF4") as nc:
+        nc.setncatts(
+            {
+                "Conventions": CONVENTIONS,
+                "title": "Climdex indices",
+                "source": "quail",
+            }
+        )
+        periods = {}
+        for freq, names in sorted(freqs.items()):
+            periods[freq] = {period: i for i, period in enumerate(sorted(names))}
+            create_time(nc, f"time_{freq}", list(periods[freq]))
+
+        for name, (values, names) in contents.items():
+            if names is not None and is_periods(names):
+                freq = period_freq(names)
+                dim = f"time_{freq}"
+                data = np.full(len(periods[freq]), np.nan)
+                data[[periods[freq][period] for period in names]] = values
+            else:
+                dim = f"n_{name}"
+                nc.createDimension(dim, len(values))
+                data = values
+
+            variable = nc.createVariable(
+                name,
+                "f8",
+                (dim,),
+                zlib=True,
+                complevel=4,
+                shuffle=True,
+                chunksizes=(max(1, len(data)),),
+                fill_value=FILL_VALUE,
+            )
+            variable.long_name = name
+            variable[:] = np.ma.masked_invalid(data)
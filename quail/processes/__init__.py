@@ -1,7 +1,15 @@
+"""
+The processes served by quail. Their modules import only pywps and the
+process inputs and outputs at the top level; the modules that use R are
+imported by the handlers and by the functions run in the R workers, so that
+answering GetCapabilities and DescribeProcess requests does not start R.
+"""
+
 from .wps_climdex_days import ClimdexDays
 from .wps_climdex_gsl import ClimdexGSL
 from .wps_climdexInput_csv import ClimdexInputCSV
 from .wps_climdexInput_raw import ClimdexInputRaw
+from .wps_climdexInput_append import ClimdexInputAppend
 from .wps_climdex_mmdmt import ClimdexMMDMT
 from .wps_climdex_rmm import ClimdexRMM
 from .wps_climdex_spells import ClimdexSpells
@@ -12,12 +20,15 @@ from .wps_climdex_ptot import ClimdexPtot
 from .wps_climdex_quantile import ClimdexQuantile
 from .wps_climdex_sdii import ClimdexSDII
 from .wps_climdex_rxnday import ClimdexRxnday
+from .wps_climdex_batch import ClimdexBatch
+from .wps_climdex_gridded import ClimdexGridded
 
 processes = [
     ClimdexDays(),
     ClimdexGSL(),
     ClimdexInputCSV(),
     ClimdexInputRaw(),
+    ClimdexInputAppend(),
     ClimdexMMDMT(),
     ClimdexRMM(),
     ClimdexSpells(),
@@ -28,4 +39,14 @@ processes = [
     ClimdexQuantile(),
     ClimdexSDII(),
     ClimdexRxnday(),
+    ClimdexBatch(),
+    ClimdexGridded(),
 ]
+
+# climdex.pcic indices computed by each process, keyed by module name as in
+# the output of climdex_get_available_indices
+index_processes = {
+    type(process).__module__.split(".")[-1]: process.climdex_indices
+    for process in processes
+    if getattr(process, "climdex_indices", None)
+}
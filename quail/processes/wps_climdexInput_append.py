@@ -0,0 +1,279 @@
+import os
+from pywps.app.Common import Metadata
+from pywps.app.exceptions import ProcessError
+from rpy2.rinterface_lib.embedded import RRuntimeError
+
+from wps_tools.logging import common_status_percentages
+from wps_tools.io import process_inputs_alpha
+
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import run_in_worker
+from quail.io import append_inputs, ci_output
+from quail.processes.wps_climdexInput_csv import prepare_parameters
+
+
+# Extends the daily slots of a climdexInput with new observations, the way
+# climdexInput.raw lays them out: whole years of days, NA where there is no
+# data, and tavg as the mean of tmax and tmin unless it is given. Only the
+# years from the first new observation on are recomputed; earlier days, and
+# the baseline quantiles, are kept as they are.
+APPEND_DATA = """
+function(ci, data, dates) {
+    if (length(unlist(dates)) == 0) {
+        stop("No new observations to append")
+    }
+    cal <- attr(ci@dates, "cal")
+    year <- function(d) as.numeric(format(d, "%Y", tz="GMT"))
+    series.years <- year(ci@dates[c(1, length(ci@dates))])
+    new.years <- range(unlist(lapply(dates, year)))
+
+    if (new.years[1] <= year(ci@base.range[2])) {
+        stop("New data is in the base period, the climdexInput must be rebuilt")
+    }
+    if (!all(names(data) %in% names(ci@data))) {
+        stop("climdexInput has no ", paste(setdiff(names(data), names(ci@data)), collapse=", "), " data")
+    }
+
+    start.year <- min(new.years[1], series.years[2] + 1)
+    end.year <- max(new.years[2], series.years[2])
+    last.day <- climdex.pcic:::get.last.monthday.of.year(cal)
+    tail.dates <- seq(
+        as.PCICt(paste0(start.year, "-01-01"), cal=cal),
+        as.PCICt(paste(end.year, last.day, sep="-"), cal=cal),
+        by="day"
+    )
+    n.keep <- sum(ci@dates < tail.dates[1])
+    n.old <- length(ci@dates) - n.keep
+    n.keep.years <- start.year - series.years[1]
+
+    tail.data <- sapply(names(ci@data), function(v) {
+        x <- rep(NA_real_, length(tail.dates))
+        x[seq_len(n.old)] <- ci@data[[v]][n.keep + seq_len(n.old)]
+        if (!is.null(data[[v]])) {
+            days <- as.numeric(trunc(dates[[v]], "days") - tail.dates[1], units="days")
+            x[floor(days) + 1] <- data[[v]]
+        }
+        x
+    }, simplify=FALSE)
+    derived.tavg <- all(c("tmax", "tmin", "tavg") %in% names(tail.data))
+    if (is.null(data$tavg) && derived.tavg && any(c("tmax", "tmin") %in% names(data))) {
+        tail.data$tavg <- (tail.data$tmax + tail.data$tmin) / 2
+    }
+
+    tail.factors <- list(
+        annual=factor(format(tail.dates, format="%Y", tz="GMT")),
+        monthly=factor(format(tail.dates, format="%Y-%m", tz="GMT"))
+    )
+    n.keep.levels <- c(annual=n.keep.years, monthly=n.keep.years * 12)
+    date.factors <- sapply(names(tail.factors), function(f) {
+        old <- ci@date.factors[[f]]
+        n.levels <- n.keep.levels[[f]]
+        structure(
+            c(as.integer(old)[seq_len(n.keep)], as.integer(tail.factors[[f]]) + n.levels),
+            levels=c(levels(old)[seq_len(n.levels)], levels(tail.factors[[f]])),
+            class="factor"
+        )
+    }, simplify=FALSE)
+
+    get.na.mask <- climdex.pcic:::get.na.mask
+    max.missing.days <- ci@max.missing.days
+    monthly <- lapply(tail.data, get.na.mask, tail.factors$monthly, max.missing.days["monthly"])
+    annual <- sapply(names(tail.data), function(v) {
+        d <- get.na.mask(tail.data[[v]], tail.factors$annual, max.missing.days["annual"])
+        d <- d * as.numeric(tapply(monthly[[v]], rep(seq_along(d), each=12), prod))
+        dimnames(d) <- dim(d) <- NULL
+        d
+    }, simplify=FALSE)
+    namasks <- list(
+        annual=sapply(names(annual), function(v) {
+            c(ci@namasks$annual[[v]][seq_len(n.keep.years)], annual[[v]])
+        }, simplify=FALSE),
+        monthly=sapply(names(monthly), function(v) {
+            c(ci@namasks$monthly[[v]][seq_len(n.keep.years * 12)], monthly[[v]])
+        }, simplify=FALSE)
+    )
+
+    tail.jdays <- climdex.pcic:::get.jdays.replaced.feb29(climdex.pcic:::get.jdays(tail.dates))
+
+    ci@data <- sapply(names(ci@data), function(v) c(ci@data[[v]][seq_len(n.keep)], tail.data[[v]]), simplify=FALSE)
+    ci@namasks <- namasks
+    ci@dates <- c(ci@dates[seq_len(n.keep)], tail.dates)
+    ci@jdays <- c(ci@jdays[seq_len(n.keep)], tail.jdays)
+    ci@date.factors <- date.factors
+    ci
+}
+"""
+
+
+def climdex_input_append(
+    r_file, ci_name, data_contents, columns, date_fields, date_format, na_strings
+):
+    """Appends the daily observations in `data_contents` (CSV content by
+    variable) to the climdexInput `ci_name` in `r_file`. Runs in an R worker.
+    """
+    from rpy2 import robjects
+    from quail.utils import get_robj
+
+    ci = get_robj(r_file, ci_name)
+    if ci.rclass[0] != "climdexInput":
+        raise ProcessError(f"{ci_name} is not a climdexInput")
+
+    cal = robjects.r["attr"](ci.slots["dates"], "cal")[0]
+    params = prepare_parameters(
+        data_contents, columns, date_fields, date_format, cal, na_strings
+    )
+    data = robjects.ListVector(
+        {var: vector for var, vector in params.items() if var in data_contents}
+    )
+    dates = robjects.ListVector({var: params[f"{var}_dates"] for var in data_contents})
+
+    try:
+        return robjects.r(APPEND_DATA)(ci, data, dates)
+    except RRuntimeError as e:
+        raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+
+
+class ClimdexInputAppend(ScheduledProcess):
+    """
+    Process for appending new daily observations to an existing
+    climdexInput object
+    """
+
+    queue = "build"
+
+    def __init__(self):
+        self.status_percentage_steps = dict(
+            common_status_percentages,
+            **{
+                "prepare_params": 10,
+                "save_rdata": 90,
+            },
+        )
+        inputs = append_inputs
+        outputs = [ci_output]
+
+        super(ClimdexInputAppend, self).__init__(
+            self._handler,
+            identifier="climdex_input_append",
+            title="climdexInput append",
+            abstract="Process for appending new daily observations (CSV content) to an "
+            "existing climdexInput object, keeping its baseline quantiles. Only the "
+            "years from the first new observation on are recomputed.",
+            metadata=[
+                Metadata("NetCDF processing"),
+                Metadata("Climate Data Operations"),
+                Metadata("PyWPS", "https://pywps.org/"),
+                Metadata("Birdhouse", "http://bird-house.github.io/"),
+                Metadata("PyWPS Demo", "https://pywps-demo.readthedocs.io/en/latest/"),
+            ],
+            inputs=inputs,
+            outputs=outputs,
+            store_supported=True,
+            status_supported=True,
+        )
+
+    def _handler(self, request, response):
+        from wps_tools.R import r_valid_name
+        from quail.utils import logger, validate_vectors, save_rdata
+
+        (
+            ci_name,
+            climdex_input,
+            date_fields,
+            date_format,
+            loglevel,
+            na_strings,
+            output_file,
+            prec_column,
+            prec_file_content,
+            tavg_column,
+            tavg_file_content,
+            tmax_column,
+            tmax_file_content,
+            tmin_column,
+            tmin_file_content,
+            vector_name,
+        ) = process_inputs_alpha(request.inputs, append_inputs, self.workdir)
+
+        validate_vectors([date_fields])
+
+        log_handler(
+            self,
+            response,
+            "Starting Process",
+            logger,
+            log_level=loglevel,
+            process_step="start",
+        )
+
+        log_handler(
+            self,
+            response,
+            "Prepare parameters for climdexInput append",
+            logger,
+            log_level=loglevel,
+            process_step="prepare_params",
+        )
+        data_contents = {
+            var: content
+            for var, content in (
+                ("tmax", tmax_file_content),
+                ("tmin", tmin_file_content),
+                ("prec", prec_file_content),
+                ("tavg", tavg_file_content),
+            )
+            if content
+        }
+        if not data_contents:
+            raise ProcessError(
+                "You must provide the file content of at least one variable"
+            )
+
+        log_handler(
+            self,
+            response,
+            "Appending data to climdexInput",
+            logger,
+            log_level=loglevel,
+            process_step="process",
+        )
+        ci = run_in_worker(
+            climdex_input_append,
+            climdex_input,
+            ci_name,
+            data_contents,
+            {
+                "tmax_column": tmax_column,
+                "tmin_column": tmin_column,
+                "prec_column": prec_column,
+                "tavg_column": tavg_column,
+            },
+            date_fields,
+            date_format,
+            na_strings,
+        )
+
+        log_handler(
+            self,
+            response,
+            "Saving climdexInput as R data file",
+            logger,
+            log_level=loglevel,
+            process_step="save_rdata",
+        )
+        output_path = os.path.join(self.workdir, output_file)
+        r_valid_name(vector_name)
+        save_rdata(vector_name, ci, output_path)
+
+        log_handler(
+            self,
+            response,
+            "Building final output",
+            logger,
+            log_level=loglevel,
+            process_step="build_output",
+        )
+        response.outputs["climdexInput"].file = output_path
+
+        return response
@@ -1,24 +1,131 @@
-import os, csv
-from rpy2 import robjects
-from tempfile import NamedTemporaryFile as TempFile
-from pywps import Process
+import os, io, csv
 from pywps.app.Common import Metadata
 from pywps.app.exceptions import ProcessError
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
-from wps_tools.R import get_package, save_python_to_rdata, r_valid_name
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import process_inputs_alpha
 
-from quail.utils import logger, validate_vectors
-from quail.io import csv_inputs, ci_output
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import run_in_worker
+from quail.io import csv_inputs, ci_output, quantiles_output
 
 
-class ClimdexInputCSV(Process):
+def read_csv_content(content, column, date_fields, na_strings, var):
+    """Parses the CSV `content` in a single pass. Returns the values of
+    `column` as floats, NaN where missing, and their dates (the
+    `date_fields` joined by spaces) as strings. Like read.csv in
+    climdexInput.csv, blank lines are skipped; rows without a date are left
+    out too.
+    """
+    reader = csv.reader(io.StringIO(content))
+    header = next(reader, [])
+    if column not in header:
+        raise ProcessError(f"No {var} column of that name")
+    if any(field not in header for field in date_fields):
+        raise ProcessError(f"No date fields {date_fields} in {var} data")
+
+    value_index = header.index(column)
+    date_indices = [header.index(field) for field in date_fields]
+    width = max(value_index, *date_indices) + 1
+    missing = {"", "NA", na_strings}
+    values = []
+    dates = []
+
+    for row in reader:
+        if len(row) < width:
+            continue
+        date = [row[index].strip() for index in date_indices]
+        if any(field in missing for field in date):
+            continue
+
+        value = row[value_index].strip()
+        try:
+            values.append(float("nan") if value in missing else float(value))
+        except ValueError:
+            raise ProcessError(f"Invalid {var} value: {value}")
+        dates.append(" ".join(date))
+
+    return values, dates
+
+
+def prepare_parameters(
+    data_contents, columns, date_fields, date_format, cal, na_strings
+):
+    """Returns the data vectors and dates of each variable in `data_contents`
+    (CSV content by variable) as arguments for climdexInput.raw
+    """
+    from rpy2 import robjects
+    from quail.literals import parse_vector
+    from quail.views import float_vector
+
+    fields = parse_vector(date_fields).values
+    params = {}
+
+    for var, content in data_contents.items():
+        values, dates = read_csv_content(
+            content, columns[f"{var}_column"], fields, na_strings, var
+        )
+        params[var] = float_vector(values)
+        try:
+            params[f"{var}_dates"] = robjects.r["as.PCICt"](
+                robjects.StrVector(dates), format=date_format, cal=cal
+            )
+        except RRuntimeError as e:
+            raise ProcessError(msg=f"{type(e).__name__}: Error generating dates")
+
+    return params
+
+
+def climdex_input_csv(
+    data_contents,
+    columns,
+    base_range,
+    cal,
+    date_fields,
+    date_format,
+    n,
+    na_strings,
+    northern_hemisphere,
+    quantiles,
+    temp_qtiles,
+    prec_qtiles,
+    max_missing_days,
+    min_base_data_fraction_present,
+    quantiles_file,
+):
+    """Builds a climdexInput from the CSV content in `data_contents` (by
+    variable). Each CSV is parsed once, straight into the vectors passed to
+    climdexInput.raw. Runs in an R worker.
+    """
+    from quail.quantiles import build_climdex_input
+
+    params = prepare_parameters(
+        data_contents, columns, date_fields, date_format, cal, na_strings
+    )
+
+    return build_climdex_input(
+        params,
+        quantiles_file,
+        base_range,
+        n,
+        northern_hemisphere,
+        quantiles,
+        temp_qtiles,
+        prec_qtiles,
+        max_missing_days,
+        min_base_data_fraction_present,
+    )
+
+
+class ClimdexInputCSV(ScheduledProcess):
     """
     Process for creating climdexInput object from CSV files
     """
 
+    queue = "build"
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -28,7 +135,7 @@ class ClimdexInputCSV(Process):
             },
         )
         inputs = csv_inputs
-        outputs = [ci_output]
+        outputs = [ci_output, quantiles_output]
 
         super(ClimdexInputCSV, self).__init__(
             self._handler,
@@ -48,29 +155,19 @@ class ClimdexInputCSV(Process):
             status_supported=True,
         )
 
-    def prepare_csv_files(
+    def select_csv_content(
         self, prec_file_content, tavg_file_content, tmax_file_content, tmin_file_content
     ):
-        def write_csv(content):
-            file_ = TempFile(mode="w+", suffix=".csv")
-            file_.write(content)
-            file_.seek(0)
-
-            return file_
-
-        prec_file = write_csv(prec_file_content)
-
         if tavg_file_content:
-            tavg_file = write_csv(tavg_file_content)
-            return {"prec_file": prec_file, "tavg_file": tavg_file}
+            # use tavg data if provided
+            return {"prec": prec_file_content, "tavg": tavg_file_content}
 
         elif tmax_file_content and tmin_file_content:
-            tmax_file = write_csv(tmax_file_content)
-            tmin_file = write_csv(tmin_file_content)
+            # use tmax and tmin data if tavg is not provided
             return {
-                "prec_file": prec_file,
-                "tmin_file": tmin_file,
-                "tmax_file": tmax_file,
+                "tmax": tmax_file_content,
+                "tmin": tmin_file_content,
+                "prec": prec_file_content,
             }
 
         else:
@@ -78,62 +175,12 @@ class ClimdexInputCSV(Process):
                 "You must provide one of either a tavg file content or tmax and tmin file content"
             )
 
-    def prepare_parameters(
-        self,
-        data_files,
-        date_fields,
-        date_format,
-        tmax_column,
-        tmin_column,
-        prec_column,
-        tavg_column,
-    ):
-        def check_columns(csv_file, column, var):
-            with open(csv_file, "r") as file_:
-                reader = csv.reader(file_)
-                columns = next(reader)
-                if column not in columns:
-                    raise ProcessError(f"No {var} column of that name")
-
-        prec_file = data_files["prec_file"]
-        check_columns(prec_file.name, prec_column, "prec")
-        data_types = robjects.r(
-            f"list(list(fields={date_fields}, format='{date_format}'))"
-        )
-
-        if "tavg_file" in data_files.keys():
-            # use tavg data if provided
-            tavg_file = data_files["tavg_file"]
-            check_columns(tavg_file.name, tavg_column, "tavg")
-            date_columns = robjects.r(
-                f"list(tavg = '{tavg_column}', prec = '{prec_column}')"
-            )
-            return {
-                "tavg_file": tavg_file,
-                "prec_file": prec_file,
-                "data_columns": date_columns,
-                "date_types": data_types,
-            }
-
-        elif "tmax_file" in data_files.keys() and "tmin_file" in data_files.keys():
-            # use tmax and tmin data if tavg is not provided
-            tmax_file = data_files["tmax_file"]
-            check_columns(tmax_file.name, tmax_column, "tmax")
-            tmin_file = data_files["tmin_file"]
-            check_columns(tmin_file.name, tmin_column, "tmin")
-
-            date_columns = robjects.r(
-                f"list(tmax = '{tmax_column}', tmin = '{tmin_column}', prec = '{prec_column}')"
-            )
-            return {
-                "tmax_file": tmax_file.name,
-                "tmin_file": tmin_file.name,
-                "prec_file": prec_file.name,
-                "data_columns": date_columns,
-                "date_types": data_types,
-            }
-
     def _handler(self, request, response):
+        from rpy2 import robjects
+        from wps_tools.R import r_valid_name
+        from quail.utils import logger, validate_vectors, save_rdata
+        from quail.quantiles import QUANTILES_NAME
+
         (
             base_range,
             cal,
@@ -150,6 +197,7 @@ class ClimdexInputCSV(Process):
             prec_file_content,
             prec_qtiles,
             quantiles,
+            quantiles_file,
             tavg_column,
             tavg_file_content,
             temp_qtiles,
@@ -178,8 +226,6 @@ class ClimdexInputCSV(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        robjects.r("library(PCICt)")
 
         log_handler(
             self,
@@ -190,18 +236,9 @@ class ClimdexInputCSV(Process):
             process_step="prepare_params",
         )
 
-        data_files = self.prepare_csv_files(
+        data_contents = self.select_csv_content(
             prec_file_content, tavg_file_content, tmax_file_content, tmin_file_content
         )
-        params = self.prepare_parameters(
-            data_files,
-            date_fields,
-            date_format,
-            tmax_column,
-            tmin_column,
-            prec_column,
-            tavg_column,
-        )
 
         log_handler(
             self,
@@ -212,25 +249,29 @@ class ClimdexInputCSV(Process):
             process_step="process",
         )
 
-        try:
-            ci = climdex.climdexInput_csv(
-                **params,
-                base_range=robjects.r(base_range),
-                na_strings=na_strings,
-                cal=robjects.r(f"'{cal}'"),
-                n=n,
-                northern_hemisphere=northern_hemisphere,
-                quantiles=robjects.r(quantiles),
-                temp_qtiles=robjects.r(temp_qtiles),
-                prec_qtiles=robjects.r(prec_qtiles),
-                max_missing_days=robjects.r(max_missing_days),
-                min_base_data_fraction_present=min_base_data_fraction_present,
-            )
-        except RRuntimeError as e:
-            raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-        finally:
-            [tmpfile.close() for tmpfile in data_files.values()]
+        ci, baseline = run_in_worker(
+            climdex_input_csv,
+            data_contents,
+            {
+                "tmax_column": tmax_column,
+                "tmin_column": tmin_column,
+                "prec_column": prec_column,
+                "tavg_column": tavg_column,
+            },
+            base_range,
+            cal,
+            date_fields,
+            date_format,
+            n,
+            na_strings,
+            northern_hemisphere,
+            quantiles,
+            temp_qtiles,
+            prec_qtiles,
+            max_missing_days,
+            min_base_data_fraction_present,
+            quantiles_file,
+        )
 
         log_handler(
             self,
@@ -242,7 +283,13 @@ class ClimdexInputCSV(Process):
         )
         output_path = os.path.join(self.workdir, output_file)
         r_valid_name(vector_name)
-        save_python_to_rdata(vector_name, ci, output_path)
+        save_rdata(vector_name, ci, output_path)
+        quantiles_path = f"{os.path.splitext(output_path)[0]}_quantiles.rda"
+        save_rdata(
+            QUANTILES_NAME,
+            robjects.NULL if baseline is None else baseline,
+            quantiles_path,
+        )
 
         log_handler(
             self,
@@ -253,8 +300,6 @@ class ClimdexInputCSV(Process):
             process_step="build_output",
         )
         response.outputs["climdexInput"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        response.outputs["quantiles_output"].file = quantiles_path
 
         return response
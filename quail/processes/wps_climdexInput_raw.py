@@ -1,27 +1,158 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
 from pywps.app.exceptions import ProcessError
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
-from wps_tools.R import (
-    get_package,
-    save_python_to_rdata,
-    r_valid_name,
-)
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import process_inputs_alpha
 
-from quail.utils import logger, validate_vectors, get_robj
-from quail.io import raw_inputs, ci_output
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import run_in_worker
+from quail.io import raw_inputs, ci_output, quantiles_output
 
 
-class ClimdexInputRaw(Process):
+def generate_dates(env, filename, obj_name, date_fields, date_format, cal):
+    from rpy2 import robjects
+    from quail.utils import get_robj
+    from quail.literals import r_vector
+
+    env[obj_name] = get_robj(filename, obj_name)
+
+    try:
+        fields = robjects.r["["](env[obj_name], True, r_vector(date_fields))
+        return robjects.r["as.PCICt"](
+            robjects.r["do.call"]("paste", fields), format=date_format, cal=cal
+        )
+    except RRuntimeError as e:
+        raise ProcessError(msg=f"{type(e).__name__}: Error generating dates")
+
+
+def column(env, df_name, column_name, var):
+    from rpy2 import robjects
+
+    df_column = env[df_name].rx2(column_name)
+    if robjects.r["is.null"](df_column)[0]:
+        raise ProcessError(f"No {var} column of that name")
+    else:
+        return df_column
+
+
+def prepare_parameters(
+    tmax_name,
+    tmin_name,
+    prec_name,
+    tavg_name,
+    tmax_column,
+    tmin_column,
+    prec_column,
+    tavg_column,
+    date_fields,
+    date_format,
+    cal,
+    prec_file,
+    tavg_file,
+    tmax_file,
+    tmin_file,
+):
+    from rpy2 import robjects
+
+    # Data frames are loaded into a scope of their own rather than the global env
+    env = robjects.r["new.env"]()
+
+    prec_dates = generate_dates(
+        env, prec_file, prec_name, date_fields, date_format, cal
+    )
+    prec = column(env, prec_name, prec_column, "prec")
+
+    if tavg_file:
+        # use tavg data if provided
+        tavg_dates = generate_dates(
+            env, tavg_file, tavg_name, date_fields, date_format, cal
+        )
+        tavg = column(env, tavg_name, tavg_column, "tavg")
+
+        return {
+            "tavg": tavg,
+            "prec": prec,
+            "tavg_dates": tavg_dates,
+            "prec_dates": prec_dates,
+        }
+
+    elif tmax_file and tmin_file:
+        # use tmax and tmin data if tavg is not provided
+        tmax_dates = generate_dates(
+            env, tmax_file, tmax_name, date_fields, date_format, cal
+        )
+        tmin_dates = generate_dates(
+            env, tmin_file, tmin_name, date_fields, date_format, cal
+        )
+
+        tmax = column(env, tmax_name, tmax_column, "tmax")
+        tmin = column(env, tmin_name, tmin_column, "tmin")
+
+        return {
+            "tmax": tmax,
+            "tmin": tmin,
+            "prec": prec,
+            "tmax_dates": tmax_dates,
+            "tmin_dates": tmin_dates,
+            "prec_dates": prec_dates,
+        }
+
+
+def climdex_input_raw(
+    files,
+    names,
+    columns,
+    base_range,
+    cal,
+    date_fields,
+    date_format,
+    n,
+    northern_hemisphere,
+    quantiles,
+    temp_qtiles,
+    prec_qtiles,
+    max_missing_days,
+    min_base_data_fraction_present,
+    quantiles_file,
+):
+    """Builds a climdexInput from the data frames in `files`. Runs in an
+    R worker.
+    """
+    from quail.quantiles import build_climdex_input
+
+    params = prepare_parameters(
+        **names,
+        **columns,
+        date_fields=date_fields,
+        date_format=date_format,
+        cal=cal,
+        **files,
+    )
+
+    return build_climdex_input(
+        params,
+        quantiles_file,
+        base_range,
+        n,
+        northern_hemisphere,
+        quantiles,
+        temp_qtiles,
+        prec_qtiles,
+        max_missing_days,
+        min_base_data_fraction_present,
+    )
+
+
+class ClimdexInputRaw(ScheduledProcess):
     """
     Process for creating climdexInput object from data already ingested into R
     """
 
+    queue = "build"
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -32,7 +163,7 @@ class ClimdexInputRaw(Process):
         )
 
         inputs = raw_inputs
-        outputs = [ci_output]
+        outputs = [ci_output, quantiles_output]
 
         super(ClimdexInputRaw, self).__init__(
             self._handler,
@@ -52,86 +183,12 @@ class ClimdexInputRaw(Process):
             status_supported=True,
         )
 
-    def generate_dates(
-        self, request, filename, obj_name, date_fields, date_format, cal
-    ):
-        df = get_robj(filename, obj_name)
-        robjects.r.assign(obj_name, df)
-
-        try:
-            return robjects.r(
-                f"as.PCICt(do.call(paste, {obj_name}[,{date_fields}]), format='{date_format}', cal='{cal}')"
-            )
-        except RRuntimeError as e:
-            raise ProcessError(msg=f"{type(e).__name__}: Error generating dates")
-
-    def column(self, df_name, column_name, var):
-        df_column = robjects.r(df_name).rx2(column_name)
-        if robjects.r["is.null"](df_column)[0]:
-            raise ProcessError(f"No {var} column of that name")
-        else:
-            return df_column
-
-    def prepare_parameters(
-        self,
-        request,
-        tmax_name,
-        tmin_name,
-        prec_name,
-        tavg_name,
-        tmax_column,
-        tmin_column,
-        prec_column,
-        tavg_column,
-        date_fields,
-        date_format,
-        cal,
-        prec_file,
-        tavg_file,
-        tmax_file,
-        tmin_file,
-    ):
-        prec_dates = self.generate_dates(
-            request, prec_file, prec_name, date_fields, date_format, cal
-        )
-        prec = self.column(prec_name, prec_column, "prec")
-
-        if tavg_file:
-            # use tavg data if provided
-            tavg_dates = self.generate_dates(
-                request, tavg_file, tavg_name, date_fields, date_format, cal
-            )
-            tavg = self.column(tavg_name, tavg_column, "tavg")
-
-            return {
-                "tavg": tavg,
-                "prec": prec,
-                "tavg_dates": tavg_dates,
-                "prec_dates": prec_dates,
-            }
-
-        elif tmax_file and tmin_file:
-            # use tmax and tmin data if tavg is not provided
-            tmax_dates = self.generate_dates(
-                request, tmax_file, tmax_name, date_fields, date_format, cal
-            )
-            tmin_dates = self.generate_dates(
-                request, tmin_file, tmin_name, date_fields, date_format, cal
-            )
-
-            tmax = self.column(tmax_name, tmax_column, "tmax")
-            tmin = self.column(tmin_name, tmin_column, "tmin")
-
-            return {
-                "tmax": tmax,
-                "tmin": tmin,
-                "prec": prec,
-                "tmax_dates": tmax_dates,
-                "tmin_dates": tmin_dates,
-                "prec_dates": prec_dates,
-            }
-
     def _handler(self, request, response):
+        from rpy2 import robjects
+        from wps_tools.R import r_valid_name
+        from quail.utils import logger, validate_vectors, save_rdata
+        from quail.quantiles import QUANTILES_NAME
+
         (
             base_range,
             cal,
@@ -148,6 +205,7 @@ class ClimdexInputRaw(Process):
             prec_name,
             prec_qtiles,
             quantiles,
+            quantiles_file,
             tavg_column,
             tavg_file,
             tavg_name,
@@ -179,8 +237,6 @@ class ClimdexInputRaw(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        robjects.r("library(PCICt)")
 
         log_handler(
             self,
@@ -190,24 +246,6 @@ class ClimdexInputRaw(Process):
             log_level=loglevel,
             process_step="prepare_params",
         )
-        params = self.prepare_parameters(
-            request,
-            tmax_name,
-            tmin_name,
-            prec_name,
-            tavg_name,
-            tmax_column,
-            tmin_column,
-            prec_column,
-            tavg_column,
-            date_fields,
-            date_format,
-            cal,
-            prec_file,
-            tavg_file,
-            tmax_file,
-            tmin_file,
-        )
 
         log_handler(
             self,
@@ -217,21 +255,39 @@ class ClimdexInputRaw(Process):
             log_level=loglevel,
             process_step="process",
         )
-
-        try:
-            ci = climdex.climdexInput_raw(
-                **params,
-                base_range=robjects.r(base_range),
-                n=n,
-                northern_hemisphere=northern_hemisphere,
-                quantiles=robjects.r(quantiles),
-                temp_qtiles=robjects.r(temp_qtiles),
-                prec_qtiles=robjects.r(prec_qtiles),
-                max_missing_days=robjects.r(max_missing_days),
-                min_base_data_fraction_present=min_base_data_fraction_present,
-            )
-        except RRuntimeError as e:
-            raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+        ci, baseline = run_in_worker(
+            climdex_input_raw,
+            {
+                "prec_file": prec_file,
+                "tavg_file": tavg_file,
+                "tmax_file": tmax_file,
+                "tmin_file": tmin_file,
+            },
+            {
+                "tmax_name": tmax_name,
+                "tmin_name": tmin_name,
+                "prec_name": prec_name,
+                "tavg_name": tavg_name,
+            },
+            {
+                "tmax_column": tmax_column,
+                "tmin_column": tmin_column,
+                "prec_column": prec_column,
+                "tavg_column": tavg_column,
+            },
+            base_range,
+            cal,
+            date_fields,
+            date_format,
+            n,
+            northern_hemisphere,
+            quantiles,
+            temp_qtiles,
+            prec_qtiles,
+            max_missing_days,
+            min_base_data_fraction_present,
+            quantiles_file,
+        )
 
         log_handler(
             self,
@@ -243,7 +299,13 @@ class ClimdexInputRaw(Process):
         )
         output_path = os.path.join(self.workdir, output_file)
         r_valid_name(vector_name)
-        save_python_to_rdata(vector_name, ci, output_path)
+        save_rdata(vector_name, ci, output_path)
+        quantiles_path = f"{os.path.splitext(output_path)[0]}_quantiles.rda"
+        save_rdata(
+            QUANTILES_NAME,
+            robjects.NULL if baseline is None else baseline,
+            quantiles_path,
+        )
 
         log_handler(
             self,
@@ -254,8 +316,6 @@ class ClimdexInputRaw(Process):
             process_step="build_output",
         )
         response.outputs["climdexInput"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        response.outputs["quantiles_output"].file = quantiles_path
 
         return response
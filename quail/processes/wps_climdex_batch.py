@@ -0,0 +1,144 @@
+import os
+from pywps.app.Common import Metadata
+from pywps.app.exceptions import ProcessError
+
+from wps_tools.logging import common_status_percentages
+from wps_tools.io import rda_output, process_inputs_alpha
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import batch_inputs, netcdf_output, parquet_output, json_output
+
+
+class ClimdexBatch(ScheduledProcess):
+    """
+    Takes a climdexInput object as input and computes several climdex indices
+    from it, loading each input file once for all of them. Each index is given
+    by name, optionally followed by the arguments of its climdex.pcic function,
+    e.g. "rnnmm(threshold=15)". All results are saved to a single Rdata file.
+    """
+
+    def __init__(self):
+        self.status_percentage_steps = dict(
+            common_status_percentages,
+            **{
+                "prep_ci": 10,
+                "save_rdata": 90,
+            },
+        )
+        inputs = batch_inputs
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
+
+        super(ClimdexBatch, self).__init__(
+            self._handler,
+            identifier="climdex_batch",
+            title="Climdex Batch",
+            abstract="""
+                Takes a climdexInput object as input and computes several climate indices from it.
+                Each input file is read once and every requested index is computed from the
+                loaded climdexInput objects. Results are saved together in one Rdata file.
+            """,
+            metadata=[
+                Metadata("NetCDF processing"),
+                Metadata("Climate Data Operations"),
+                Metadata("PyWPS", "https://pywps.org/"),
+                Metadata("Birdhouse", "http://bird-house.github.io/"),
+                Metadata("PyWPS Demo", "https://pywps-demo.readthedocs.io/en/latest/"),
+            ],
+            inputs=inputs,
+            outputs=outputs,
+            store_supported=True,
+            status_supported=True,
+        )
+
+    def _handler(self, request, response):
+        from quail.utils import (
+            logger,
+            parse_index_spec,
+            compute_indices,
+            log_progress,
+            OutputWriter,
+        )
+
+        (
+            climdex_input,
+            engine,
+            indices,
+            loglevel,
+            output_file,
+            output_format,
+        ) = process_inputs_alpha(request.inputs, batch_inputs, self.workdir)
+
+        log_handler(
+            self,
+            response,
+            "Starting Process",
+            logger,
+            log_level=loglevel,
+            process_step="start",
+        )
+        specs = [parse_index_spec(spec) for spec in indices]
+        labels = [label for _, _, label in specs]
+        duplicates = sorted({label for label in labels if labels.count(label) > 1})
+        if duplicates:
+            raise ProcessError(f"Indices requested more than once: {duplicates}")
+
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
+
+        total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing {', '.join(labels)} for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="prep_ci",
+        )
+        results = map_in_workers(compute_indices, climdex_input, specs, engine)
+
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for label, ci_results in file_results.items():
+                for ci_name, index_result in ci_results.items():
+                    writer.add(label, index_result, counter, ci_name)
+            writer.flush()
+
+            log_progress(
+                self,
+                response,
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "prep_ci",
+            )
+
+        log_handler(
+            self,
+            response,
+            "Saving indices to output file",
+            logger,
+            log_level=loglevel,
+            process_step="save_rdata",
+        )
+        writer.save()
+
+        log_handler(
+            self,
+            response,
+            "Building final output",
+            logger,
+            log_level=loglevel,
+            process_step="build_output",
+        )
+        writer.build_output(response)
+
+        log_handler(
+            self,
+            response,
+            "Process Complete",
+            logger,
+            log_level=loglevel,
+            process_step="complete",
+        )
+        return response
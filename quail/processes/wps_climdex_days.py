@@ -1,17 +1,15 @@
 import os
-from rpy2 import robjects
-from rpy2.rinterface_lib.embedded import RRuntimeError
-from pywps import Process
-from pywps.app.exceptions import ProcessError
 from pywps.app.Common import Metadata
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from quail.utils import logger, load_cis
-from quail.io import days_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import days_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexDays(Process):
+class ClimdexDays(ScheduledProcess):
     """
     Takes a climdexInput object as input and computes the annual count
     of days where daily temperature satisfies some condition.
@@ -25,6 +23,8 @@ class ClimdexDays(Process):
     temperature stays above 20 degrees Celsius
     """
 
+    climdex_indices = ["su", "id", "fd", "tr"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -34,7 +34,7 @@ class ClimdexDays(Process):
             },
         )
         inputs = days_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexDays, self).__init__(
             self._handler,
@@ -65,9 +65,17 @@ class ClimdexDays(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, days_type, loglevel, output_file = process_inputs_alpha(
-            request.inputs, days_inputs, self.workdir
-        )
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+        from quail.engines import days_numpy
+
+        (
+            climdex_input,
+            days_type,
+            engine,
+            loglevel,
+            output_file,
+            output_format,
+        ) = process_inputs_alpha(request.inputs, days_inputs, self.workdir)
 
         log_handler(
             self,
@@ -77,56 +85,49 @@ class ClimdexDays(Process):
             log_level=loglevel,
             process_step="start",
         )
-        robjects.r("library(climdex.pcic)")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
-
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Preparing climdexInputs {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="prep_ci",
+        log_handler(
+            self,
+            response,
+            f"Processing {days_type} for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="prep_ci",
+        )
+        if engine == "numpy":
+            results = map_in_workers(days_numpy, climdex_input, days_type)
+        else:
+            results = map_in_workers(
+                compute_index, climdex_input, f"climdex.{days_type}"
             )
-            cis = load_cis(input)
 
-            log_handler(
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, count_days in file_results.items():
+                writer.add(days_type, count_days, counter, ci_name)
+            writer.flush()
+
+            log_progress(
                 self,
                 response,
-                f"Processing {days_type}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "prep_ci",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    count_days = robjects.r(f"climdex.{days_type}(ci)")
-                except RRuntimeError as e:
-                    raise ProcessError(
-                        msg=f"{type(e).__name__} in file {input}: {str(e)}"
-                    )
-
-                vector_name = f"{days_type}{counter}_{ci_name}"
-                robjects.r.assign(vector_name, count_days)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving {days_type} counts to R data file",
+            f"Saving {days_type} counts to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -136,10 +137,7 @@ class ClimdexDays(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
@@ -1,23 +1,22 @@
 import os
-from rpy2 import robjects
-from pywps import Process
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 from pywps.app.Common import Metadata
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import get_package
-from quail.utils import logger, load_cis
-from quail.io import dtr_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import dtr_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexDTR(Process):
+class ClimdexDTR(ScheduledProcess):
     """
     Wraps climdex.dtr
     Computes the mean daily diurnal temperature range.
     """
 
+    climdex_indices = ["dtr"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -27,7 +26,7 @@ class ClimdexDTR(Process):
             },
         )
         inputs = dtr_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexDTR, self).__init__(
             self._handler,
@@ -48,9 +47,15 @@ class ClimdexDTR(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, freq, loglevel, output_file = process_inputs_alpha(
-            request.inputs, dtr_inputs, self.workdir
-        )
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+
+        (
+            climdex_input,
+            freq,
+            loglevel,
+            output_file,
+            output_format,
+        ) = process_inputs_alpha(request.inputs, dtr_inputs, self.workdir)
 
         log_handler(
             self,
@@ -60,55 +65,44 @@ class ClimdexDTR(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing the mean daily diurnal temperature range for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        results = map_in_workers(compute_index, climdex_input, "climdex.dtr", freq)
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInputs from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, dtr in file_results.items():
+                writer.add("dtr", dtr, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing the mean daily diurnal temperature range {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    dtr = climdex.climdex_dtr(ci, freq)
-                except RRuntimeError as e:
-                    raise ProcessError(
-                        msg=f"{type(e).__name__} for file {input}: {str(e)}"
-                    )
-
-                vector_name = f"dtr{counter}_{ci_name}"
-                robjects.r.assign(vector_name, dtr)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            "Saving dtr vectors to Rdata file",
+            "Saving dtr vectors to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -118,10 +112,7 @@ class ClimdexDTR(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
@@ -1,18 +1,33 @@
-import sys, inspect, re, collections
-from rpy2 import robjects
-from pywps import Process, LiteralOutput
+from pywps import LiteralOutput
 from pywps.app.Common import Metadata
 from pywps.app.exceptions import ProcessError
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
-from wps_tools.R import get_package
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import process_inputs_alpha
-from quail.utils import logger, get_robj
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import run_in_worker
 from quail.io import avail_indices_inputs
 
 
-class GetIndices(Process):
+def get_available_indices(r_file, ci_name):
+    """Returns the names of the indices which may be computed for the
+    climdexInput `ci_name` in `r_file`. Runs in an R worker.
+    """
+    from wps_tools.R import get_package
+    from quail.utils import get_robj
+
+    climdex = get_package("climdex.pcic")
+    ci = get_robj(r_file, ci_name)
+
+    try:
+        return list(climdex.climdex_get_available_indices(ci, False))
+    except RRuntimeError as e:
+        raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+
+
+class GetIndices(ScheduledProcess):
     """
     Takes a climdexInput object as input and returns a dictionary
     with the names of all the indices which may be computed as values
@@ -55,29 +70,23 @@ class GetIndices(Process):
     def available_processes(self, avail_indices):
         """
         Returns a dictionary containing the processes in quail (keys) which
-        mention available indices (values) in their docstrings
+        compute available indices (values), as declared by their
+        ``climdex_indices``
         """
-        processes = collections.defaultdict(list)
-        indices = re.compile(r"climdex\.([a-zA-Z0-9]*)")
-
-        for mod in [
-            module
-            for module in sys.modules
-            if re.search("quail.processes.wps_*", module)
-        ]:
-            for name, class_ in inspect.getmembers(
-                sys.modules[mod],
-                lambda member: inspect.isclass(member) and member.__module__ == mod,
-            ):
-                [
-                    processes[mod.split(".")[-1]].append(index)
-                    for index in indices.findall(class_.__doc__)
-                    if index in avail_indices
-                ]
-
-        return dict(processes)
+        from quail.processes import index_processes
+
+        avail_indices = set(avail_indices)
+        processes = {}
+        for module, indices in index_processes.items():
+            available = [index for index in indices if index in avail_indices]
+            if available:
+                processes[module] = available
+
+        return processes
 
     def _handler(self, request, response):
+        from quail.utils import logger
+
         ci_name, climdex_single_input, loglevel, output_file = process_inputs_alpha(
             request.inputs, avail_indices_inputs, self.workdir
         )
@@ -90,7 +99,6 @@ class GetIndices(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
 
         log_handler(
             self,
@@ -100,7 +108,6 @@ class GetIndices(Process):
             log_level=loglevel,
             process_step="load_rdata",
         )
-        ci = get_robj(climdex_single_input, ci_name)
 
         log_handler(
             self,
@@ -110,12 +117,9 @@ class GetIndices(Process):
             log_level=loglevel,
             process_step="process",
         )
-
-        try:
-            robjects.r.assign("ci", ci)
-            avail_indices = climdex.climdex_get_available_indices(ci, False)
-        except RRuntimeError as e:
-            raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+        avail_indices = run_in_worker(
+            get_available_indices, climdex_single_input, ci_name
+        )
 
         avail_processes = self.available_processes(avail_indices)
 
@@ -129,9 +133,6 @@ class GetIndices(Process):
         )
         response.outputs["avail_processes"].data = avail_processes
 
-        # Clear R global env
-        robjects.r("rm(list=ls())")
-
         log_handler(
             self,
             response,
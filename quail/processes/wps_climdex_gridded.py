@@ -0,0 +1,216 @@
+import os
+from pywps.app.Common import Metadata
+from pywps.app.exceptions import ProcessError
+
+from wps_tools.logging import common_status_percentages
+from wps_tools.io import process_inputs_alpha
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import gridded_inputs, netcdf_output
+
+
+class ClimdexGridded(ScheduledProcess):
+    """
+    Takes a NetCDF file of gridded daily temperature and precipitation and
+    computes several climdex indices for every grid cell, building a
+    climdexInput for each cell from its series. Indices are given by name as
+    in the batch process. The grid is processed in blocks of cells by the R
+    workers and the results are saved to a NetCDF file on the same grid.
+    """
+
+    def __init__(self):
+        self.status_percentage_steps = dict(
+            common_status_percentages,
+            **{
+                "load_netcdf": 10,
+                "save_netcdf": 90,
+            },
+        )
+        inputs = gridded_inputs
+        outputs = [netcdf_output]
+
+        super(ClimdexGridded, self).__init__(
+            self._handler,
+            identifier="climdex_gridded",
+            title="Climdex Gridded",
+            abstract="""
+                Takes a NetCDF file of gridded daily maximum and minimum temperature and
+                precipitation and computes several climate indices for each grid cell.
+                A climdexInput object is built for each cell; cells are processed in
+                blocks and the indices are saved to a NetCDF file on the input grid.
+            """,
+            metadata=[
+                Metadata("NetCDF processing"),
+                Metadata("Climate Data Operations"),
+                Metadata("PyWPS", "https://pywps.org/"),
+                Metadata("Birdhouse", "http://bird-house.github.io/"),
+                Metadata("PyWPS Demo", "https://pywps-demo.readthedocs.io/en/latest/"),
+            ],
+            inputs=inputs,
+            outputs=outputs,
+            store_supported=True,
+            status_supported=True,
+        )
+
+    def _handler(self, request, response):
+        import numpy as np
+        from netCDF4 import Dataset
+        from quail.utils import logger, parse_index_spec, log_progress, validate_vectors
+        from quail.netcdf import FILL_VALUE
+        from quail.grid import (
+            grid_dimensions,
+            grid_blocks,
+            grid_periods,
+            spec_freq,
+            read_dates,
+            compute_grid_block,
+            create_grid_output,
+            period_dimension,
+        )
+
+        (
+            base_range,
+            chunk_size,
+            indices,
+            loglevel,
+            max_missing_days,
+            min_base_data_fraction_present,
+            n,
+            netcdf_file,
+            northern_hemisphere,
+            output_file,
+            pr_var,
+            prec_qtiles,
+            tasmax_var,
+            tasmin_var,
+            temp_qtiles,
+        ) = process_inputs_alpha(request.inputs, gridded_inputs, self.workdir)
+
+        log_handler(
+            self,
+            response,
+            "Starting Process",
+            logger,
+            log_level=loglevel,
+            process_step="start",
+        )
+        specs = [parse_index_spec(spec) for spec in indices]
+        labels = [label for _, _, label in specs]
+        duplicates = sorted({label for label in labels if labels.count(label) > 1})
+        if duplicates:
+            raise ProcessError(f"Indices requested more than once: {duplicates}")
+        if chunk_size < 1:
+            raise ProcessError("chunk_size must be at least 1")
+        validate_vectors([base_range, temp_qtiles, prec_qtiles, max_missing_days])
+
+        log_handler(
+            self,
+            response,
+            "Loading NetCDF file",
+            logger,
+            log_level=loglevel,
+            process_step="load_netcdf",
+        )
+        var_names = {"tmax": tasmax_var, "tmin": tasmin_var, "prec": pr_var}
+        output_path = os.path.join(self.workdir, output_file)
+
+        with (
+            Dataset(netcdf_file) as nc,
+            Dataset(output_path, "w", format="NETCDF4") as out,
+        ):
+            dims = grid_dimensions(nc, var_names.values())
+            dates, calendar = read_dates(nc, dims[0])
+            _, y_dim, x_dim = dims
+            blocks = grid_blocks(
+                (len(nc.dimensions[y_dim]), len(nc.dimensions[x_dim])), chunk_size
+            )
+            create_grid_output(out, nc, dims, var_names.values())
+
+            freq_periods = grid_periods(dates)
+            periods = {}
+            for spec in specs:
+                climdex_index, args, label = spec
+                freq = spec_freq(spec)
+                periods[label] = freq_periods[freq]
+                dim = period_dimension(out, periods[label], freq, calendar)
+                variable = out.createVariable(
+                    label,
+                    "f4",
+                    (dim, y_dim, x_dim),
+                    zlib=True,
+                    fill_value=FILL_VALUE,
+                )
+                variable.setncatts(
+                    {"climdex_index": climdex_index, "arguments": repr(args)}
+                )
+
+            total = len(blocks)
+            log_handler(
+                self,
+                response,
+                f"Processing {', '.join(labels)} for {total} blocks of cells",
+                logger,
+                log_level=loglevel,
+                process_step="load_netcdf",
+            )
+            results = map_in_workers(
+                compute_grid_block,
+                blocks,
+                netcdf_file,
+                var_names,
+                specs,
+                periods,
+                base_range,
+                n,
+                northern_hemisphere,
+                temp_qtiles,
+                prec_qtiles,
+                max_missing_days,
+                min_base_data_fraction_present,
+            )
+
+            for done, (index, block_results) in enumerate(results, start=1):
+                y0, y1, x0, x1 = blocks[index]
+                for label, values in block_results.items():
+                    out.variables[label][:, y0:y1, x0:x1] = np.ma.masked_invalid(values)
+
+                log_progress(
+                    self,
+                    response,
+                    f"Processed block {index + 1} ({done}/{total})",
+                    loglevel,
+                    done,
+                    total,
+                    "load_netcdf",
+                    end="save_netcdf",
+                )
+
+            log_handler(
+                self,
+                response,
+                "Saving indices to NetCDF file",
+                logger,
+                log_level=loglevel,
+                process_step="save_netcdf",
+            )
+
+        log_handler(
+            self,
+            response,
+            "Building final output",
+            logger,
+            log_level=loglevel,
+            process_step="build_output",
+        )
+        response.outputs["netcdf_output"].file = output_path
+
+        log_handler(
+            self,
+            response,
+            "Process Complete",
+            logger,
+            log_level=loglevel,
+            process_step="complete",
+        )
+        return response
@@ -1,19 +1,16 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import get_package
-from quail.utils import logger, load_cis
-from quail.io import gsl_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import gsl_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexGSL(Process):
+class ClimdexGSL(ScheduledProcess):
     """
     Wraps climdex.gsl
     Computes the growing season length (GSL): Growing season length
@@ -24,6 +21,8 @@ class ClimdexGSL(Process):
     with a mean temperature below 5 degrees Celsius
     """
 
+    climdex_indices = ["gsl"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -34,7 +33,7 @@ class ClimdexGSL(Process):
         )
 
         inputs = gsl_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexGSL, self).__init__(
             self._handler,
@@ -55,9 +54,15 @@ class ClimdexGSL(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, gsl_mode, loglevel, output_file = process_inputs_alpha(
-            request.inputs, gsl_inputs, self.workdir
-        )
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+
+        (
+            climdex_input,
+            gsl_mode,
+            loglevel,
+            output_file,
+            output_format,
+        ) = process_inputs_alpha(request.inputs, gsl_inputs, self.workdir)
 
         log_handler(
             self,
@@ -67,54 +72,44 @@ class ClimdexGSL(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing growing seasonal length for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        results = map_in_workers(compute_index, climdex_input, "climdex.gsl", gsl_mode)
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInputs from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, gsl in file_results.items():
+                writer.add("gsl", gsl, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing growing seasonal length for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    gsl = climdex.climdex_gsl(ci, gsl_mode)
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"gsl{counter}_{ci_name}"
-                robjects.r.assign(vector_name, gsl)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            "Saving gsl vectors to R data file",
+            "Saving gsl vectors to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -124,10 +119,7 @@ class ClimdexGSL(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
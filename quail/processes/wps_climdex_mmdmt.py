@@ -1,18 +1,15 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import get_package
-from quail.utils import logger, load_cis
-from quail.io import mmdmt_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import mmdmt_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexMMDMT(Process):
+class ClimdexMMDMT(ScheduledProcess):
     """
     This process wraps climdex functions
     - climdex.txx: Monthly (or annual) Maximum of Daily Maximum Temperature
@@ -21,6 +18,8 @@ class ClimdexMMDMT(Process):
     - climdex.tnn: Monthly (or annual) Minimum of Daily Minimum Temperature
     """
 
+    climdex_indices = ["txx", "tnx", "txn", "tnn"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -30,7 +29,7 @@ class ClimdexMMDMT(Process):
             },
         )
         inputs = mmdmt_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexMMDMT, self).__init__(
             self._handler,
@@ -56,9 +55,18 @@ class ClimdexMMDMT(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, freq, loglevel, month_type, output_file = process_inputs_alpha(
-            request.inputs, mmdmt_inputs, self.workdir
-        )
+        from quail.utils import logger, log_progress, OutputWriter
+        from quail.incremental import compute_index_incremental, incremental_items
+
+        (
+            climdex_input,
+            freq,
+            loglevel,
+            month_type,
+            output_file,
+            output_format,
+            previous_output,
+        ) = process_inputs_alpha(request.inputs, mmdmt_inputs, self.workdir)
 
         log_handler(
             self,
@@ -68,54 +76,49 @@ class ClimdexMMDMT(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing {month_type} for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        results = map_in_workers(
+            compute_index_incremental,
+            incremental_items(climdex_input, previous_output, f"{month_type}_{freq}"),
+            f"climdex.{month_type}",
+            freq=freq,
+        )
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, temps in file_results.items():
+                writer.add(f"{month_type}_{freq}", temps, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing {month_type} for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    temps = robjects.r(f"climdex.{month_type}(ci, freq='{freq}')")
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"{month_type}_{freq}{counter}_{ci_name}"
-                robjects.r.assign(vector_name, temps)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving {month_type} vector to R data file",
+            f"Saving {month_type} vector to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -125,10 +128,7 @@ class ClimdexMMDMT(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
@@ -1,17 +1,15 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from quail.utils import logger, load_cis
-from quail.io import ptot_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import ptot_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexPtot(Process):
+class ClimdexPtot(ScheduledProcess):
     """
     Wraps climdex.r95ptot, climdex.r99ptot and climdex.prcptot
     Computes the annual sum of precipitation in days where daily precipitation
@@ -20,6 +18,8 @@ class ClimdexPtot(Process):
     will be calculated.
     """
 
+    climdex_indices = ["r95ptot", "r99ptot", "prcptot"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -29,7 +29,7 @@ class ClimdexPtot(Process):
             },
         )
         inputs = ptot_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexPtot, self).__init__(
             self._handler,
@@ -56,9 +56,17 @@ class ClimdexPtot(Process):
             return f"r{threshold}"
 
     def _handler(self, request, response):
-        climdex_input, loglevel, output_file, threshold = process_inputs_alpha(
-            request.inputs, ptot_inputs, self.workdir
-        )
+        from quail.utils import logger, log_progress, OutputWriter
+        from quail.incremental import compute_index_incremental, incremental_items
+
+        (
+            climdex_input,
+            loglevel,
+            output_file,
+            output_format,
+            previous_output,
+            threshold,
+        ) = process_inputs_alpha(request.inputs, ptot_inputs, self.workdir)
 
         log_handler(
             self,
@@ -68,54 +76,48 @@ class ClimdexPtot(Process):
             log_level=loglevel,
             process_step="start",
         )
-        robjects.r("library(climdex.pcic)")
         func = self.get_func(threshold)
-        vectors = []
-        counter = 1
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing climdex.{func}ptot for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        results = map_in_workers(
+            compute_index_incremental,
+            incremental_items(climdex_input, previous_output, func),
+            f"climdex.{func}ptot",
+        )
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, mothly_pct in file_results.items():
+                writer.add(func, mothly_pct, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing climdex.{func}ptot for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    mothly_pct = robjects.r(f"climdex.{func}ptot(ci)")
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"{func}{counter}_{ci_name}"
-                robjects.r.assign(vector_name, mothly_pct)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving {func}ptot vectors to Rdata file",
+            f"Saving {func}ptot vectors to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -125,10 +127,7 @@ class ClimdexPtot(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
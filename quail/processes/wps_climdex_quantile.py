@@ -1,23 +1,48 @@
 import os
-from rpy2 import robjects
-from pywps import Process, LiteralOutput
+from pywps import LiteralOutput
 from pywps.app.Common import Metadata
 from pywps.app.exceptions import ProcessError
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import (
-    get_package,
-    load_rdata_to_python,
-    save_python_to_rdata,
-    r_valid_name,
-)
-from quail.utils import logger, validate_vectors
-from quail.io import quantile_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import run_in_worker
+from quail.io import quantile_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexQuantile(Process):
+def unpack_data_file(data_file, data_vector):
+    from rpy2 import robjects
+    from quail.utils import get_robj, rdata_format
+
+    data = get_robj(data_file, data_vector)
+    if rdata_format(data_file) == "rds":
+        return robjects.r["unlist"](data)
+    return data
+
+
+def compute_quantile(data_file, data_vector, quantiles_vector):
+    """Computes climdex.quantile on the data vector. Runs in an R worker."""
+    from rpy2 import robjects
+    from wps_tools.R import get_package
+    from quail.literals import r_vector
+
+    climdex = get_package("climdex.pcic")
+
+    if data_file:
+        data = unpack_data_file(data_file, data_vector)
+    else:
+        data = robjects.r(data_vector)
+
+    try:
+        quantiles = r_vector(quantiles_vector)
+        return climdex.climdex_quantile(data, quantiles)
+    except RRuntimeError as e:
+        raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+
+
+class ClimdexQuantile(ScheduledProcess):
     """
     Wraps climdex.quantile
     This function implements R’s type=8 in a more efficient manner.
@@ -40,6 +65,9 @@ class ClimdexQuantile(Process):
                 data_type="string",
             ),
             rda_output,
+            netcdf_output,
+            parquet_output,
+            json_output,
         ]
 
         super(ClimdexQuantile, self).__init__(
@@ -60,26 +88,16 @@ class ClimdexQuantile(Process):
             status_supported=True,
         )
 
-    def unpack_data_file(self, data_file, data_vector):
-        try:
-            return load_rdata_to_python(data_file, data_vector)
-        except (RRuntimeError, ProcessError, IndexError):
-            pass
-
-        try:
-            return robjects.r(f"unlist(readRDS('{data_file}'))")
-        except (RRuntimeError, ProcessError) as e:
-            raise ProcessError(
-                f"{type(e).__name__}: Data file must be a RDS file or "
-                "a Rdata file containing an object of the given name"
-            )
-
     def _handler(self, request, response):
+        from wps_tools.R import r_valid_name
+        from quail.utils import logger, validate_vectors, OutputWriter
+
         (
             data_file,
             data_vector,
             loglevel,
             output_file,
+            output_format,
             quantiles_vector,
             vector_name,
         ) = process_inputs_alpha(request.inputs, quantile_inputs, self.workdir)
@@ -94,7 +112,6 @@ class ClimdexQuantile(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
 
         log_handler(
             self,
@@ -105,11 +122,6 @@ class ClimdexQuantile(Process):
             process_step="load_rdata",
         )
 
-        if data_file:
-            data = self.unpack_data_file(data_file, data_vector)
-        else:
-            data = robjects.r(data_vector)
-
         log_handler(
             self,
             response,
@@ -118,23 +130,21 @@ class ClimdexQuantile(Process):
             log_level=loglevel,
             process_step="process",
         )
-
-        try:
-            quantiles = robjects.r(quantiles_vector)
-            quantile_vector = climdex.climdex_quantile(data, quantiles)
-        except RRuntimeError as e:
-            raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+        quantile_vector = run_in_worker(
+            compute_quantile, data_file, data_vector, quantiles_vector
+        )
 
         log_handler(
             self,
             response,
-            "Saving quantile as R data file",
+            "Saving quantile to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        save_python_to_rdata(vector_name, quantile_vector, output_path)
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
+        writer.add(vector_name, quantile_vector)
+        writer.save()
 
         log_handler(
             self,
@@ -144,12 +154,9 @@ class ClimdexQuantile(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
+        writer.build_output(response)
         response.outputs["output_vector"].data = str(quantile_vector)
 
-        # Clear R global env
-        robjects.r("rm(list=ls())")
-
         log_handler(
             self,
             response,
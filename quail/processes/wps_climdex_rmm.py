@@ -1,24 +1,23 @@
 import os
-from rpy2 import robjects
-from pywps import Process
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 from pywps.app.Common import Metadata
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import get_package
-from quail.utils import logger, load_cis
-from quail.io import rmm_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import rmm_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexRMM(Process):
+class ClimdexRMM(ScheduledProcess):
     """
     wraps climdex.r10mm, climdex.r20mm and climdex.rnnmm
     The annual count of days where daily precipitation is more
     than [threshold] mm per day
     """
 
+    climdex_indices = ["r10mm", "r20mm", "rnnmm"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -28,7 +27,7 @@ class ClimdexRMM(Process):
             },
         )
         inputs = rmm_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexRMM, self).__init__(
             self._handler,
@@ -48,20 +47,25 @@ class ClimdexRMM(Process):
             status_supported=True,
         )
 
-    def threshold_func(self, threshold, ci):
-        climdex = get_package("climdex.pcic")
-
+    def threshold_func(self, threshold):
+        """Returns the climdex function and extra arguments for the threshold"""
         if threshold == 10.0:
-            return climdex.climdex_r10mm(ci)
+            return "climdex.r10mm", []
         if threshold == 20.0:
-            return climdex.climdex_r20mm(ci)
+            return "climdex.r20mm", []
         else:
-            return climdex.climdex_rnnmm(ci, threshold)
+            return "climdex.rnnmm", [threshold]
 
     def _handler(self, request, response):
-        climdex_input, loglevel, output_file, threshold = process_inputs_alpha(
-            request.inputs, rmm_inputs, self.workdir
-        )
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+
+        (
+            climdex_input,
+            loglevel,
+            output_file,
+            output_format,
+            threshold,
+        ) = process_inputs_alpha(request.inputs, rmm_inputs, self.workdir)
 
         log_handler(
             self,
@@ -71,54 +75,45 @@ class ClimdexRMM(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing the annual count of days where daily precipitation is more than {threshold}mm per day for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        func, args = self.threshold_func(threshold)
+        results = map_in_workers(compute_index, climdex_input, func, *args)
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, count_days in file_results.items():
+                writer.add(f"r{threshold}mm", count_days, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing the annual count of days where daily precipitation is more than {threshold}mm per day for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    count_days = self.threshold_func(threshold, ci)
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"r{threshold}mm{counter}_{ci_name}"
-                robjects.r.assign(vector_name, count_days)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving climdex.r{threshold}mm outputs to R data file",
+            f"Saving climdex.r{threshold}mm outputs to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -128,10 +123,7 @@ class ClimdexRMM(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
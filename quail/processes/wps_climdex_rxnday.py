@@ -1,24 +1,23 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import get_package
-from quail.utils import logger, load_cis
-from quail.io import rxnday_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import rxnday_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexRxnday(Process):
+class ClimdexRxnday(ScheduledProcess):
     """
     Wraps
     climdex.rx1day: monthly or annual maximum 1-day precipitation
     climdex.rx5day: monthly or annual maximum 5-day consecutive precipitation.
     """
 
+    climdex_indices = ["rx1day", "rx5day"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -28,7 +27,7 @@ class ClimdexRxnday(Process):
             },
         )
         inputs = rxnday_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexRxnday, self).__init__(
             self._handler,
@@ -48,23 +47,27 @@ class ClimdexRxnday(Process):
             status_supported=True,
         )
 
-    def rxnday_func(self, ci, num_days, freq, center_mean_on_last_day):
-        climdex = get_package("climdex.pcic")
-
+    def rxnday_func(self, num_days, freq, center_mean_on_last_day):
+        """Returns the climdex function and extra arguments for num_days"""
         if num_days == 1:
-            return climdex.climdex_rx1day(ci, freq)
+            return "climdex.rx1day", [freq]
 
         elif num_days == 5:
-            return climdex.climdex_rx5day(ci, freq, center_mean_on_last_day)
+            return "climdex.rx5day", [freq, center_mean_on_last_day]
 
     def _handler(self, request, response):
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+        from quail.engines import rxnday_numpy
+
         (
             center_mean_on_last_day,
             climdex_input,
+            engine,
             freq,
             loglevel,
             num_days,
             output_file,
+            output_format,
         ) = process_inputs_alpha(request.inputs, rxnday_inputs, self.workdir)
 
         log_handler(
@@ -75,56 +78,50 @@ class ClimdexRxnday(Process):
             log_level=loglevel,
             process_step="start",
         )
-        robjects.r("library(climdex.pcic)")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
-
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
+        log_handler(
+            self,
+            response,
+            f"Processing Monthly Maximum {num_days}-day Precipitation for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        if engine == "numpy":
+            results = map_in_workers(
+                rxnday_numpy, climdex_input, num_days, freq, center_mean_on_last_day
             )
-            cis = load_cis(input)
+        else:
+            func, args = self.rxnday_func(num_days, freq, center_mean_on_last_day)
+            results = map_in_workers(compute_index, climdex_input, func, *args)
 
-            log_handler(
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, rxnday in file_results.items():
+                writer.add(f"rx{num_days}day", rxnday, counter, ci_name)
+            writer.flush()
+
+            log_progress(
                 self,
                 response,
-                f"Processing Monthly Maximum {num_days}-day Precipitation for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    rxnday = self.rxnday_func(
-                        ci, num_days, freq, center_mean_on_last_day
-                    )
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"rx{num_days}day{counter}_{ci_name}"
-                robjects.r.assign(vector_name, rxnday)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving rx{num_days}day vector to R data file",
+            f"Saving rx{num_days}day vector to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -134,10 +131,7 @@ class ClimdexRxnday(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
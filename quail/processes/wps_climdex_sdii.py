@@ -1,18 +1,15 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from wps_tools.R import get_package
-from quail.utils import logger, load_cis
-from quail.io import sdii_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import sdii_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexSDII(Process):
+class ClimdexSDII(ScheduledProcess):
     """
     Wraps climdex.sdii
     Computes the climdex index SDII, or Simple Precipitation Intensity Index.
@@ -21,6 +18,8 @@ class ClimdexSDII(Process):
     in the year.
     """
 
+    climdex_indices = ["sdii"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -30,7 +29,7 @@ class ClimdexSDII(Process):
             },
         )
         inputs = sdii_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexSDII, self).__init__(
             self._handler,
@@ -51,9 +50,16 @@ class ClimdexSDII(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, loglevel, output_file = process_inputs_alpha(
-            request.inputs, sdii_inputs, self.workdir
-        )
+        from quail.utils import logger, log_progress, OutputWriter
+        from quail.incremental import compute_index_incremental, incremental_items
+
+        (
+            climdex_input,
+            loglevel,
+            output_file,
+            output_format,
+            previous_output,
+        ) = process_inputs_alpha(request.inputs, sdii_inputs, self.workdir)
 
         log_handler(
             self,
@@ -63,54 +69,48 @@ class ClimdexSDII(Process):
             log_level=loglevel,
             process_step="start",
         )
-        climdex = get_package("climdex.pcic")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing the mean daily diurnal temperature range for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        results = map_in_workers(
+            compute_index_incremental,
+            incremental_items(climdex_input, previous_output, "sdii"),
+            "climdex.sdii",
+        )
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, sdii in file_results.items():
+                writer.add("sdii", sdii, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing the mean daily diurnal temperature range for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    sdii = climdex.climdex_sdii(ci)
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"sdii{counter}_{ci_name}"
-                robjects.r.assign(vector_name, sdii)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            "Saving dtr vector to R data file",
+            "Saving dtr vector to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -120,10 +120,7 @@ class ClimdexSDII(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
@@ -1,17 +1,15 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from quail.utils import logger, load_cis
-from quail.io import spells_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import spells_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexSpells(Process):
+class ClimdexSpells(ScheduledProcess):
     """
     Cold or warm spell duration index and maximum consecutive dry or wet days
     Wraps
@@ -21,6 +19,8 @@ class ClimdexSpells(Process):
     - climdex.wsdi
     """
 
+    climdex_indices = ["cdd", "csdi", "cwd", "wsdi"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -30,7 +30,7 @@ class ClimdexSpells(Process):
             },
         )
         inputs = spells_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexSpells, self).__init__(
             self._handler,
@@ -51,9 +51,18 @@ class ClimdexSpells(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, func, loglevel, output_file, span_years = process_inputs_alpha(
-            request.inputs, spells_inputs, self.workdir
-        )
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+        from quail.engines import spells_numpy
+
+        (
+            climdex_input,
+            engine,
+            func,
+            loglevel,
+            output_file,
+            output_format,
+            span_years,
+        ) = process_inputs_alpha(request.inputs, spells_inputs, self.workdir)
 
         log_handler(
             self,
@@ -63,55 +72,49 @@ class ClimdexSpells(Process):
             log_level=loglevel,
             process_step="start",
         )
-        robjects.r("library(climdex.pcic)")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
-
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
+        log_handler(
+            self,
+            response,
+            f"Processing climdex.{func} for each year for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        if engine == "numpy":
+            results = map_in_workers(spells_numpy, climdex_input, func, span_years)
+        else:
+            results = map_in_workers(
+                compute_index, climdex_input, f"climdex.{func}", span_years
             )
-            cis = load_cis(input)
 
-            log_handler(
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, spells in file_results.items():
+                writer.add(func, spells, counter, ci_name)
+            writer.flush()
+
+            log_progress(
                 self,
                 response,
-                f"Processing climdex.{func} for each year for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    robjects.r.assign("span_years", span_years)
-                    spells = robjects.r(f"climdex.{func}(ci, span_years)")
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"{func}{counter}_{ci_name}"
-                robjects.r.assign(vector_name, spells)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving {func} outputs to R data file",
+            f"Saving {func} outputs to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -121,10 +124,7 @@ class ClimdexSpells(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
@@ -1,17 +1,15 @@
 import os
-from rpy2 import robjects
-from pywps import Process
 from pywps.app.Common import Metadata
-from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib.embedded import RRuntimeError
 
-from wps_tools.logging import log_handler, common_status_percentages
+from wps_tools.logging import common_status_percentages
 from wps_tools.io import rda_output, process_inputs_alpha
-from quail.utils import logger, load_cis
-from quail.io import temp_pctl_inputs
+from quail.scheduler import ScheduledProcess
+from quail.metrics import log_handler
+from quail.workers import map_in_workers
+from quail.io import temp_pctl_inputs, netcdf_output, parquet_output, json_output
 
 
-class ClimdexTempPctl(Process):
+class ClimdexTempPctl(ScheduledProcess):
     """
     This process wraps climdex functions
     - climdex.tn10p: computes the monthly or annual percent of values below the 10th percentile of baseline daily minimum temperature.
@@ -20,6 +18,8 @@ class ClimdexTempPctl(Process):
     - climdex.tx90p: computes the monthly or annual percent of values above the 90th percentile of baseline daily maximum temperature.
     """
 
+    climdex_indices = ["tn10p", "tn90p", "tx10p", "tx90p"]
+
     def __init__(self):
         self.status_percentage_steps = dict(
             common_status_percentages,
@@ -29,7 +29,7 @@ class ClimdexTempPctl(Process):
             },
         )
         inputs = temp_pctl_inputs
-        outputs = [rda_output]
+        outputs = [rda_output, netcdf_output, parquet_output, json_output]
 
         super(ClimdexTempPctl, self).__init__(
             self._handler,
@@ -50,9 +50,16 @@ class ClimdexTempPctl(Process):
         )
 
     def _handler(self, request, response):
-        climdex_input, freq, func, loglevel, output_file = process_inputs_alpha(
-            request.inputs, temp_pctl_inputs, self.workdir
-        )
+        from quail.utils import logger, compute_index, log_progress, OutputWriter
+
+        (
+            climdex_input,
+            freq,
+            func,
+            loglevel,
+            output_file,
+            output_format,
+        ) = process_inputs_alpha(request.inputs, temp_pctl_inputs, self.workdir)
 
         log_handler(
             self,
@@ -62,54 +69,44 @@ class ClimdexTempPctl(Process):
             log_level=loglevel,
             process_step="start",
         )
-        robjects.r("library(climdex.pcic)")
-        vectors = []
+        writer = OutputWriter(os.path.join(self.workdir, output_file), output_format)
 
-        counter = 1
         total = len(climdex_input)
+        log_handler(
+            self,
+            response,
+            f"Processing climdex.{func} for {total} files",
+            logger,
+            log_level=loglevel,
+            process_step="load_rdata",
+        )
+        results = map_in_workers(compute_index, climdex_input, f"climdex.{func}", freq)
 
-        for input in climdex_input:
-            log_handler(
-                self,
-                response,
-                f"Loading climdexInput from R data file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="load_rdata",
-            )
-            cis = load_cis(input)
+        for done, (index, file_results) in enumerate(results, start=1):
+            counter = index + 1
+            for ci_name, mothly_pct in file_results.items():
+                writer.add(func, mothly_pct, counter, ci_name)
+            writer.flush()
 
-            log_handler(
+            log_progress(
                 self,
                 response,
-                f"Processing climdex.{func} for file {counter}/{total}",
-                logger,
-                log_level=loglevel,
-                process_step="process",
+                f"Processed file {counter} ({done}/{total})",
+                loglevel,
+                done,
+                total,
+                "load_rdata",
             )
 
-            for ci_name, ci in cis.items():
-                try:
-                    robjects.r.assign("ci", ci)
-                    mothly_pct = robjects.r(f"climdex.{func}(ci, '{freq}')")
-                except RRuntimeError as e:
-                    raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
-
-                vector_name = f"{func}{counter}_{ci_name}"
-                robjects.r.assign(vector_name, mothly_pct)
-                vectors.append(vector_name)
-            counter += 1
-
         log_handler(
             self,
             response,
-            f"Saving {func} as R data file",
+            f"Saving {func} to output file",
             logger,
             log_level=loglevel,
             process_step="save_rdata",
         )
-        output_path = os.path.join(self.workdir, output_file)
-        robjects.r["save"](*vectors, file=output_path)
+        writer.save()
 
         log_handler(
             self,
@@ -119,10 +116,7 @@ class ClimdexTempPctl(Process):
             log_level=loglevel,
             process_step="build_output",
         )
-        response.outputs["rda_output"].file = output_path
-
-        # Clear R global env
-        robjects.r("rm(list=ls())")
+        writer.build_output(response)
 
         log_handler(
             self,
@@ -0,0 +1,165 @@
+"""
+Reuse of climdexInput baseline quantiles.
+
+Building a climdexInput computes the threshold quantiles of its base period,
+with a bootstrap for the in-base years, which is the most expensive part of
+the build. The quantiles only depend on the data in the base period and on
+the quantile parameters, so each build is keyed by a digest of those. The
+quantiles of a build are kept in the R worker's quantiles cache (sized by
+``quantiles_cache_mb`` in the ``[quail]`` configuration section) and saved
+as an artifact that later builds can be given back, so rebuilding a station
+whose base period has not changed skips the bootstrap.
+"""
+
+import hashlib
+import numpy as np
+from rpy2 import robjects
+from pywps.app.exceptions import ProcessError
+from rpy2.rinterface_lib.embedded import RRuntimeError
+
+from wps_tools.R import get_package
+from quail.cache import get_quantiles_cache
+from quail.utils import logger, get_robj
+from quail.literals import r_vector
+
+
+# Name of the quantiles object in artifacts, and its digest attribute
+QUANTILES_NAME = "quantiles"
+DIGEST_ATTR = "baseline_digest"
+
+# Forces the pending quantiles of a climdexInput's quantiles environment
+QUANTILES_LIST = "function(env) mget(ls(env), envir=env)"
+
+# Values and dates (as numbers) of the days in the base period, padded by
+# the n day window used around each day of year
+BASELINE_DATA = """
+function(values, dates, base.range, n) {
+    cal <- attr(dates, "cal")
+    first <- as.PCICt(paste0(base.range[1], "-01-01"), cal=cal) - n * 86400
+    last <- as.PCICt(paste0(base.range[2] + 1, "-01-01"), cal=cal) + n * 86400
+    in.base <- dates >= first & dates < last
+    list(values[in.base], as.numeric(dates[in.base]))
+}
+"""
+
+
+def baseline_digest(
+    params, base_range, n, temp_qtiles, prec_qtiles, min_base_data_fraction_present
+):
+    """Returns a digest of the base period data in `params` (the data and
+    dates arguments of climdexInput.raw) and of the parameters the
+    quantiles are computed with.
+    """
+    baseline_data = robjects.r(BASELINE_DATA)
+    digest = hashlib.sha256()
+
+    for parameter in (base_range, n, temp_qtiles, prec_qtiles):
+        digest.update(repr(list(r_vector(str(parameter)))).encode())
+    digest.update(repr(min_base_data_fraction_present).encode())
+
+    base_range = r_vector(base_range)
+
+    for var in sorted(name for name in params if not name.endswith("_dates")):
+        values, dates = baseline_data(
+            params[var], params[f"{var}_dates"], base_range, n
+        )
+        digest.update(var.encode())
+        digest.update(np.asarray(values, dtype=float).tobytes())
+        digest.update(np.asarray(dates, dtype=float).tobytes())
+
+    return digest.hexdigest()
+
+
+def read_quantiles(quantiles_file, digest):
+    """Returns the quantiles saved in a `quantiles_file` artifact, or None if
+    they were computed from different base period data or parameters.
+    """
+    quantiles = get_robj(quantiles_file, QUANTILES_NAME)
+    saved_digest = robjects.r["attr"](quantiles, DIGEST_ATTR)
+    if robjects.r["is.null"](saved_digest)[0] or saved_digest[0] != digest:
+        logger.warning("Quantiles file does not match the base period, ignoring it")
+        return None
+    return quantiles
+
+
+def evaluate_quantiles(ci, digest):
+    """Returns the quantiles of a climdexInput as a list, for its `quantiles`
+    argument, computing any that are still pending. Returns None if they
+    cannot be computed, e.g. for lack of base period data, in which case R
+    will retry when an index needs them.
+    """
+    try:
+        quantiles = robjects.r(QUANTILES_LIST)(ci.slots["quantiles"])
+    except RRuntimeError as e:
+        logger.warning(f"Unable to compute baseline quantiles: {str(e)}")
+        return None
+
+    return robjects.r["structure"](quantiles, **{DIGEST_ATTR: digest})
+
+
+def build_climdex_input(
+    params,
+    quantiles_file,
+    base_range,
+    n,
+    northern_hemisphere,
+    quantiles,
+    temp_qtiles,
+    prec_qtiles,
+    max_missing_days,
+    min_base_data_fraction_present,
+):
+    """Runs climdexInput.raw with the data and dates in `params`, reusing the
+    baseline quantiles of an earlier build with the same base period if the
+    `quantiles_file` artifact or the quantiles cache has them. Quantiles
+    given explicitly with `quantiles` (an R expression) are used as they are.
+    Returns the climdexInput and its baseline quantiles artifact (None if
+    there is none).
+    """
+    climdex = get_package("climdex.pcic")
+    digest = None
+    baseline = robjects.NULL
+
+    if quantiles == "NULL":
+        digest = baseline_digest(
+            params,
+            base_range,
+            n,
+            temp_qtiles,
+            prec_qtiles,
+            min_base_data_fraction_present,
+        )
+        cached = get_quantiles_cache().get(digest)
+        if cached is None and quantiles_file:
+            cached = read_quantiles(quantiles_file, digest)
+        if cached is not None:
+            logger.debug(f"Reusing baseline quantiles {digest}")
+            baseline = cached
+    else:
+        baseline = robjects.r(quantiles)
+
+    try:
+        ci = climdex.climdexInput_raw(
+            **params,
+            base_range=r_vector(base_range),
+            n=n,
+            northern_hemisphere=northern_hemisphere,
+            quantiles=baseline,
+            temp_qtiles=r_vector(temp_qtiles),
+            prec_qtiles=r_vector(prec_qtiles),
+            max_missing_days=r_vector(max_missing_days),
+            min_base_data_fraction_present=min_base_data_fraction_present,
+        )
+    except RRuntimeError as e:
+        raise ProcessError(msg=f"{type(e).__name__}: {str(e)}")
+
+    if digest is None:
+        return ci, None
+
+    if baseline is robjects.NULL:
+        baseline = evaluate_quantiles(ci, digest)
+    if baseline is not None:
+        size = robjects.r["object.size"](baseline)[0]
+        get_quantiles_cache().put(digest, baseline, size)
+
+    return ci, baseline
@@ -0,0 +1,284 @@
+"""
+Scheduling of R work from concurrent requests on the shared worker pool.
+
+Tasks sent to the R workers (see ``quail.workers``) wait in the scheduler
+until a worker is free, instead of in the pool's first-come first-served
+queue. Each task belongs to the job of the request that sent it, which gives
+its queue, owner and priority:
+
+- climdexInput construction runs in the ``build`` queue, which may only use
+  ``build_workers`` workers at once, and index computation in the ``index``
+  queue, so long builds cannot take over the pool.
+- Synchronous (interactive) requests have a higher priority than
+  asynchronous ones, whose tasks only run when no interactive task waits.
+- Among tasks of the same priority, the next free worker goes to the owner
+  (user or client address) with the fewest tasks running, then to the one
+  served least recently, so a 100-station job from one user does not hold up
+  others.
+
+Asynchronous requests of processes based on ``ScheduledProcess`` run in a
+thread of the server process rather than a process of their own, so that
+all requests share one worker pool and one scheduler. Their R work in the
+server process is serialized with that of other requests (see
+``quail.workers.server_r``), and when the server exits, those still running
+after ``shutdown_timeout`` seconds are marked as failed.
+"""
+
+import atexit
+import time
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from concurrent.futures import Future, CancelledError
+from itertools import count
+from pywps import Process
+from pywps.response.status import WPS_STATUS
+
+from quail.metrics import timed, input_size
+
+
+QUEUES = ("build", "index")
+
+# Priorities of synchronous and asynchronous requests
+INTERACTIVE = 1
+BACKGROUND = 0
+
+
+@dataclass(frozen=True)
+class Job:
+    queue: str = "index"
+    owner: str = "anonymous"
+    priority: int = INTERACTIVE
+
+
+@dataclass
+class Task:
+    job: Job
+    func: object
+    args: tuple
+    kwargs: dict
+    order: int
+    future: Future = field(default_factory=Future)
+
+
+_current_job = ContextVar("current_job", default=Job())
+
+# Threads running asynchronous requests, with their responses
+_async_runs = {}
+_async_lock = threading.Lock()
+
+
+def current_job():
+    """Returns the job of the request being handled"""
+    return _current_job.get()
+
+
+@contextmanager
+def job(queue="index", owner="anonymous", priority=INTERACTIVE):
+    """Runs the enclosed code as a job of `owner` in `queue` with `priority`,
+    so that the R work it sends to the workers is scheduled as such
+    """
+    if queue not in QUEUES:
+        raise ValueError(f"Unknown queue: {queue}")
+
+    token = _current_job.set(Job(queue, owner, priority))
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def request_owner(wps_request):
+    """Returns the user, or else the client address, of a WPS request"""
+    http_request = getattr(wps_request, "http_request", None)
+    if http_request is None:
+        return "anonymous"
+
+    user = http_request.environ.get("REMOTE_USER")
+    forwarded = http_request.headers.get("X-Forwarded-For", "")
+    return user or forwarded.split(",")[0].strip() or http_request.remote_addr
+
+
+class Scheduler:
+    """Dispatches tasks to at most `workers` workers through `submit` (e.g.
+    the ``submit`` method of an executor), picking the next task by queue
+    limit, priority and owner as described above. `limits` gives the
+    number of workers each queue may use at once.
+    """
+
+    def __init__(self, submit, workers, limits):
+        self.submit_to_pool = submit
+        self.workers = workers
+        self.limits = limits
+        self.pending = []
+        self.running = Counter()
+        self.owner_running = Counter()
+        self.last_served = {}
+        self.order = count()
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Schedules ``func(*args, **kwargs)`` as a task of the current job.
+        Returns a future of its result, which may be cancelled until the task
+        is dispatched.
+        """
+        task = Task(current_job(), func, args, kwargs, next(self.order))
+        with self.lock:
+            self.pending.append(task)
+        self.dispatch()
+        return task.future
+
+    def next_task(self):
+        """Removes and returns the next task to run, or None if no queue with
+        pending tasks has a free worker. Must be called with the lock held.
+        """
+        self.pending = [task for task in self.pending if not task.future.cancelled()]
+        ready = [
+            task
+            for task in self.pending
+            if self.running[task.job.queue] < self.limits[task.job.queue]
+        ]
+        if not ready:
+            return None
+
+        task = min(
+            ready,
+            key=lambda task: (
+                -task.job.priority,
+                self.owner_running[task.job.owner],
+                self.last_served.get(task.job.owner, -1),
+                task.order,
+            ),
+        )
+        self.pending.remove(task)
+        return task
+
+    def dispatch(self):
+        """Starts pending tasks while workers are free"""
+        started = []
+        with self.lock:
+            while sum(self.running.values()) < self.workers:
+                task = self.next_task()
+                if task is None:
+                    break
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+
+                self.running[task.job.queue] += 1
+                self.owner_running[task.job.owner] += 1
+                self.last_served[task.job.owner] = task.order
+                started.append(task)
+
+        for task in started:
+            try:
+                pool_future = self.submit_to_pool(task.func, *task.args, **task.kwargs)
+            except Exception as e:
+                self.finish(task)
+                task.future.set_exception(e)
+                continue
+            pool_future.add_done_callback(
+                lambda pool_future, task=task: self.complete(task, pool_future)
+            )
+
+    def finish(self, task):
+        with self.lock:
+            self.running[task.job.queue] -= 1
+            self.owner_running[task.job.owner] -= 1
+
+    def complete(self, task, pool_future):
+        self.finish(task)
+        self.dispatch()
+
+        # Tasks of a pool that was shut down are cancelled there
+        if pool_future.cancelled():
+            task.future.set_exception(CancelledError())
+            return
+
+        exception = pool_future.exception()
+        if exception is not None:
+            task.future.set_exception(exception)
+        else:
+            task.future.set_result(pool_future.result())
+
+
+def shutdown_async(timeout):
+    """Waits up to `timeout` seconds for the asynchronous requests running in
+    threads of this process, and marks those still running as failed, since
+    their threads stop with the process
+    """
+    deadline = time.monotonic() + timeout
+    with _async_lock:
+        runs = list(_async_runs.items())
+
+    for thread, wps_response in runs:
+        thread.join(max(0, deadline - time.monotonic()))
+        if thread.is_alive():
+            wps_response._update_status(
+                WPS_STATUS.FAILED, "Server stopped before the process finished", 100
+            )
+
+
+@atexit.register
+def _shutdown_async():
+    if not _async_runs:
+        return
+
+    from pywps import configuration
+
+    shutdown_async(
+        float(configuration.get_config_value("quail", "shutdown_timeout", 0))
+    )
+
+
+class ScheduledProcess(Process):
+    """pywps Process whose R work is scheduled as a job in the `queue` of its
+    class, owned by the user of the request. Its requests are timed step by
+    step (see ``quail.metrics``).
+    """
+
+    queue = "index"
+
+    def _run_async(self, wps_request, wps_response):
+        from quail.workers import pool_size
+
+        # Without R workers the work runs in the request's own R runtime,
+        # which must not be shared between threads
+        if pool_size() == 0:
+            return super()._run_async(wps_request, wps_response)
+
+        thread = threading.Thread(
+            target=self._run_tracked, args=(wps_request, wps_response), daemon=True
+        )
+        with _async_lock:
+            _async_runs[thread] = wps_response
+        thread.start()
+
+    def _run_tracked(self, wps_request, wps_response):
+        try:
+            self._run_process(wps_request, wps_response)
+        finally:
+            with _async_lock:
+                del _async_runs[threading.current_thread()]
+
+    def _run_process(self, wps_request, wps_response):
+        from quail.workers import pool_size, server_r
+
+        priority = BACKGROUND if self.async_ else INTERACTIVE
+        with (
+            job(self.queue, request_owner(wps_request), priority),
+            timed(self.identifier) as timer,
+        ):
+            # Without R workers, synchronous requests use R as before and
+            # asynchronous ones run in processes of their own
+            if pool_size() == 0:
+                super()._run_process(wps_request, wps_response)
+            else:
+                with server_r():
+                    super()._run_process(wps_request, wps_response)
+            status = (
+                "failed" if wps_response.status == WPS_STATUS.FAILED else "succeeded"
+            )
+            timer.finish(status, input_size(wps_request))
+        return wps_response
@@ -0,0 +1,66 @@
+"""
+Parquet output of climdex index vectors.
+
+Index vectors are written as a single tidy table with one row per value:
+the number of the input file, the climdexInput name (``station``), the index
+label, the period and the value. The rows of each input file are written as
+a Parquet row group once its results are in and then dropped, so memory use
+does not grow with the number of stations. Readers can skip row groups by
+their column statistics when filtering on any of these columns.
+"""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from quail.netcdf import vector_values
+
+
+SCHEMA = pa.schema(
+    [
+        pa.field("file", pa.int32()),
+        pa.field("station", pa.string()),
+        pa.field("index", pa.string()),
+        pa.field("period", pa.string()),
+        pa.field("value", pa.float64()),
+    ]
+)
+
+
+class IndexTable:
+    """Parquet file of index values, written a row group at a time"""
+
+    def __init__(self, path):
+        self.writer = pq.ParquetWriter(path, SCHEMA, compression="zstd")
+        self.rows = {name: [] for name in SCHEMA.names}
+
+    def add(self, index, vector, counter=None, ci_name=None):
+        """Adds the values of the R `vector` of `index` computed from the
+        climdexInput `ci_name` of input file `counter`. Values of vectors
+        without names get their position as period.
+        """
+        values, periods = vector_values(vector)
+        if periods is None:
+            periods = [str(position) for position in range(1, len(values) + 1)]
+
+        self.rows["file"].extend([counter] * len(values))
+        self.rows["station"].extend([ci_name] * len(values))
+        self.rows["index"].extend([index] * len(values))
+        self.rows["period"].extend(periods)
+        self.rows["value"].extend(values.tolist())
+
+    def flush(self):
+        """Writes the rows added since the last flush as a row group"""
+        if not self.rows["value"]:
+            return
+
+        # NA values (NaN) are written as nulls
+        columns = [
+            pa.array(self.rows[field.name], field.type, from_pandas=True)
+            for field in SCHEMA
+        ]
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=SCHEMA))
+        self.rows = {name: [] for name in SCHEMA.names}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
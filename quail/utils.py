@@ -1,7 +1,7 @@
-import logging
+import logging, os, re, json, math, gzip, bz2, lzma
 from rpy2 import robjects
+from pywps import configuration
 from pywps.app.exceptions import ProcessError
-from rpy2.rinterface_lib._rinterface_capi import RParsingError
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
 # Libraries for test functions
@@ -10,9 +10,24 @@ from importlib.resources import files
 from tempfile import NamedTemporaryFile
 
 # PCIC libraries
-from wps_tools.R import get_robjects, load_rdata_to_python
+from wps_tools.R import get_robjects
 from wps_tools.io import collect_args
 
+from quail.metrics import log_handler
+from quail.cache import get_ci_cache, file_digest
+from quail.views import views_equal
+from quail.netcdf import save_netcdf, vector_values
+from quail.tables import IndexTable
+from quail.literals import parse_vector
+
+
+# Process output and file extension of each output format
+OUTPUT_FORMATS = {
+    "rda": ("rda_output", ".rda"),
+    "netcdf": ("netcdf_output", ".nc"),
+    "parquet": ("parquet_output", ".parquet"),
+    "json": ("json_output", None),
+}
 
 logger = logging.getLogger("PYWPS")
 logger.setLevel(logging.NOTSET)
@@ -25,24 +40,198 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 
+# Headers of save() and saveRDS() output, for XDR, ascii and native binary
+RDATA_MAGIC = (b"RDX2\n", b"RDX3\n", b"RDA2\n", b"RDA3\n", b"RDB2\n", b"RDB3\n")
+RDS_MAGIC = (b"X\n", b"A\n", b"B\n")
+COMPRESSED_MAGIC = {
+    b"\x1f\x8b": gzip.open,
+    b"BZh": bz2.open,
+    b"\xfd7zXZ\x00": lzma.open,
+}
+
+
+# Indices computed by climdex.pcic functions named climdex.<index>
+CLIMDEX_INDICES = [
+    "fd",
+    "su",
+    "id",
+    "tr",
+    "gsl",
+    "txx",
+    "tnx",
+    "txn",
+    "tnn",
+    "tn10p",
+    "tx10p",
+    "tn90p",
+    "tx90p",
+    "wsdi",
+    "csdi",
+    "dtr",
+    "rx1day",
+    "rx5day",
+    "sdii",
+    "r10mm",
+    "r20mm",
+    "rnnmm",
+    "cdd",
+    "cwd",
+    "r95ptot",
+    "r99ptot",
+    "prcptot",
+]
+
+NO_CLIMDEX_INPUT = (
+    "Data file must be a RDS file or a Rdata file containing a ClimdexInput object"
+)
+
+INDEX_SPEC = re.compile(r"^\s*(?P<index>\w+)\s*(\((?P<args>.*)\))?\s*$")
+INDEX_ARG = re.compile(r"^\s*(?P<name>[A-Za-z][\w.]*)\s*[=:]\s*(?P<value>.+?)\s*$")
+
+
 def validate_vectors(vectors):
+    """Checks that each of `vectors` is an R vector literal (see
+    ``quail.literals``), without evaluating it in R
+    """
     for vector in vectors:
-        try:
-            vect = robjects.r(vector)
-            if not robjects.r["is.vector"](vect)[0]:
-                raise ProcessError("Invalid type passed for vector")
+        parse_vector(vector)
+
+
+def rdata_format(r_file):
+    """Returns "rdata" or "rds" according to the magic bytes at the start of
+    `r_file` (inside its gzip, bzip2 or xz compression, if any), or None if
+    the format is not recognized.
+    """
+    try:
+        with open(r_file, "rb") as file_:
+            header = file_.read(len(max(COMPRESSED_MAGIC, key=len)))
+
+        opener = open
+        for magic, compressed_opener in COMPRESSED_MAGIC.items():
+            if header.startswith(magic):
+                opener = compressed_opener
+
+        with opener(r_file, "rb") as file_:
+            header = file_.read(5)
+    except (OSError, EOFError, lzma.LZMAError):
+        return None
+
+    if header.startswith(RDATA_MAGIC):
+        return "rdata"
+    elif header.startswith(RDS_MAGIC):
+        return "rds"
+    return None
+
+
+def load_rdata(r_file):
+    """Loads an Rdata file into a new R environment and returns it. Nothing is
+    added to the global env, so the objects are dropped with the environment.
+    """
+    env = robjects.r["new.env"]()
+    robjects.r["load"](file=r_file, envir=env)
+    return env
+
+
+def save_rdata(vector_name, robj, output_path):
+    """Saves an R object to an Rdata file under `vector_name` without
+    assigning it in the global env.
+    """
+    env = robjects.r["new.env"]()
+    env[vector_name] = robj
+    robjects.r["save"](vector_name, file=output_path, envir=env)
 
-        except RParsingError as e:
+
+def json_max_values():
+    """Returns the largest number of index values returned as JSON"""
+    return int(configuration.get_config_value("quail", "json_max_values", 10000))
+
+
+def vectors_json(env, vectors):
+    """Returns a JSON object of the `vectors` in the R environment `env` by
+    name, each mapping its periods to its values (or a list of values for
+    vectors without names). NA values are null.
+    """
+    content = {}
+    for name in vectors:
+        values, periods = vector_values(env[name])
+        values = [None if math.isnan(value) else value for value in values.tolist()]
+        content[name] = values if periods is None else dict(zip(periods, values))
+
+    return json.dumps(content)
+
+
+class OutputWriter:
+    """Writes the index vectors of a process to `output_path` in
+    `output_format`, replacing its extension with that of the format.
+    Vectors of an Rdata ("rda") or CF NetCDF ("netcdf", see
+    `quail.netcdf.save_netcdf`) file are kept in an R environment until the
+    file is saved. Parquet ("parquet", see `quail.tables.IndexTable`) rows
+    are written out at each `flush`, which processes call once per input
+    file. JSON ("json") output is returned inline in the response instead of
+    as a file, for results of at most `json_max_values` values.
+    """
+
+    def __init__(self, output_path, output_format="rda"):
+        self.output, extension = OUTPUT_FORMATS[output_format]
+        self.path = None
+        if extension is not None:
+            self.path = os.path.splitext(output_path)[0] + extension
+        self.output_format = output_format
+        self.env = robjects.r["new.env"]()
+        self.vectors = []
+        self.size = 0
+        self.json = None
+        self.table = IndexTable(self.path) if output_format == "parquet" else None
+
+    def add(self, label, vector, counter=None, ci_name=None):
+        """Adds the index `vector` named `label`, computed from the
+        climdexInput `ci_name` of input file `counter` if given. Its vector
+        name is then "<label><counter>_<climdexInput name>".
+        """
+        if self.table is not None:
+            self.table.add(label, vector, counter, ci_name)
+            return
+
+        self.size += len(vector)
+        if self.output_format == "json" and self.size > json_max_values():
             raise ProcessError(
-                msg=f"{type(e).__name__}: Invalid vector format, follow R vector syntax"
+                f"Results have more than {json_max_values()} values, too many for "
+                "json output; use another output_format"
             )
 
+        vector_name = label if counter is None else f"{label}{counter}_{ci_name}"
+        self.env[vector_name] = vector
+        self.vectors.append(vector_name)
+
+    def flush(self):
+        """Writes out the vectors added so far, if the format allows it"""
+        if self.table is not None:
+            self.table.flush()
+
+    def save(self):
+        """Saves the output file, or builds the JSON output"""
+        if self.table is not None:
+            self.table.close()
+        elif self.output_format == "json":
+            self.json = vectors_json(self.env, self.vectors)
+        elif self.output_format == "netcdf":
+            save_netcdf(self.env, self.vectors, self.path)
+        else:
+            robjects.r["save"](*self.vectors, file=self.path, envir=self.env)
+
+    def build_output(self, response):
+        """Sets the saved output on a process `response`"""
+        if self.output_format == "json":
+            response.outputs[self.output].data = self.json
+        else:
+            response.outputs[self.output].file = self.path
+
 
 def get_ClimdexInputs(r_file):
     """Returns a dictionary of all ClimdexInput Objects from an Rdata file."""
-    robjs = list(robjects.r(f"load(file='{r_file}')"))
+    env = load_rdata(r_file)
     cis = {
-        ci: robjects.r(ci) for ci in robjs if robjects.r(ci).rclass[0] == "climdexInput"
+        name: env[name] for name in env.keys() if env[name].rclass[0] == "climdexInput"
     }
     if len(cis) == 0:
         raise IndexError
@@ -51,25 +240,52 @@ def get_ClimdexInputs(r_file):
 
 
 def load_cis(r_file):
+    """Returns the climdexInputs in `r_file` (see `read_cis`). Loaded objects
+    are kept in this process' climdexInput cache, keyed by the file content,
+    so repeated requests on the same file skip reading it.
+    """
+    cache = get_ci_cache()
+    if cache.max_size == 0:
+        return read_cis(r_file)
+
+    key = file_digest(r_file)
+    cis = cache.get(key)
+    if cis is None:
+        cis = read_cis(r_file)
+        size = sum(robjects.r["object.size"](ci)[0] for ci in cis.values())
+        cache.put(key, cis, size)
+    logger.debug(f"climdexInput cache: {cache.stats()}")
+
+    return cis
+
+
+def read_cis(r_file):
     """RDS and RDA files have the same mimetype, so the pyWPS ClimdexInput
     is unable to tell them apart and apply the correct suffix. The R function
     `load()` can only read Rdata files and `readRDS()` can only read RDS
-    files. Without the input having a suffix, this function passes the input
-    to `load()`, then, if that raises an exception, passes it to `readRDS()`,
-    and finally if that fails, raises a ProcessError.
+    files. This function reads the file's header to pass it straight to the
+    right one (see `rdata_format`). A file of unrecognized format is passed
+    to `load()`, then, if that raises an exception, to `readRDS()`. If
+    loading fails, a ProcessError with the message ``NO_CLIMDEX_INPUT`` is
+    raised.
     """
-    try:
-        return get_ClimdexInputs(r_file)
-    except (RRuntimeError, ProcessError, IndexError):
-        pass
+    r_format = rdata_format(r_file)
 
-    try:
-        return {"ci": load_rds_ci(r_file)}
-    except (RRuntimeError, ProcessError) as e:
-        raise ProcessError(
-            f"{type(e).__name__}: Data file must be a RDS file or "
-            "a Rdata file containing a ClimdexInput object of the given name"
-        )
+    if r_format != "rds":
+        try:
+            return get_ClimdexInputs(r_file)
+        except (RRuntimeError, ProcessError, IndexError) as e:
+            error = e
+
+    if r_format != "rdata":
+        try:
+            return {"ci": load_rds_ci(r_file)}
+        except (RRuntimeError, ProcessError) as e:
+            error = e
+
+    # Which reader failed, and how, depends on the file's format, so the
+    # cause is chained rather than named in the message
+    raise ProcessError(NO_CLIMDEX_INPUT) from error
 
 
 def load_rds_ci(r_file):
@@ -82,25 +298,157 @@ def load_rds_ci(r_file):
 
 
 def get_robj(r_file, object_name):
-    """RDS and RDA files have the same mimetype, so the pyWPS ClimdexInput
-    is unable to tell them apart and apply the correct suffix. The R function
-    `load()` can only read Rdata files and `readRDS()` can only read RDS
-    files. Without the input having a suffix, this function passes the input
-    to `load()`, then, if that raises an exception, passes it to `readRDS()`,
-    and finally if that fails, raises a ProcessError.
+    """Returns the object `object_name` from a Rdata file, or the object in
+    a RDS file. `object_name` may also be an R expression on the objects of
+    the Rdata file (e.g. "unlist(ci['MAX_TEMP'])"), which is evaluated in
+    the environment they are loaded into. As with `read_cis`, the reader is
+    picked from the file's header, and a file of unrecognized format is
+    passed to `load()`, then to `readRDS()`. If loading fails, a
+    ProcessError is raised.
     """
-    try:
-        return load_rdata_to_python(r_file, object_name)
-    except (RRuntimeError, ProcessError, IndexError):
-        pass
+    r_format = rdata_format(r_file)
+
+    if r_format != "rds":
+        try:
+            return robjects.r["eval"](
+                robjects.r["parse"](text=object_name), envir=load_rdata(r_file)
+            )
+        except (RRuntimeError, ProcessError, IndexError, KeyError) as e:
+            error = e
+
+    if r_format != "rdata":
+        try:
+            return robjects.r(f"readRDS('{r_file}')")
+        except (RRuntimeError, ProcessError) as e:
+            error = e
+
+    raise ProcessError(
+        f"{type(error).__name__}: Data file must be a RDS file or "
+        "a Rdata file containing an object of the given name"
+    )
+
+
+def compute_index(r_file, func, *args, **kwargs):
+    """Loads the climdexInputs in `r_file` and applies the R function `func`
+    (e.g. "climdex.su") to each one. Returns a dictionary of the results by
+    climdexInput name. Meant to be dispatched to an R worker with
+    `quail.workers.run_in_worker`.
+    """
+    cis = load_cis(r_file)
+    climdex_func = robjects.r[func]
 
     try:
-        return robjects.r(f"readRDS('{r_file}')")
-    except (RRuntimeError, ProcessError) as e:
-        raise ProcessError(
-            f"{type(e).__name__}: Data file must be a RDS file or "
-            "a Rdata file containing an object of the given name"
+        return {
+            ci_name: climdex_func(ci, *args, **kwargs) for ci_name, ci in cis.items()
+        }
+    except RRuntimeError as e:
+        raise ProcessError(msg=f"{type(e).__name__} in file {r_file}: {str(e)}")
+
+
+def parse_index_spec(spec):
+    """Parses an index specification such as "su", "rnnmm(threshold=15)" or
+    "rx5day(freq='annual', center.mean.on.last.day=TRUE)" into the index name
+    and a dictionary of arguments for its climdex function. Arguments may
+    also be given as name:value, which is easier to pass in KVP requests.
+    Argument values may be numbers, TRUE/FALSE, or (optionally quoted)
+    strings. Returns
+    (index, args, label), where label names the index and argument values for
+    use in output vector names (e.g. "rx5day_annual_TRUE").
+    """
+    match = INDEX_SPEC.match(spec)
+    if not match or match.group("index") not in CLIMDEX_INDICES:
+        raise ProcessError(f"Invalid index specification: {spec}")
+
+    index = match.group("index")
+    args = {}
+    if match.group("args") and match.group("args").strip():
+        for arg in match.group("args").split(","):
+            arg_match = INDEX_ARG.match(arg)
+            if not arg_match:
+                raise ProcessError(f"Invalid argument in index specification: {spec}")
+            # climdex.pcic argument names use dots, e.g. center.mean.on.last.day
+            name = arg_match.group("name").replace("_", ".")
+            args[name] = parse_literal(arg_match.group("value"))
+
+    label = "_".join(
+        [index]
+        + [
+            re.sub(
+                r"[^\w.]",
+                "",
+                str(value).upper() if isinstance(value, bool) else str(value),
+            )
+            for value in args.values()
+        ]
+    )
+    return index, args, label
+
+
+def parse_literal(value):
+    """Converts a literal argument value to a bool, int, float or str"""
+    if value in ("TRUE", "True", "true"):
+        return True
+    elif value in ("FALSE", "False", "false"):
+        return False
+
+    for type_ in (int, float):
+        try:
+            return type_(value)
+        except ValueError:
+            pass
+
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+
+def compute_indices(r_file, specs, engine="R"):
+    """Loads the climdexInputs in `r_file` once and computes each of the
+    parsed index specifications (see `parse_index_spec`) for every one of
+    them. With the "numpy" `engine`, spell indices are computed by
+    `quail.engines.spell_specs_numpy` and the others by climdex.pcic.
+    Returns a dictionary of {label: {climdexInput name: result}}, in the
+    order of `specs`. Meant to be dispatched to an R worker with
+    `quail.workers.run_in_worker`.
+    """
+    cis = load_cis(r_file)
+    results = {}
+
+    r_specs = specs
+    if engine == "numpy":
+        from quail.engines import is_spell_spec, spell_specs_numpy
+
+        results.update(
+            spell_specs_numpy(cis, [spec for spec in specs if is_spell_spec(spec)])
         )
+        r_specs = [spec for spec in specs if not is_spell_spec(spec)]
+
+    for index, args, label in r_specs:
+        climdex_func = robjects.r[f"climdex.{index}"]
+        try:
+            results[label] = {
+                ci_name: climdex_func(ci, **args) for ci_name, ci in cis.items()
+            }
+        except RRuntimeError as e:
+            raise ProcessError(
+                msg=f"{type(e).__name__} computing {label} in file {r_file}: {str(e)}"
+            )
+
+    return {label: results[label] for _, _, label in specs}
+
+
+def log_progress(
+    process, response, message, log_level, done, total, start, end="save_rdata"
+):
+    """Logs `message` with a status percentage that advances from the `start`
+    step to the `end` step as `done` of `total` input files (or other items)
+    have been processed.
+    """
+    steps = process.status_percentage_steps
+    steps["process"] = steps[start] + (steps[end] - steps[start]) * done // total
+    log_handler(
+        process, response, message, logger, log_level=log_level, process_step="process"
+    )
 
 
 # Testing
@@ -111,7 +459,11 @@ def test_ci_output(url, vector_name, expected_file, expected_vector_name):
         suffix=".rda", prefix="tmp_copy", dir="/tmp", delete=True
     ) as tmp_file:
         urlretrieve(url, tmp_file.name)
-        robjects.r(f"load(file='{tmp_file.name}')")
+        output = load_rdata(tmp_file.name)[vector_name]
+
+    expected = load_rdata(str((files("tests") / "data" / expected_file).resolve()))[
+        expected_vector_name
+    ]
 
     slots = [
         "data",
@@ -125,15 +477,4 @@ def test_ci_output(url, vector_name, expected_file, expected_vector_name):
     ]
 
     for slot in slots:
-        output_slot = robjects.r(f"{vector_name}@{slot}")
-
-        robjects.r(
-            f"load(file='{(files('tests') / 'data' / expected_file).resolve()}')"
-        )
-        expected_slot = robjects.r(f"{expected_vector_name}@{slot}")
-
-        for index in range(len(expected_slot)):
-            assert str(output_slot[index]) == str(expected_slot[index])
-
-    # Clear R global env
-    robjects.r("rm(list=ls())")
+        assert views_equal(output.slots[slot], expected.slots[slot]), slot
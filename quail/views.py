@@ -0,0 +1,85 @@
+"""
+NumPy views of climdexInput slots.
+
+The numeric, integer and logical R vectors in a climdexInput are exposed as
+NumPy arrays that share memory with the R vectors, through the array
+interface of rpy2 vectors, so Python code reads a station's daily series
+without copying it or converting its values one by one. Each array keeps a
+reference to its rpy2 vector, which keeps R from freeing the memory while the
+array is in use. The views are read-only: R objects are not meant to be
+modified in place.
+"""
+
+import numpy as np
+from rpy2 import robjects
+from rpy2.rinterface_lib.sexp import RTYPES
+
+
+# R vector types with a NumPy array interface
+VIEW_TYPES = (RTYPES.REALSXP, RTYPES.INTSXP, RTYPES.LGLSXP)
+
+
+def r_view(vector):
+    """Returns a read-only NumPy array sharing memory with the numeric,
+    integer or logical R `vector` (NA is NaN for numeric vectors, and the
+    smallest int32 otherwise)
+    """
+    if vector.typeof not in VIEW_TYPES:
+        raise TypeError(f"No NumPy view of R vectors of type {vector.typeof.name}")
+
+    view = np.asarray(vector)
+    view.flags.writeable = False
+    return view
+
+
+def ci_data(ci):
+    """Returns views of the daily values of each variable of a climdexInput"""
+    data = ci.slots["data"]
+    return {var: r_view(data.rx2(var)) for var in data.names}
+
+
+def ci_namasks(ci, freq="annual"):
+    """Returns views of the `freq` ("annual" or "monthly") NA masks (1 or
+    NaN per period) of each variable of a climdexInput
+    """
+    namasks = ci.slots["namasks"].rx2(freq)
+    return {var: r_view(namasks.rx2(var)) for var in namasks.names}
+
+
+def ci_jdays(ci):
+    """Returns a view of the day of year of each day of a climdexInput"""
+    return r_view(ci.slots["jdays"])
+
+
+def ci_date_factor(ci, freq="annual"):
+    """Returns a view of the 1-based `freq` period codes of each day of a
+    climdexInput, and the period names
+    """
+    factor = ci.slots["date.factors"].rx2(freq)
+    return r_view(factor), list(factor.levels)
+
+
+def views_equal(x, y):
+    """Returns whether two R vectors, or lists of them, hold the same values,
+    comparing numeric data through views. NA values are equal to each other.
+    """
+    if x.typeof != y.typeof or len(x) != len(y):
+        return False
+    if robjects.r["is.factor"](x)[0] and list(x.levels) != list(y.levels):
+        return False
+
+    if x.typeof == RTYPES.VECSXP:
+        return all(views_equal(x_item, y_item) for x_item, y_item in zip(x, y))
+    elif x.typeof in VIEW_TYPES:
+        return np.array_equal(r_view(x), r_view(y), equal_nan=True)
+    return list(x) == list(y)
+
+
+def float_vector(values):
+    """Returns a new R numeric vector holding a copy of the array `values`,
+    written through a view of the vector in a single copy rather than value
+    by value. NaN values stay NaN, which R treats as missing.
+    """
+    vector = robjects.r["numeric"](len(values))
+    np.asarray(vector)[:] = values
+    return vector
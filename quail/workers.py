@@ -0,0 +1,339 @@
+"""
+Pool of long-lived R worker processes.
+
+Each worker embeds its own R runtime, started once with ``climdex.pcic`` and
+``PCICt`` attached. Process handlers send their R work to the pool with
+``run_in_worker`` so that concurrent requests no longer serialize on the single
+R runtime embedded in the server process.
+
+The pool size is set with the ``r_workers`` option of the ``[quail]``
+configuration section. A size of 0 runs the work in the calling process.
+Handlers with many input files send them to the pool together with
+``map_in_workers``, up to ``fan_out`` files at a time (by default as many as
+there are workers). Tasks wait for a free worker in the scheduler (see
+``quail.scheduler``), which limits the workers taken by climdexInput
+construction (``build_workers``) and shares the rest between requests.
+
+The server process itself does not start R until a request needs it, and
+with ``warm_up`` set the workers are started when the server starts rather
+than on the first request. Under gunicorn, ``quail.gunicorn_config``
+instead starts R once in the master process, which the server processes are
+forked from.
+"""
+
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from pywps import configuration
+from pywps.app.exceptions import ProcessError
+
+from quail.scheduler import Scheduler
+from quail.metrics import (
+    r_memory_enabled,
+    reset_r_memory,
+    r_memory_peak,
+    observe_r_memory,
+)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_scheduler = None
+_scheduler_pid = None
+_attached = False
+_r_lock_state = threading.local()
+
+
+def quail_config():
+    """Returns the ``[quail]`` configuration section as a dictionary"""
+    if not configuration.CONFIG:
+        configuration.load_configuration()
+
+    if not configuration.CONFIG.has_section("quail"):
+        return {}
+    return dict(configuration.CONFIG.items("quail"))
+
+
+def init_worker(settings=None):
+    """Attach the R packages used by the climdex processes. ``settings`` are
+    the server's ``[quail]`` options, which a spawned worker would otherwise
+    not see if they came from a config file given on the command line.
+    """
+    global _attached
+    if _attached:
+        return
+
+    if settings:
+        if not configuration.CONFIG:
+            configuration.load_configuration()
+        if not configuration.CONFIG.has_section("quail"):
+            configuration.CONFIG.add_section("quail")
+        for option, value in settings.items():
+            configuration.CONFIG.set("quail", option, value)
+
+    from rpy2 import robjects
+
+    robjects.r("library(climdex.pcic)")
+    robjects.r("library(PCICt)")
+    _attached = True
+
+
+def pool_size():
+    """Returns the number of R worker processes to run"""
+    return int(configuration.get_config_value("quail", "r_workers", 0))
+
+
+def fan_out():
+    """Returns the number of a request's input files to process at once"""
+    return int(configuration.get_config_value("quail", "fan_out", 0)) or pool_size()
+
+
+def build_workers():
+    """Returns the number of workers that may build climdexInputs at once"""
+    workers = int(configuration.get_config_value("quail", "build_workers", 0))
+    return min(workers, pool_size()) if workers else max(1, pool_size() // 2)
+
+
+def get_pool():
+    """Returns the worker pool, starting it on first use"""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        # A pool inherited through fork belongs to the parent process
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=pool_size(),
+                mp_context=get_context("spawn"),
+                initializer=init_worker,
+                initargs=(quail_config(),),
+            )
+            _pool_pid = os.getpid()
+
+        return _pool
+
+
+def warm_up():
+    """Starts the R workers ahead of the first request, if the ``warm_up``
+    option is set. The workers start R and attach the packages in the
+    background, so the server answers requests meanwhile. Without R workers,
+    R is started in the server process by the first request that needs it.
+    """
+    if not configuration.get_config_value("quail", "warm_up", False):
+        return
+    if pool_size() == 0:
+        return
+
+    # Each task that finds no idle worker starts a new one
+    pool = get_pool()
+    for _ in range(pool_size()):
+        pool.submit(os.getpid)
+
+
+def preload_files():
+    """Returns the climdexInput files to load by ``preload``"""
+    return str(configuration.get_config_value("quail", "preload_files", "")).split()
+
+
+def preload():
+    """Starts R in this process, with the packages attached and the
+    climdexInputs of the ``preload_files`` option in its cache. Processes
+    forked from it afterwards share them with it instead of loading their own
+    (see ``quail.gunicorn_config``). R workers would start their own R
+    instead, so preloading requires ``r_workers = 0``.
+    """
+    from quail.utils import load_cis
+
+    if pool_size() != 0:
+        raise ValueError(
+            "Preloading requires r_workers = 0, since R workers do not share "
+            f"the preloaded R (r_workers = {pool_size()})"
+        )
+
+    init_worker()
+    for r_file in preload_files():
+        load_cis(r_file)
+
+
+def r_lock():
+    """Returns the lock that rpy2 holds around calls into the R runtime of
+    this process
+    """
+    from rpy2.rinterface_lib import openrlib
+
+    return openrlib.rlock
+
+
+@contextmanager
+def server_r():
+    """Holds the R lock of the server process for the enclosed code.
+    Requests run in threads of the server process, which must take turns to
+    use its embedded R runtime, e.g. to load inputs or write outputs; while
+    they wait for the R workers in ``run_in_worker`` or ``map_in_workers``
+    other requests may use it.
+    """
+    if getattr(_r_lock_state, "held", False):
+        yield
+        return
+
+    with r_lock():
+        _r_lock_state.held = True
+        try:
+            yield
+        finally:
+            _r_lock_state.held = False
+
+
+@contextmanager
+def waiting_for_workers():
+    """Releases the R lock of the server process, if held, while the enclosed
+    code waits for the R workers
+    """
+    if not getattr(_r_lock_state, "held", False):
+        yield
+        return
+
+    lock = r_lock()
+    _r_lock_state.held = False
+    lock.release()
+    try:
+        yield
+    finally:
+        lock.acquire()
+        _r_lock_state.held = True
+
+
+def shutdown_pool():
+    """Stops the worker processes; the next call to get_pool starts new ones,
+    with a new scheduler
+    """
+    global _pool, _scheduler
+
+    with _pool_lock:
+        pool = _pool if _pool_pid == os.getpid() else None
+        _pool = None
+        _scheduler = None
+
+    # Cancelling the pool's tasks lets the scheduler dispatch others, which
+    # needs the lock
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def submit(func, *args, **kwargs):
+    """Submits ``func(*args, **kwargs)`` to the current worker pool"""
+    return get_pool().submit(_call_pickled, func, *args, **kwargs)
+
+
+def get_scheduler():
+    """Returns the scheduler of tasks sent to the worker pool"""
+    global _scheduler, _scheduler_pid
+
+    with _pool_lock:
+        if _scheduler is None or _scheduler_pid != os.getpid():
+            workers = pool_size()
+            limits = {"build": build_workers(), "index": workers}
+            _scheduler = Scheduler(submit, workers, limits)
+            _scheduler_pid = os.getpid()
+
+        return _scheduler
+
+
+def _call(func, *args, **kwargs):
+    """Returns the result of ``func(*args, **kwargs)`` and the peak R memory
+    used to compute it, or None if it is not recorded
+    """
+    measure = r_memory_enabled()
+    if measure:
+        reset_r_memory()
+    try:
+        result = func(*args, **kwargs)
+    except ProcessError as e:
+        # ProcessError keeps its message out of ``args``, so it would be lost
+        # when the exception is pickled back to the server process
+        raise ProcessError(e.msg) from None
+    return result, r_memory_peak() if measure else None
+
+
+def _call_pickled(func, *args, **kwargs):
+    """Runs ``_call`` in a worker with its result pickled, so that the server
+    process unpickles it with ``_unpickled`` in the request's thread, under
+    the R lock, instead of in the pool's result thread
+    """
+    result, peak = _call(func, *args, **kwargs)
+    return pickle.dumps(result), peak
+
+
+def _unpickled(call):
+    result, peak = call
+    return pickle.loads(result), peak
+
+
+def _result(call):
+    result, peak = call
+    if peak is not None:
+        observe_r_memory(peak)
+    return result
+
+
+def run_in_worker(func, *args, **kwargs):
+    """Runs ``func(*args, **kwargs)`` in an R worker and returns its result.
+
+    ``func`` must be a module level function and its arguments and result
+    must be picklable (rpy2 objects are pickled with R's own serialization).
+    """
+    if pool_size() == 0:
+        init_worker()
+        return _result(_call(func, *args, **kwargs))
+
+    try:
+        future = get_scheduler().submit(func, *args, **kwargs)
+        with waiting_for_workers():
+            call = future.result()
+        return _result(_unpickled(call))
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise ProcessError("R worker process terminated unexpectedly")
+
+
+def map_in_workers(func, items, *args, **kwargs):
+    """Runs ``func(item, *args, **kwargs)`` for each of ``items`` in the R
+    workers, up to ``fan_out()`` at a time, and yields ``(index, result)``
+    pairs in the order they complete. If any call fails the ones not yet
+    started are cancelled. The same restrictions as ``run_in_worker`` apply.
+    """
+    if pool_size() == 0:
+        init_worker()
+        for index, item in enumerate(items):
+            yield index, _result(_call(func, item, *args, **kwargs))
+        return
+
+    scheduler = get_scheduler()
+    limit = fan_out()
+    queued = enumerate(items)
+    pending = {}
+
+    try:
+        while True:
+            for index, item in islice(queued, limit - len(pending)):
+                future = scheduler.submit(func, item, *args, **kwargs)
+                pending[future] = index
+
+            if not pending:
+                return
+
+            with waiting_for_workers():
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), _result(_unpickled(future.result()))
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise ProcessError("R worker process terminated unexpectedly")
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,7 +1,10 @@
 import os
 from pywps.app.Service import Service
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
 from .processes import processes
+from .metrics import metrics_app
+from .workers import warm_up, preload
 
 
 def create_app(cfgfiles=None):
@@ -11,7 +14,29 @@ def create_app(cfgfiles=None):
     if "PYWPS_CFG" in os.environ:
         config_files.append(os.environ["PYWPS_CFG"])
     service = Service(processes=processes, cfgfiles=config_files)
-    return service
+    return DispatcherMiddleware(service, {"/metrics": metrics_app()})
 
 
-application = create_app()
+def start_r():
+    """Starts R for serving requests, with the configuration of the app
+    created last: preloads it in this process if the ``QUAIL_PRELOAD``
+    environment variable is set, or else starts the R workers (see
+    ``quail.workers``). Must be called by the process that serves the
+    requests, after any fork other than gunicorn's preloading.
+    """
+    if os.environ.get("QUAIL_PRELOAD"):
+        preload()
+    else:
+        warm_up()
+
+
+def __getattr__(name):
+    # The application is created when a server asks for it rather than on
+    # import, so that the CLI, which creates its own with the options it is
+    # given, does not start R with the default configuration
+    if name == "application":
+        global application
+        application = create_app()
+        start_r()
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
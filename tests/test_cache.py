@@ -0,0 +1,73 @@
+import pytest
+from importlib.resources import files
+
+from quail import utils
+from quail.cache import LRUCache, file_digest
+
+
+def test_lru_cache_counters():
+    cache = LRUCache(max_size=10)
+    assert cache.get("a") is None
+
+    cache.put("a", "value", 4)
+    assert cache.get("a") == "value"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(max_size=10)
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 4)
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", 3, 4)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.size == 8
+    assert cache.evictions == 1
+
+
+def test_lru_cache_oversized():
+    cache = LRUCache(max_size=10)
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 11)
+
+    assert "a" in cache
+    assert "b" not in cache
+
+
+@pytest.mark.parametrize(
+    ("r_file", "same_file"),
+    [
+        (
+            str(files("tests") / "data/climdexInput.rda"),
+            str(files("tests") / "data/climdexInput.rda"),
+        ),
+    ],
+)
+def test_file_digest(r_file, same_file):
+    assert file_digest(r_file) == file_digest(same_file)
+    assert file_digest(r_file) != file_digest(
+        str(files("tests") / "data/climdexInput.rds")
+    )
+
+
+@pytest.mark.parametrize(
+    ("r_file"),
+    [
+        str(files("tests") / "data/climdexInput.rda"),
+        str(files("tests") / "data/climdexInput.rds"),
+    ],
+)
+def test_load_cis_cached(monkeypatch, r_file):
+    cache = LRUCache(max_size=512 * 1024 * 1024)
+    monkeypatch.setattr(utils, "get_ci_cache", lambda: cache)
+
+    first = utils.load_cis(r_file)
+    second = utils.load_cis(r_file)
+
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+    assert first.keys() == second.keys()
+    assert cache.size > 0
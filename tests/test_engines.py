@@ -0,0 +1,250 @@
+import pytest
+import numpy as np
+from rpy2 import robjects
+from importlib.resources import files
+
+from quail.engines import (
+    count_days,
+    days_numpy,
+    running_sum,
+    rxnday_numpy,
+    spell_duration,
+    spell_indices,
+    spell_max,
+    spell_specs_numpy,
+    spells_numpy,
+)
+from wps_tools.R import get_package
+from quail.utils import load_rdata, save_rdata, load_cis, parse_index_spec
+from quail.views import float_vector
+
+
+@pytest.mark.parametrize(
+    ("days_type", "expected_vector_name"),
+    [
+        ("su", "expected_summer_days"),
+        ("id", "expected_icing_days"),
+        ("fd", "expected_frost_days"),
+        ("tr", "expected_tropical_nights"),
+    ],
+)
+def test_days_numpy(days_type, expected_vector_name):
+    results = days_numpy(str(files("tests") / "data/climdexInput.rda"), days_type)
+    expected = load_rdata(str(files("tests") / "data/expected_days_data.rda"))[
+        expected_vector_name
+    ]
+
+    assert robjects.r["identical"](results["ci"], expected)[0]
+
+
+def test_count_days():
+    data = {
+        "tmax": np.array([26, 25, np.nan, -1, 30, 0]),
+        "tmin": np.array([21, -5, 20, np.nan, -0.5, 22]),
+    }
+    namasks = {"tmax": np.array([1, 1, np.nan]), "tmin": np.array([1, 1, 1])}
+    codes = np.array([0, 0, 1, 1, 2, 2])
+
+    counts = count_days(data, namasks, codes, 3)
+
+    np.testing.assert_array_equal(counts["su"], [1, 0, np.nan])
+    np.testing.assert_array_equal(counts["id"], [0, 1, np.nan])
+    np.testing.assert_array_equal(counts["fd"], [1, 0, 1])
+    np.testing.assert_array_equal(counts["tr"], [1, 0, 1])
+
+
+@pytest.mark.parametrize(
+    ("num_days", "freq"),
+    [(1, "monthly"), (1, "annual"), (5, "monthly"), (5, "annual")],
+)
+def test_rxnday_numpy(num_days, freq):
+    results = rxnday_numpy(
+        str(files("tests") / "data/climdexInput.rda"), num_days, freq
+    )
+    expected = load_rdata(str(files("tests") / "data/expected_rxnday.rda"))[
+        f"expected_rx{num_days}day_{freq}"
+    ]
+
+    assert robjects.r["identical"](results["ci"], expected)[0]
+
+
+@pytest.mark.parametrize(
+    ("prec", "center_mean_on_last_day", "expected"),
+    [
+        ([1, 2, np.nan, 4, 5, 6], False, [0, 0, 12, 17, 0, 0]),
+        ([1, 2, np.nan, 4, 5, 6], True, [0, 0, 0, 0, 12, 17]),
+        ([1, 2, np.nan], False, [0, 5, 0]),
+    ],
+)
+def test_running_sum(prec, center_mean_on_last_day, expected):
+    np.testing.assert_allclose(
+        running_sum(np.array(prec, dtype=float), 5, center_mean_on_last_day),
+        expected,
+    )
+
+
+# climdex.pcic's running sums of nday.consec.prec.max, before the maxima
+R_RUNNING_SUM = """
+function(prec, ndays, center) {
+    prec[is.na(prec)] <- 0
+    runsum <- climdex.pcic:::running.mean(prec, ndays)
+    runsum[is.na(runsum)] <- 0
+    if (center) {
+        k2 <- ndays %/% 2
+        runsum <- c(rep(0, k2), runsum[1:(length(runsum) - k2)])
+    }
+    runsum * ndays
+}
+"""
+
+
+def random_prec(rng, days):
+    prec = np.where(rng.random(days) < 0.4, rng.gamma(0.8, 8, days), 0.0)
+    prec[rng.random(days) < 0.02] = np.nan
+    return prec
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize(
+    ("days", "center_mean_on_last_day"),
+    [
+        (1, False),
+        (2, False),
+        (4, False),
+        (3, True),
+        (4, True),
+        (1000, False),
+        (1000, True),
+    ],
+)
+def test_running_sum_r(seed, days, center_mean_on_last_day):
+    prec = random_prec(np.random.default_rng(seed), days)
+
+    result = running_sum(prec, 5, center_mean_on_last_day)
+    expected = robjects.r(R_RUNNING_SUM)(float_vector(prec), 5, center_mean_on_last_day)
+
+    assert robjects.r["identical"](robjects.FloatVector(result), expected)[0]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("freq", ["monthly", "annual"])
+@pytest.mark.parametrize("center_mean_on_last_day", [False, True])
+def test_rxnday_numpy_random(tmp_path, seed, freq, center_mean_on_last_day):
+    climdex = get_package("climdex.pcic")
+    dates = np.arange(np.datetime64("1961-01-01"), np.datetime64("1964-01-01"))
+    ci = climdex.climdexInput_raw(
+        prec=float_vector(random_prec(np.random.default_rng(seed), len(dates))),
+        prec_dates=robjects.r["as.PCICt"](
+            robjects.StrVector(dates.astype(str)), cal="gregorian"
+        ),
+        base_range=robjects.IntVector([1961, 1963]),
+    )
+    r_file = str(tmp_path / "ci.rda")
+    save_rdata("ci", ci, r_file)
+
+    results = rxnday_numpy(r_file, 5, freq, center_mean_on_last_day)
+    expected = climdex.climdex_rx5day(
+        ci, freq=freq, center_mean_on_last_day=center_mean_on_last_day
+    )
+
+    assert robjects.r["identical"](results["ci"], expected)[0]
+
+
+@pytest.mark.parametrize(
+    ("func", "span_years"),
+    [
+        ("wsdi", False),
+        ("wsdi", True),
+        ("csdi", False),
+        ("csdi", True),
+        ("cdd", False),
+        ("cdd", True),
+        ("cwd", False),
+        ("cwd", True),
+    ],
+)
+def test_spells_numpy(func, span_years):
+    results = spells_numpy(
+        str(files("tests") / "data/climdexInput.rda"), func, span_years
+    )
+    expected = load_rdata(str(files("tests") / "data/expected_spells_data.rda"))[
+        f"expected_{func}_span_yrs" if span_years else f"expected_{func}"
+    ]
+
+    assert robjects.r["identical"](results["ci"], expected)[0]
+
+
+@pytest.mark.parametrize(
+    ("span_years", "expected"),
+    [(True, [5, 4, 5, 1]), (False, [0, 0, 0, 0])],
+)
+def test_spell_duration(span_years, expected):
+    condition = np.array([1] * 8 + [0] + [1] * 7 + [0] * 4, dtype=bool)
+    codes = np.repeat([0, 1, 2, 3], 5)
+
+    np.testing.assert_array_equal(
+        spell_duration(condition, codes, 4, span_years), expected
+    )
+
+
+@pytest.mark.parametrize(
+    ("missing_day", "span_years", "expected"),
+    [
+        (False, True, [2, np.nan, 4]),
+        (False, False, [2, 1, 3]),
+        (True, True, [2, np.nan, 3]),
+        (True, False, [2, 0, 3]),
+    ],
+)
+def test_spell_max_single_day(missing_day, span_years, expected):
+    # The second period has a single day, inside a spell or missing
+    condition = np.array([1, 1, 0, 1, 1, 1, 1], dtype=bool)
+    missing = np.zeros(7, dtype=bool)
+    if missing_day:
+        condition[3], missing[3] = False, True
+    codes = np.array([0, 0, 0, 1, 2, 2, 2])
+
+    np.testing.assert_array_equal(
+        spell_max(condition, missing, codes, 3, span_years), expected
+    )
+
+
+@pytest.mark.parametrize("span_years", [True, False])
+def test_spell_indices_runs(span_years):
+    rng = np.random.default_rng(0)
+    prec = np.where(rng.random(400) < 0.6, 0.0, rng.gamma(0.8, 6.0, 400))
+    prec[rng.random(400) < 0.02] = np.nan
+    codes = np.repeat(np.arange(4), 100)
+    args = ({"prec": prec}, {}, {"prec": np.ones(4)}, codes, 4, 15)
+
+    runs = {}
+    shared = spell_indices(*args, ["cdd", "cwd"], span_years, runs)
+    spell_indices(*args, ["cdd"], not span_years, runs)
+    assert len(runs) == 2
+    for func in ("cdd", "cwd"):
+        np.testing.assert_array_equal(
+            shared[func], spell_indices(*args, [func], span_years)[func]
+        )
+
+
+def test_spell_specs_numpy():
+    r_file = str(files("tests") / "data/climdexInput.rda")
+    # Like their climdex.pcic functions, cdd and cwd span years by default
+    expected_names = {
+        "wsdi": "expected_wsdi",
+        "csdi(spells_can_span_years:TRUE)": "expected_csdi_span_yrs",
+        "cdd": "expected_cdd_span_yrs",
+        "cdd(spells_can_span_years:FALSE)": "expected_cdd",
+        "cwd": "expected_cwd_span_yrs",
+        "cwd(spells_can_span_years:FALSE)": "expected_cwd",
+    }
+    specs = [parse_index_spec(spec) for spec in expected_names]
+    cis = load_cis(r_file)
+    results = spell_specs_numpy(cis, specs)
+    expected = load_rdata(str(files("tests") / "data/expected_spells_data.rda"))
+
+    assert list(results) == [label for _, _, label in specs]
+    for (index, args, label), name in zip(specs, expected_names.values()):
+        assert robjects.r["identical"](results[label]["ci"], expected[name])[0]
+        r_result = robjects.r[f"climdex.{index}"](cis["ci"], **args)
+        assert robjects.r["identical"](results[label]["ci"], r_result)[0]
@@ -0,0 +1,153 @@
+import pytest
+import numpy as np
+from netCDF4 import Dataset
+from pywps.app.exceptions import ProcessError
+
+from wps_tools.testing import local_path
+from quail.grid import (
+    convert_units,
+    grid_dimensions,
+    read_dates,
+    grid_periods,
+    spec_freq,
+    grid_blocks,
+    read_block,
+    block_latitudes,
+    compute_grid_block,
+)
+
+
+VAR_NAMES = {"tmax": "tasmax", "tmin": "tasmin", "prec": "pr"}
+
+
+@pytest.mark.parametrize(
+    ("values", "units", "var", "expected"),
+    [
+        (np.array([273.15, 300.15]), "K", "tmax", np.array([0, 27])),
+        (np.array([-5.0, 10.0]), "degC", "tmin", np.array([-5, 10])),
+        (np.array([0, 1 / 86400]), "kg m-2 s-1", "prec", np.array([0, 1])),
+        (np.array([0, 12.5]), "mm/day", "prec", np.array([0, 12.5])),
+        (np.array([1.0]), None, "prec", np.array([1.0])),
+    ],
+)
+def test_convert_units(values, units, var, expected):
+    assert np.allclose(convert_units(values, units, var), expected)
+
+
+def test_convert_units_err():
+    with pytest.raises(ProcessError):
+        convert_units(np.array([1.0]), "degF", "tmax")
+
+
+@pytest.mark.parametrize(
+    ("shape", "chunk_size", "expected"),
+    [
+        ((2, 2), 1, [(0, 1, 0, 1), (0, 1, 1, 2), (1, 2, 0, 1), (1, 2, 1, 2)]),
+        ((2, 2), 3, [(0, 1, 0, 2), (1, 2, 0, 2)]),
+        ((5, 3), 7, [(0, 2, 0, 3), (2, 4, 0, 3), (4, 5, 0, 3)]),
+        ((2, 5), 100, [(0, 2, 0, 5)]),
+    ],
+)
+def test_grid_blocks(shape, chunk_size, expected):
+    assert grid_blocks(shape, chunk_size) == expected
+
+
+@pytest.mark.parametrize(("nc_file"), [local_path("gridded.nc")])
+def test_read_block(nc_file):
+    with Dataset(nc_file) as nc:
+        dims = grid_dimensions(nc, VAR_NAMES.values())
+        dates, calendar = read_dates(nc, dims[0])
+        tmax = read_block(nc, "tasmax", "tmax", dims, (0, 2, 0, 2))
+        latitudes = block_latitudes(nc, dims, (1, 2, 0, 2))
+
+    assert dims == ("time", "lat", "lon")
+    assert (dates[0], dates[-1], calendar) == ("1991-01-01", "2004-12-31", "standard")
+    assert tmax.shape == (len(dates), 2, 2)
+    assert np.isnan(tmax[:, 1, 0]).all()
+    assert np.nanmax(tmax) < 50
+    assert latitudes.tolist() == [[49.5, 49.5]]
+
+
+@pytest.mark.parametrize(("nc_file"), [local_path("gridded.nc")])
+def test_grid_dimensions_err(nc_file):
+    with Dataset(nc_file) as nc, pytest.raises(ProcessError):
+        grid_dimensions(nc, ["tasmax", "tas"])
+
+
+@pytest.mark.parametrize(
+    ("dates", "expected_years", "expected_months"),
+    [
+        (["1991-01-01", "1991-12-31"], ["1991"], 12),
+        (["1991-03-01", "1991-06-30", "1993-02-01"], ["1991", "1992", "1993"], 36),
+    ],
+)
+def test_grid_periods(dates, expected_years, expected_months):
+    periods = grid_periods(dates)
+    assert periods["annual"] == expected_years
+    assert len(periods["monthly"]) == expected_months
+    assert periods["monthly"][0] == f"{expected_years[0]}-01"
+
+
+@pytest.mark.parametrize(
+    ("spec", "expected"),
+    [
+        (("su", {}, "su"), "annual"),
+        (("rx1day", {}, "rx1day"), "monthly"),
+        (("rx5day", {"freq": "annual"}, "rx5day_annual"), "annual"),
+        (("txx", {"freq": "monthly"}, "txx_monthly"), "monthly"),
+    ],
+)
+def test_spec_freq(spec, expected):
+    assert spec_freq(spec) == expected
+
+
+def grid_block_results(nc_file, block, specs=None):
+    specs = specs or [
+        ("su", {}, "su"),
+        ("rx1day", {"freq": "monthly"}, "rx1day_monthly"),
+    ]
+    with Dataset(nc_file) as nc:
+        dates, _ = read_dates(nc, "time")
+    freq_periods = grid_periods(dates)
+    periods = {spec[2]: freq_periods[spec_freq(spec)] for spec in specs}
+
+    return compute_grid_block(
+        block,
+        nc_file,
+        VAR_NAMES,
+        specs,
+        periods,
+        "c(1991, 2000)",
+        5,
+        True,
+        "c(0.1, 0.9)",
+        "c(0.95, 0.99)",
+        "c(annual = 15, monthly = 3)",
+        0.1,
+    )
+
+
+@pytest.mark.parametrize(("nc_file"), [local_path("gridded.nc")])
+def test_compute_grid_block(nc_file):
+    results = grid_block_results(nc_file, (0, 2, 0, 2))
+    su = results["su"]
+
+    assert su.shape == (14, 2, 2)
+    assert np.isnan(su[:, 1, 0]).all()
+    assert not np.isnan(su[:, 0, 0]).all()
+    assert np.array_equal(su[:, 0, 0], su[:, 1, 1], equal_nan=True)
+    assert results["rx1day_monthly"].shape == (12 * 14, 2, 2)
+
+    # A block of cells without data is all NaN
+    empty = grid_block_results(nc_file, (1, 2, 0, 1))
+    assert all(np.isnan(values).all() for values in empty.values())
+
+
+@pytest.mark.parametrize(("nc_file"), [local_path("gridded.nc")])
+def test_compute_grid_block_cell_err(nc_file):
+    # climdex.pcic rejects the frequency in every cell, which is left as NaN
+    specs = [("su", {}, "su"), ("rx1day", {"freq": "weekly"}, "rx1day_weekly")]
+    results = grid_block_results(nc_file, (0, 1, 0, 2), specs)
+
+    assert results["su"].shape == (14, 1, 2)
+    assert all(np.isnan(values).all() for values in results.values())
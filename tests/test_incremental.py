@@ -0,0 +1,130 @@
+import pytest
+from rpy2 import robjects
+
+from wps_tools.testing import local_path
+from quail.utils import load_cis, save_rdata
+from quail.incremental import (
+    PERIOD_DIGESTS,
+    period_digests,
+    quantiles_digest,
+    update_index,
+    compute_index_incremental,
+    incremental_items,
+)
+
+
+# Doubles the precipitation of the last year of a climdexInput
+CHANGE_LAST_YEAR = """
+function(ci) {
+    last.year <- ci@date.factors$annual == tail(levels(ci@date.factors$annual), 1)
+    ci@data$prec[last.year] <- ci@data$prec[last.year] * 2
+    ci
+}
+"""
+
+# Replaces the precipitation quantiles of a climdexInput
+OTHER_PREC_QUANTILES = """
+function(ci) {
+    quantiles <- new.env()
+    for (var in ls(ci@quantiles)) {
+        assign(var, get(var, envir=ci@quantiles), envir=quantiles)
+    }
+    quantiles$prec <- c(q95=1, q99=2)
+    ci@quantiles <- quantiles
+    ci
+}
+"""
+
+# Sets every value of a vector to -1, keeping its names and period digests
+MARK = "function(vector) { vector[] <- -1; vector }"
+
+
+def values(vector):
+    return robjects.r["as.vector"](vector)
+
+
+@pytest.mark.parametrize(
+    ("func", "kwargs"),
+    [
+        ("climdex.prcptot", {}),
+        ("climdex.r95ptot", {}),
+        ("climdex.sdii", {}),
+        ("climdex.txx", {"freq": "monthly"}),
+        ("climdex.tnn", {"freq": "annual"}),
+    ],
+)
+def test_update_index(func, kwargs):
+    ci = load_cis(local_path("climdexInput.rda"))["ci"]
+    climdex_func = robjects.r[func]
+    context = repr((func, (), sorted(kwargs.items())))
+
+    prior = update_index(ci, None, climdex_func, context, **kwargs)
+    assert not robjects.r["is.null"](robjects.r["attr"](prior, PERIOD_DIGESTS))[0]
+
+    unchanged = update_index(ci, prior, climdex_func, context, **kwargs)
+    assert robjects.r["identical"](unchanged, prior)[0]
+
+    changed_ci = robjects.r(CHANGE_LAST_YEAR)(ci)
+    updated = update_index(changed_ci, prior, climdex_func, context, **kwargs)
+    expected = climdex_func(changed_ci, **kwargs)
+    assert robjects.r["identical"](values(updated), values(expected))[0]
+    assert list(updated.names) == list(expected.names)
+
+
+@pytest.mark.parametrize(("freq"), ["annual", "monthly"])
+def test_period_digests(freq):
+    ci = load_cis(local_path("climdexInput.rda"))["ci"]
+    digests = period_digests(ci, freq, "context")
+    changed = period_digests(robjects.r(CHANGE_LAST_YEAR)(ci), freq, "context")
+
+    assert list(digests) == list(ci.slots["date.factors"].rx2(freq).levels)
+    assert digests != period_digests(ci, freq, "other context")
+    assert [period for period in digests if digests[period] != changed[period]] == [
+        period for period in digests if period.startswith(list(digests)[-1][:4])
+    ]
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "previous_output", "prefix"),
+    [
+        (
+            [local_path("climdexInput.rda"), local_path("climdexInput.rds")],
+            local_path("expected_ptot.rda"),
+            "expected_",
+        ),
+        ([local_path("climdexInput.rda")], None, "expected_"),
+    ],
+)
+def test_incremental_items(climdex_input, previous_output, prefix):
+    items = incremental_items(climdex_input, previous_output, prefix)
+    assert [r_file for r_file, _ in items] == climdex_input
+    assert all(previous == {} for _, previous in items)
+
+
+def test_incremental_items_reuse(tmp_path):
+    ci_file = local_path("climdexInput.rda")
+    prior = compute_index_incremental((ci_file, {}), "climdex.prcptot")["ci"]
+    previous_output = str(tmp_path / "previous.rda")
+    save_rdata("prcptot1_ci", robjects.r(MARK)(prior), previous_output)
+
+    changed_ci = robjects.r(CHANGE_LAST_YEAR)(load_cis(ci_file)["ci"])
+    changed_file = str(tmp_path / "changed.rda")
+    save_rdata("ci", changed_ci, changed_file)
+
+    items = incremental_items([changed_file], previous_output, "prcptot")
+    assert [list(previous) for _, previous in items] == [["ci"]]
+
+    # Unchanged periods keep the marked prior values, the last is recomputed
+    result = compute_index_incremental(items[0], "climdex.prcptot")["ci"]
+    expected = robjects.r["climdex.prcptot"](changed_ci)
+    assert list(values(result))[:-1] == [-1] * (len(expected) - 1)
+    assert robjects.r["identical"](values(result)[-1], values(expected)[-1])[0]
+
+
+def test_quantiles_digest():
+    ci = load_cis(local_path("climdexInput.rda"))["ci"]
+    other = robjects.r(OTHER_PREC_QUANTILES)(ci)
+
+    assert quantiles_digest(ci, ["prec"]) != quantiles_digest(other, ["prec"])
+    assert quantiles_digest(ci, ["tmax"]) == quantiles_digest(other, ["tmax"])
+    assert quantiles_digest(ci, None) == ""
@@ -0,0 +1,74 @@
+import math
+import pytest
+from rpy2 import robjects
+from pywps.app.exceptions import ProcessError
+
+from quail.literals import parse_vector, r_vector, RVector
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("c(1961, 1990)", RVector("double", [1961.0, 1990.0])),
+        ("c('year', 'jday')", RVector("character", ["year", "jday"])),
+        (
+            "c(annual = 15, monthly =3)",
+            RVector("double", [15.0, 3.0], ["annual", "monthly"]),
+        ),
+        ("5", RVector("double", [5.0])),
+        (" c(1L, -2L) ", RVector("integer", [1, -2])),
+        ("c(TRUE, F, NA)", RVector("logical", [True, False, None])),
+        ("c(NA, 1L)", RVector("integer", [None, 1])),
+        ("c(1, 'a', TRUE)", RVector("character", ["1", "a", "TRUE"])),
+        ('c("x y" = .5, z = -1e3)', RVector("double", [0.5, -1000.0], ["x y", "z"])),
+        ("c(a = 1, 2)", RVector("double", [1.0, 2.0], ["a", ""])),
+        (r"c('it\'s')", RVector("character", ["it's"])),
+        ("-Inf", RVector("double", [-math.inf])),
+    ],
+)
+def test_parse_vector(text, expected):
+    assert parse_vector(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "()",
+        "c()",
+        "c'cats', 'dogs')",
+        "c(1,)",
+        "c(1 2)",
+        "c(1))",
+        "c(a = )",
+        "c(1, c(2))",
+        "1:10",
+        "-'a'",
+        "x",
+        "system('rm -rf /')",
+        "c(1, print('hi'))",
+    ],
+)
+def test_parse_vector_err(text):
+    with pytest.raises(ProcessError) as e:
+        parse_vector(text)
+    assert (
+        str(vars(e)["_excinfo"][1])
+        == "RParsingError: Invalid vector format, follow R vector syntax"
+    )
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "c(1961, 1990)",
+        "c('year', 'jday')",
+        "c(annual = 15, monthly =3)",
+        "c(1L, NA)",
+        "c(TRUE, NA)",
+        "c(NA_character_, 'a')",
+        "c(x = 0.1, y = Inf)",
+    ],
+)
+def test_r_vector(text):
+    assert robjects.r["identical"](r_vector(text), robjects.r(text))[0]
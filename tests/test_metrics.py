@@ -0,0 +1,79 @@
+import pytest
+from werkzeug.test import Client
+
+from quail.metrics import (
+    REGISTRY,
+    StepTimer,
+    timed,
+    observe_r_memory,
+    metrics_app,
+)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.parametrize(
+    ("steps", "expected"),
+    [
+        (["start", "load_rdata", "process", "process", "save_rdata"], 4),
+        (["start", "process", "build_output", "complete"], 3),
+    ],
+)
+def test_step_timer(steps, expected):
+    before = {
+        step: sample(
+            "quail_step_duration_seconds_count", process="test_steps", step=step
+        )
+        for step in set(steps)
+    }
+    requests = sample(
+        "quail_request_duration_seconds_count",
+        process="test_steps",
+        status="succeeded",
+    )
+
+    timer = StepTimer("test_steps")
+    for step in steps:
+        timer.step(step)
+    timer.finish("succeeded", 2048)
+
+    counts = {
+        step: sample(
+            "quail_step_duration_seconds_count", process="test_steps", step=step
+        )
+        - before[step]
+        for step in set(steps)
+    }
+    assert sum(counts.values()) == expected
+    assert counts.get("complete", 0) == 0
+    assert all(count <= 1 for count in counts.values())
+    assert (
+        sample(
+            "quail_request_duration_seconds_count",
+            process="test_steps",
+            status="succeeded",
+        )
+        == requests + 1
+    )
+
+
+def test_observe_r_memory():
+    with timed("test_memory"):
+        observe_r_memory(1024**2)
+    assert sample("quail_r_memory_peak_bytes_sum", process="test_memory") == 1024**2
+
+
+def test_metrics_app():
+    StepTimer("test_app").finish("failed", 10)
+    response = Client(metrics_app()).get("/")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert (
+        'quail_request_duration_seconds_count{process="test_app",status="failed"} 1.0'
+        in body
+    )
+    assert 'quail_input_size_bytes_bucket{le="1024.0",process="test_app"} 1.0' in body
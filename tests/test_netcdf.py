@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from rpy2 import robjects
+from netCDF4 import Dataset
+from tempfile import NamedTemporaryFile
+
+from wps_tools.testing import local_path
+from quail.utils import load_rdata
+from quail.netcdf import period_bounds, save_netcdf
+
+
+@pytest.mark.parametrize(
+    ("periods", "calendar", "expected"),
+    [
+        (["1991", "1992"], "standard", [(1991, 1, 1992, 1), (1992, 1, 1993, 1)]),
+        (["1991-11", "1991-12"], "noleap", [(1991, 11, 1991, 12), (1991, 12, 1992, 1)]),
+    ],
+)
+def test_period_bounds(periods, calendar, expected):
+    starts, ends = period_bounds(periods, calendar)
+    assert [
+        (start.year, start.month, end.year, end.month)
+        for start, end in zip(starts, ends)
+    ] == expected
+
+
+@pytest.mark.parametrize(
+    ("r_file"),
+    [local_path("expected_mmdmt_data.rda"), local_path("expected_rxnday.rda")],
+)
+def test_save_netcdf(r_file):
+    env = load_rdata(r_file)
+    vectors = list(env.keys())
+
+    with NamedTemporaryFile(suffix=".nc", dir="/tmp", delete=True) as out_file:
+        save_netcdf(env, vectors, out_file.name)
+
+        with Dataset(out_file.name) as nc:
+            assert nc.Conventions.startswith("CF-")
+            for name in vectors:
+                variable = nc.variables[name]
+                time = nc.variables[variable.dimensions[0]]
+                expected = np.array(robjects.r["as.numeric"](env[name]))
+
+                assert time.bounds in nc.variables
+                assert len(time) == len(expected)
+                assert variable.dtype == np.float64
+                assert np.array_equal(
+                    variable[:].filled(np.nan), expected, equal_nan=True
+                )
@@ -0,0 +1,117 @@
+import pytest
+from rpy2 import robjects
+from tempfile import NamedTemporaryFile
+
+from wps_tools.testing import local_path
+from quail import quantiles
+from quail.cache import LRUCache
+from quail.utils import save_rdata
+from quail.processes.wps_climdexInput_raw import prepare_parameters
+
+
+def build_params(base_range):
+    return {
+        "params": prepare_parameters(
+            tmax_name="ec.1018935.tmax",
+            tmin_name="ec.1018935.tmin",
+            prec_name="ec.1018935.prec",
+            tavg_name="tavg",
+            tmax_column="MAX_TEMP",
+            tmin_column="MIN_TEMP",
+            prec_column="ONE_DAY_PRECIPITATION",
+            tavg_column="mean_temp",
+            date_fields="c('year', 'jday')",
+            date_format="%Y %j",
+            cal="gregorian",
+            prec_file=local_path("ec.1018935.rda"),
+            tavg_file=None,
+            tmax_file=local_path("ec.1018935.rda"),
+            tmin_file=local_path("ec.1018935.rda"),
+        ),
+        "base_range": base_range,
+        "n": 5,
+        "northern_hemisphere": True,
+        "quantiles": "NULL",
+        "temp_qtiles": "c(0.1, 0.9)",
+        "prec_qtiles": "c(0.95, 0.99)",
+        "max_missing_days": "c(annual = 15, monthly = 3)",
+        "min_base_data_fraction_present": 0.1,
+    }
+
+
+@pytest.fixture
+def quantiles_cache(monkeypatch):
+    cache = LRUCache(max_size=64 * 1024 * 1024)
+    monkeypatch.setattr(quantiles, "get_quantiles_cache", lambda: cache)
+    return cache
+
+
+@pytest.mark.parametrize(
+    ("base_range", "other_base_range"),
+    [("c(1971, 2000)", "c(1981, 2000)")],
+)
+def test_baseline_digest(base_range, other_base_range):
+    kwargs = build_params(base_range)
+    digest_args = (
+        kwargs["params"],
+        base_range,
+        kwargs["n"],
+        kwargs["temp_qtiles"],
+        kwargs["prec_qtiles"],
+        kwargs["min_base_data_fraction_present"],
+    )
+    digest = quantiles.baseline_digest(*digest_args)
+
+    assert digest == quantiles.baseline_digest(*digest_args)
+    assert digest != quantiles.baseline_digest(
+        kwargs["params"], other_base_range, *digest_args[2:]
+    )
+
+
+@pytest.mark.parametrize(("base_range"), ["c(1971, 2000)"])
+def test_build_climdex_input_cached(quantiles_cache, base_range):
+    kwargs = build_params(base_range)
+
+    first_ci, first_baseline = quantiles.build_climdex_input(
+        quantiles_file=None, **kwargs
+    )
+    second_ci, second_baseline = quantiles.build_climdex_input(
+        quantiles_file=None, **kwargs
+    )
+
+    assert quantiles_cache.stats()["hits"] == 1
+    assert robjects.r["identical"](first_baseline, second_baseline)[0]
+    assert robjects.r["identical"](
+        robjects.r(quantiles.QUANTILES_LIST)(first_ci.slots["quantiles"]),
+        robjects.r(quantiles.QUANTILES_LIST)(second_ci.slots["quantiles"]),
+    )[0]
+
+
+@pytest.mark.parametrize(
+    ("base_range", "other_base_range"),
+    [("c(1971, 2000)", "c(1981, 2000)")],
+)
+def test_build_climdex_input_file(quantiles_cache, base_range, other_base_range):
+    _, baseline = quantiles.build_climdex_input(
+        quantiles_file=None, **build_params(base_range)
+    )
+
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="quantiles_", dir="/tmp", delete=True
+    ) as quantiles_file:
+        save_rdata(quantiles.QUANTILES_NAME, baseline, quantiles_file.name)
+        digest = robjects.r["attr"](baseline, quantiles.DIGEST_ATTR)[0]
+
+        assert quantiles.read_quantiles(quantiles_file.name, digest) is not None
+        assert quantiles.read_quantiles(quantiles_file.name, "other") is None
+
+        quantiles_cache.clear()
+        _, reused = quantiles.build_climdex_input(
+            quantiles_file=quantiles_file.name, **build_params(base_range)
+        )
+        assert robjects.r["identical"](baseline, reused)[0]
+
+        _, other = quantiles.build_climdex_input(
+            quantiles_file=quantiles_file.name, **build_params(other_base_range)
+        )
+        assert not robjects.r["identical"](baseline, other)[0]
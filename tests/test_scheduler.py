@@ -0,0 +1,177 @@
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pywps.app.WPSRequest import WPSRequest
+from pywps.response.status import WPS_STATUS
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from quail.scheduler import (
+    Scheduler,
+    job,
+    current_job,
+    request_owner,
+    shutdown_async,
+    INTERACTIVE,
+    BACKGROUND,
+)
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def run_after(started, release, ran, name):
+    started.set()
+    release.wait(5)
+    ran.append(name)
+
+
+def schedule(pool, workers, tasks, limits=None):
+    """Runs `tasks` of (queue, owner, priority, name) once a first task holding
+    every worker is released, and returns the names in the order they ran
+    """
+    scheduler = Scheduler(pool.submit, workers, limits or {"build": 1, "index": 1})
+    ran = []
+    started, release = threading.Event(), threading.Event()
+    with job("index", "first"):
+        futures = [scheduler.submit(run_after, started, release, ran, "first")]
+    started.wait(5)
+
+    for queue, owner, priority, name in tasks:
+        with job(queue, owner, priority):
+            futures.append(scheduler.submit(ran.append, name))
+    release.set()
+    wait(futures, timeout=5)
+    return ran[1:]
+
+
+@pytest.mark.parametrize(
+    ("tasks", "expected"),
+    [
+        (
+            [
+                ("index", "a", BACKGROUND, "a1"),
+                ("index", "b", INTERACTIVE, "b1"),
+                ("index", "a", BACKGROUND, "a2"),
+            ],
+            ["b1", "a1", "a2"],
+        ),
+        (
+            [
+                ("index", "a", INTERACTIVE, "a1"),
+                ("index", "a", INTERACTIVE, "a2"),
+                ("index", "a", INTERACTIVE, "a3"),
+                ("index", "b", INTERACTIVE, "b1"),
+            ],
+            ["a1", "b1", "a2", "a3"],
+        ),
+        (
+            [
+                ("index", "a", BACKGROUND, "a1"),
+                ("index", "a", BACKGROUND, "a2"),
+                ("index", "b", BACKGROUND, "b1"),
+                ("index", "c", INTERACTIVE, "c1"),
+                ("index", "b", BACKGROUND, "b2"),
+            ],
+            ["c1", "a1", "b1", "a2", "b2"],
+        ),
+    ],
+)
+def test_scheduler_order(pool, tasks, expected):
+    assert schedule(pool, 1, tasks) == expected
+
+
+def test_scheduler_queue_limit(pool):
+    scheduler = Scheduler(pool.submit, 2, {"build": 1, "index": 2})
+    started, release = threading.Event(), threading.Event()
+    with job("build"):
+        building = scheduler.submit(run_after, started, release, [], "build")
+        waiting = scheduler.submit(len, "build")
+    started.wait(5)
+
+    with job("index"):
+        assert scheduler.submit(len, "index").result(timeout=5) == 5
+    assert building.running()
+    assert not waiting.done()
+
+    release.set()
+    assert waiting.result(timeout=5) == 5
+
+
+def test_scheduler_cancel(pool):
+    ran = []
+    started, release = threading.Event(), threading.Event()
+    scheduler = Scheduler(pool.submit, 1, {"build": 1, "index": 1})
+    first = scheduler.submit(run_after, started, release, ran, "first")
+    cancelled = scheduler.submit(ran.append, "cancelled")
+    last = scheduler.submit(ran.append, "last")
+    started.wait(5)
+
+    assert cancelled.cancel()
+    release.set()
+    wait([first, last], timeout=5)
+    assert ran == ["first", "last"]
+
+
+def test_scheduler_err(pool):
+    scheduler = Scheduler(pool.submit, 1, {"build": 1, "index": 1})
+    with pytest.raises(ZeroDivisionError):
+        scheduler.submit(divmod, 1, 0).result(timeout=5)
+    assert scheduler.submit(divmod, 7, 2).result(timeout=5) == (3, 1)
+
+
+def test_job():
+    assert current_job().queue == "index"
+    with job("build", "user", BACKGROUND):
+        assert current_job().queue == "build"
+        assert current_job().owner == "user"
+        assert current_job().priority == BACKGROUND
+    assert current_job().owner == "anonymous"
+
+    with pytest.raises(ValueError):
+        with job("other"):
+            pass
+
+
+@pytest.mark.parametrize(
+    ("environ", "headers", "expected"),
+    [
+        ({"REMOTE_USER": "user"}, {"X-Forwarded-For": "10.0.0.1"}, "user"),
+        ({}, {"X-Forwarded-For": "10.0.0.1, 10.0.0.2"}, "10.0.0.1"),
+        ({"REMOTE_ADDR": "10.0.0.3"}, {}, "10.0.0.3"),
+    ],
+)
+def test_request_owner(environ, headers, expected):
+    builder = EnvironBuilder(headers=headers, environ_overrides=environ)
+    wps_request = WPSRequest()
+    wps_request.http_request = Request(builder.get_environ())
+    assert request_owner(wps_request) == expected
+    assert request_owner(WPSRequest()) == "anonymous"
+
+
+class Response:
+    def __init__(self):
+        self.statuses = []
+
+    def _update_status(self, status, message, status_percentage):
+        self.statuses.append(status)
+
+
+@pytest.mark.parametrize(
+    ("finished", "expected"), [(True, []), (False, [WPS_STATUS.FAILED])]
+)
+def test_shutdown_async(monkeypatch, finished, expected):
+    release = threading.Event()
+    thread = threading.Thread(target=release.wait, args=(5,), daemon=True)
+    response = Response()
+    monkeypatch.setattr("quail.scheduler._async_runs", {thread: response})
+    thread.start()
+
+    if finished:
+        release.set()
+    shutdown_async(0.5)
+    release.set()
+    assert response.statuses == expected
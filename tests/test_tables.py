@@ -0,0 +1,73 @@
+import os
+import json
+import pytest
+import pyarrow.parquet as pq
+from rpy2 import robjects
+from tempfile import TemporaryDirectory
+
+from wps_tools.testing import local_path
+from quail.utils import load_rdata, OutputWriter
+
+
+@pytest.mark.parametrize(
+    ("output_format", "output", "extension"),
+    [
+        ("rda", "rda_output", ".rda"),
+        ("netcdf", "netcdf_output", ".nc"),
+        ("parquet", "parquet_output", ".parquet"),
+    ],
+)
+def test_output_writer(output_format, output, extension):
+    env = load_rdata(local_path("expected_gsl.rda"))
+
+    with TemporaryDirectory(dir="/tmp") as out_dir:
+        writer = OutputWriter(os.path.join(out_dir, "output.rda"), output_format)
+        for name in env.keys():
+            writer.add("gsl", env[name], 1, name)
+        writer.save()
+
+        assert writer.output == output
+        assert writer.path == os.path.join(out_dir, f"output{extension}")
+        assert os.path.exists(writer.path)
+
+
+@pytest.mark.parametrize(("r_file"), [local_path("expected_gsl.rda")])
+def test_output_writer_json(r_file):
+    env = load_rdata(r_file)
+    writer = OutputWriter("output.rda", "json")
+    for name in env.keys():
+        writer.add("gsl", env[name], 1, name)
+    writer.save()
+
+    content = json.loads(writer.json)
+    assert writer.path is None
+    assert list(content) == [f"gsl1_{name}" for name in env.keys()]
+    for name in env.keys():
+        vector = env[name]
+        assert list(content[f"gsl1_{name}"]) == list(vector.names)
+
+
+@pytest.mark.parametrize(
+    ("r_file"),
+    [local_path("expected_mmdmt_data.rda"), local_path("expected_rxnday.rda")],
+)
+def test_parquet_row_groups(r_file):
+    env = load_rdata(r_file)
+    names = list(env.keys())
+
+    with TemporaryDirectory(dir="/tmp") as out_dir:
+        writer = OutputWriter(os.path.join(out_dir, "output.parquet"), "parquet")
+        for counter, name in enumerate(names, start=1):
+            writer.add(name, env[name], counter, "ci")
+            writer.flush()
+        writer.save()
+
+        parquet_file = pq.ParquetFile(writer.path)
+        table = parquet_file.read().to_pydict()
+
+    assert parquet_file.num_row_groups == len(names)
+    assert table["index"][0] == names[0]
+    assert table["period"][0] == list(env[names[0]].names)[0]
+    assert len(table["value"]) == sum(
+        len(robjects.r["as.numeric"](env[name])) for name in names
+    )
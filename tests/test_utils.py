@@ -1,15 +1,36 @@
 import pytest
+from rpy2 import robjects
 from importlib.resources import files
 from pywps.app.exceptions import ProcessError
 
 from quail.utils import (
     get_ClimdexInputs,
+    get_robj,
+    load_rdata,
     load_rds_ci,
     load_cis,
+    parse_index_spec,
+    rdata_format,
     validate_vectors,
+    NO_CLIMDEX_INPUT,
 )
 
 
+@pytest.mark.parametrize(
+    ("r_file"),
+    [
+        str(files("tests") / "data/climdex_input_multiple.rda"),
+        str(files("tests") / "data/expected_days_data.rda"),
+    ],
+)
+def test_load_rdata(r_file):
+    global_names = set(robjects.r("ls()"))
+    env = load_rdata(r_file)
+
+    assert len(env.keys()) > 0
+    assert set(robjects.r("ls()")) == global_names
+
+
 @pytest.mark.parametrize(
     ("r_file"),
     [
@@ -33,7 +54,22 @@ def test_get_ClimdexInputs(r_file):
 )
 def test_get_ClimdexInputs_err(r_file):
     with pytest.raises(IndexError):
-        cis = get_ClimdexInputs(r_file)
+        get_ClimdexInputs(r_file)
+
+
+@pytest.mark.parametrize(
+    ("object_name", "expected_class"),
+    [
+        ("ec.1018935.tmax", "data.frame"),
+        ("unlist(ec.1018935.tmax['MAX_TEMP'])", "numeric"),
+    ],
+)
+def test_get_robj(object_name, expected_class):
+    global_names = set(robjects.r("ls()"))
+    robj = get_robj(str(files("tests") / "data/ec.1018935.rda"), object_name)
+
+    assert robjects.r["class"](robj)[0] == expected_class
+    assert set(robjects.r("ls()")) == global_names
 
 
 @pytest.mark.parametrize(
@@ -66,16 +102,61 @@ def test_load_cis(r_file):
     ("r_file"),
     [
         str(files("tests") / "data/expected_days_data.rda"),
+        str(files("tests") / "data/expected_gsl.rda"),
+        str(files("tests") / "data/ec.1018935.tmax.rds"),
         str(files("tests") / "data/1018935_MAX_TEMP.csv"),
     ],
 )
 def test_load_cis_err(r_file):
     with pytest.raises(ProcessError) as e:
         load_cis(r_file)
-    assert (
-        str(vars(e)["_excinfo"][1]) == "RRuntimeError: Data file must be a RDS file or "
-        "a Rdata file containing a ClimdexInput object of the given name"
-    )
+    assert str(vars(e)["_excinfo"][1]) == NO_CLIMDEX_INPUT
+
+
+@pytest.mark.parametrize(
+    ("r_file", "r_format"),
+    [
+        (str(files("tests") / "data/climdexInput.rda"), "rdata"),
+        (str(files("tests") / "data/ec.1018935.rda"), "rdata"),
+        (str(files("tests") / "data/climdexInput.rds"), "rds"),
+        (str(files("tests") / "data/bad_file_type.gz"), None),
+        (str(files("tests") / "data/1018935_MAX_TEMP.csv"), None),
+    ],
+)
+def test_rdata_format(r_file, r_format):
+    assert rdata_format(r_file) == r_format
+
+
+@pytest.mark.parametrize(
+    ("spec", "expected"),
+    [
+        ("su", ("su", {}, "su")),
+        ("rnnmm(threshold=15)", ("rnnmm", {"threshold": 15}, "rnnmm_15")),
+        (
+            "rx5day(freq='annual', center_mean_on_last_day=TRUE)",
+            (
+                "rx5day",
+                {"freq": "annual", "center.mean.on.last.day": True},
+                "rx5day_annual_TRUE",
+            ),
+        ),
+        (
+            "wsdi(spells.can.span.years:false)",
+            ("wsdi", {"spells.can.span.years": False}, "wsdi_FALSE"),
+        ),
+    ],
+)
+def test_parse_index_spec(spec, expected):
+    assert parse_index_spec(spec) == expected
+
+
+@pytest.mark.parametrize(
+    ("spec"),
+    ["not_an_index", "su(", "rnnmm(threshold)", "rnnmm(threshold=15,)"],
+)
+def test_parse_index_spec_err(spec):
+    with pytest.raises(ProcessError):
+        parse_index_spec(spec)
 
 
 @pytest.mark.parametrize(
@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+from rpy2 import robjects
+
+from wps_tools.testing import local_path
+from quail.utils import read_cis
+from quail.views import (
+    r_view,
+    ci_data,
+    ci_namasks,
+    ci_jdays,
+    ci_date_factor,
+    views_equal,
+)
+
+
+@pytest.mark.parametrize(
+    ("vector", "dtype"),
+    [
+        (robjects.FloatVector([1.5, 2.5, 3.5]), np.float64),
+        (robjects.IntVector([1, 2, 3]), np.int32),
+        (robjects.BoolVector([True, False, True]), np.int32),
+    ],
+)
+def test_r_view(vector, dtype):
+    view = r_view(vector)
+    assert view.dtype == dtype
+    assert not view.flags.writeable
+    assert np.shares_memory(view, r_view(vector))
+
+    vector[0] = 0
+    assert view[0] == 0
+
+
+def test_r_view_err():
+    with pytest.raises(TypeError):
+        r_view(robjects.StrVector(["a", "b"]))
+
+
+@pytest.mark.parametrize(
+    ("r_file", "freq"),
+    [
+        (local_path("climdexInput.rda"), "annual"),
+        (local_path("climdexInput.rds"), "monthly"),
+    ],
+)
+def test_ci_views(r_file, freq):
+    ci = read_cis(r_file)["ci"]
+    data = ci_data(ci)
+    codes, levels = ci_date_factor(ci, freq)
+    namasks = ci_namasks(ci, freq)
+
+    assert list(data) == list(ci.slots["data"].names)
+    assert all(len(values) == len(codes) for values in data.values())
+    assert len(ci_jdays(ci)) == len(codes)
+    assert codes.min() == 1 and codes.max() == len(levels)
+    assert all(len(mask) == len(levels) for mask in namasks.values())
+    assert np.shares_memory(data["prec"], np.asarray(ci.slots["data"].rx2("prec")))
+
+
+@pytest.mark.parametrize(
+    ("r_file", "same_file"),
+    [(local_path("climdexInput.rda"), local_path("climdexInput.rds"))],
+)
+def test_views_equal(r_file, same_file):
+    ci = read_cis(r_file)["ci"]
+    same_ci = read_cis(same_file)["ci"]
+    for slot in ["data", "namasks", "dates", "jdays", "date.factors"]:
+        assert views_equal(ci.slots[slot], same_ci.slots[slot])
+
+    changed = robjects.r("function(ci) { ci@data$prec[1] <- -1; ci }")(ci)
+    assert not views_equal(ci.slots["data"], changed.slots["data"])
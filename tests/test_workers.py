@@ -0,0 +1,136 @@
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from importlib.resources import files
+from pywps.app.exceptions import ProcessError
+
+from quail import workers, utils
+from quail.cache import LRUCache, file_digest
+from quail.utils import compute_index, NO_CLIMDEX_INPUT
+from quail.workers import run_in_worker, map_in_workers, shutdown_pool
+
+
+@pytest.fixture(params=[0, 1, 2])
+def r_workers(request, monkeypatch):
+    monkeypatch.setattr(workers, "pool_size", lambda: request.param)
+    yield request.param
+    shutdown_pool()
+
+
+def test_run_in_worker_pid(r_workers):
+    pid = run_in_worker(os.getpid)
+    if r_workers:
+        assert pid != os.getpid()
+    else:
+        assert pid == os.getpid()
+
+
+@pytest.mark.parametrize(
+    ("r_file", "func"),
+    [
+        (str(files("tests") / "data/climdexInput.rda"), "climdex.su"),
+        (str(files("tests") / "data/climdex_input_multiple.rda"), "climdex.sdii"),
+    ],
+)
+def test_run_in_worker(r_workers, r_file, func):
+    results = run_in_worker(compute_index, r_file, func)
+    assert len(results) > 0
+    for result in results.values():
+        assert len(result) > 0
+
+
+def test_run_in_worker_err(r_workers):
+    with pytest.raises(ProcessError) as e:
+        run_in_worker(
+            compute_index, str(files("tests") / "data/expected_gsl.rda"), "climdex.su"
+        )
+    assert str(vars(e)["_excinfo"][1]) == NO_CLIMDEX_INPUT
+
+
+def test_map_in_workers(r_workers):
+    r_files = [
+        str(files("tests") / "data/climdexInput.rda"),
+        str(files("tests") / "data/climdexInput.rds"),
+        str(files("tests") / "data/climdex_input_multiple.rda"),
+    ]
+    results = dict(map_in_workers(compute_index, r_files, "climdex.su"))
+
+    assert sorted(results) == [0, 1, 2]
+    assert results[1].keys() == {"ci"}
+    assert len(results[2]) > 1
+
+
+def test_map_in_workers_err(r_workers):
+    r_files = [
+        str(files("tests") / "data/climdexInput.rda"),
+        str(files("tests") / "data/expected_gsl.rda"),
+    ]
+    with pytest.raises(ProcessError) as e:
+        list(map_in_workers(compute_index, r_files, "climdex.su"))
+    assert str(vars(e)["_excinfo"][1]) == NO_CLIMDEX_INPUT
+
+
+def test_warm_up(r_workers, monkeypatch):
+    get_config_value = workers.configuration.get_config_value
+    monkeypatch.setattr(
+        workers.configuration,
+        "get_config_value",
+        lambda section, option, default="": (
+            True if option == "warm_up" else get_config_value(section, option, default)
+        ),
+    )
+    workers.warm_up()
+
+    if r_workers:
+        assert len(workers.get_pool()._processes) == r_workers
+    else:
+        assert workers._pool is None
+
+
+def test_preload(monkeypatch):
+    r_file = str(files("tests") / "data/climdexInput.rda")
+    cache = LRUCache(max_size=512 * 1024 * 1024)
+    monkeypatch.setattr(utils, "get_ci_cache", lambda: cache)
+    monkeypatch.setattr(workers, "preload_files", lambda: [r_file])
+    monkeypatch.setattr(workers, "pool_size", lambda: 0)
+    workers.preload()
+
+    assert file_digest(r_file) in cache
+
+
+def test_preload_err(monkeypatch):
+    monkeypatch.setattr(workers, "pool_size", lambda: 2)
+    with pytest.raises(ValueError):
+        workers.preload()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_call_r_memory(monkeypatch, enabled):
+    monkeypatch.setattr(workers, "r_memory_enabled", lambda: enabled)
+    result, peak = workers._call(os.getpid)
+
+    assert result == os.getpid()
+    assert (peak is not None) == enabled
+
+
+def lock_free(lock):
+    """Returns whether another thread can take `lock`"""
+
+    def try_lock():
+        if not lock.acquire(blocking=False):
+            return False
+        lock.release()
+        return True
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(try_lock).result()
+
+
+def test_server_r():
+    lock = workers.r_lock()
+    with workers.server_r():
+        assert not lock_free(lock)
+        with workers.waiting_for_workers():
+            assert lock_free(lock)
+        assert not lock_free(lock)
+    assert lock_free(lock)
@@ -1,3 +1,5 @@
+import sys
+import subprocess
 from pywps import Service
 
 from .common import client_for
@@ -11,10 +13,13 @@ def test_wps_caps():
         "/wps:Capabilities" "/wps:ProcessOfferings" "/wps:Process" "/ows:Identifier"
     )
     assert sorted(names.split()) == [
+        "climdex_batch",
         "climdex_days",
         "climdex_dtr",
         "climdex_get_available_indices",
+        "climdex_gridded",
         "climdex_gsl",
+        "climdex_input_append",
         "climdex_input_csv",
         "climdex_input_raw",
         "climdex_mmdmt",
@@ -26,3 +31,12 @@ def test_wps_caps():
         "climdex_spells",
         "climdex_temp_pctl",
     ]
+
+
+def test_processes_import_without_r():
+    # Capabilities and descriptions must not need R to be started
+    code = "import sys, quail.processes; print('rpy2.robjects' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
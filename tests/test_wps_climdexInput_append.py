@@ -0,0 +1,170 @@
+import pytest
+from rpy2 import robjects
+from tempfile import NamedTemporaryFile
+
+from wps_tools.testing import run_wps_process, process_err_test
+from quail.utils import save_rdata
+from quail.processes.wps_climdexInput_csv import climdex_input_csv
+from quail.processes.wps_climdexInput_append import (
+    ClimdexInputAppend,
+    climdex_input_append,
+)
+
+
+COLUMNS = {
+    "tmax_column": "MAX_TEMP",
+    "tmin_column": "MIN_TEMP",
+    "prec_column": "ONE_DAY_PRECIPITATION",
+    "tavg_column": "tavg",
+}
+
+
+def split_content(content, year):
+    """Splits CSV content into the rows before `year` and the rows from
+    `year` on, each with the header
+    """
+    header, *rows = content.splitlines()
+    before = [row for row in rows if int(row.split(",")[0]) < year]
+    after = [row for row in rows if int(row.split(",")[0]) >= year]
+    return "\n".join([header] + before), "\n".join([header] + after)
+
+
+def build_ci(data_contents, base_range):
+    ci, _ = climdex_input_csv(
+        data_contents,
+        COLUMNS,
+        base_range,
+        "gregorian",
+        "c('year', 'jday')",
+        "%Y %j",
+        5,
+        "NULL",
+        True,
+        "NULL",
+        "c(0.1, 0.9)",
+        "c(0.95, 0.99)",
+        "c(annual = 15, monthly = 3)",
+        0.1,
+        None,
+    )
+    return ci
+
+
+def build_params(
+    climdex_input,
+    tmax_file_content,
+    tmin_file_content,
+    prec_file_content,
+    vector_name,
+    output_file,
+):
+    return (
+        f"climdex_input=@xlink:href={climdex_input};"
+        f"ci_name=ci;"
+        f"tmax_file_content={tmax_file_content};"
+        f"tmin_file_content={tmin_file_content};"
+        f"prec_file_content={prec_file_content};"
+        f"tmax_column={COLUMNS['tmax_column']};"
+        f"tmin_column={COLUMNS['tmin_column']};"
+        f"prec_column={COLUMNS['prec_column']};"
+        f"output_file={output_file};"
+        f"vector_name={vector_name};"
+    )
+
+
+@pytest.mark.parametrize(
+    ("split_year", "base_range"),
+    [(2004, "c(1971, 2000)"), (2003, "c(1971, 2000)")],
+)
+def test_climdex_input_append(
+    tmax_file_content, tmin_file_content, prec_file_content, split_year, base_range
+):
+    contents = {
+        "tmax": tmax_file_content,
+        "tmin": tmin_file_content,
+        "prec": prec_file_content,
+    }
+    old = {
+        var: split_content(content, split_year)[0] for var, content in contents.items()
+    }
+    new = {
+        var: split_content(content, split_year)[1] for var, content in contents.items()
+    }
+
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="ci_", dir="/tmp", delete=True
+    ) as ci_file:
+        save_rdata("ci", build_ci(old, base_range), ci_file.name)
+        appended = climdex_input_append(
+            ci_file.name, "ci", new, COLUMNS, "c('year', 'jday')", "%Y %j", "NULL"
+        )
+
+    expected = build_ci(contents, base_range)
+    for slot in ["data", "namasks", "dates", "jdays", "date.factors"]:
+        assert robjects.r["identical"](appended.slots[slot], expected.slots[slot])[0]
+
+
+@pytest.mark.parametrize(
+    ("split_year", "base_range", "vector_name"),
+    [(2004, "c(1971, 2000)", "climdexInput")],
+)
+def test_wps_climdexInput_append(
+    tmax_file_content,
+    tmin_file_content,
+    prec_file_content,
+    split_year,
+    base_range,
+    vector_name,
+):
+    contents = [tmax_file_content, tmin_file_content, prec_file_content]
+    old = [split_content(content, split_year)[0] for content in contents]
+    new = [split_content(content, split_year)[1] for content in contents]
+
+    with (
+        NamedTemporaryFile(
+            suffix=".rda", prefix="ci_", dir="/tmp", delete=True
+        ) as ci_file,
+        NamedTemporaryFile(
+            suffix=".rda", prefix="output_", dir="/tmp", delete=True
+        ) as out_file,
+    ):
+        save_rdata(
+            "ci",
+            build_ci(dict(zip(["tmax", "tmin", "prec"], old)), base_range),
+            ci_file.name,
+        )
+        datainputs = build_params(ci_file.name, *new, vector_name, out_file.name)
+        run_wps_process(ClimdexInputAppend(), datainputs)
+
+
+@pytest.mark.parametrize(
+    ("split_year", "base_range", "vector_name"),
+    [(2000, "c(1971, 2000)", "climdexInput")],
+)
+def test_wps_climdexInput_append_base_period_err(
+    tmax_file_content,
+    tmin_file_content,
+    prec_file_content,
+    split_year,
+    base_range,
+    vector_name,
+):
+    contents = [tmax_file_content, tmin_file_content, prec_file_content]
+    old = [split_content(content, split_year)[0] for content in contents]
+    new = [split_content(content, split_year)[1] for content in contents]
+
+    with (
+        NamedTemporaryFile(
+            suffix=".rda", prefix="ci_", dir="/tmp", delete=True
+        ) as ci_file,
+        NamedTemporaryFile(
+            suffix=".rda", prefix="output_", dir="/tmp", delete=True
+        ) as out_file,
+    ):
+        save_rdata(
+            "ci",
+            build_ci(dict(zip(["tmax", "tmin", "prec"], old)), base_range),
+            ci_file.name,
+        )
+        datainputs = build_params(ci_file.name, *new, vector_name, out_file.name)
+        process_err_test(ClimdexInputAppend, datainputs)
@@ -1,8 +1,10 @@
+import numpy as np
 import pytest
 from tempfile import NamedTemporaryFile
+from pywps.app.exceptions import ProcessError
 
 from wps_tools.testing import run_wps_process, process_err_test
-from quail.processes.wps_climdexInput_csv import ClimdexInputCSV
+from quail.processes.wps_climdexInput_csv import ClimdexInputCSV, read_csv_content
 
 
 def build_params(
@@ -162,3 +164,30 @@ def test_wps_climdexInput_csv_syntax_err(
             out_file.name,
         )
         process_err_test(ClimdexInputCSV, datainputs)
+
+
+def test_read_csv_content():
+    content = (
+        "year,jday,MAX_TEMP,flags\n"
+        "1959,325,11.7,\n"
+        "1959,326,,M\n"
+        ",327,12.5,\n"
+        "1959,328,-99,\n"
+        "1959,329,10.2,\n"
+        "\n"
+    )
+    values, dates = read_csv_content(
+        content, "MAX_TEMP", ["year", "jday"], "-99", "tmax"
+    )
+    assert np.array_equal(values, [11.7, np.nan, np.nan, 10.2], equal_nan=True)
+    assert dates == ["1959 325", "1959 326", "1959 328", "1959 329"]
+
+
+@pytest.mark.parametrize(
+    ("column", "date_fields"),
+    [("FAKE_COLUMN", ["year", "jday"]), ("MAX_TEMP", ["year", "month", "day"])],
+)
+def test_read_csv_content_err(column, date_fields):
+    content = "year,jday,MAX_TEMP,flags\n1959,325,11.7,\n"
+    with pytest.raises(ProcessError):
+        read_csv_content(content, column, date_fields, "NULL", "tmax")
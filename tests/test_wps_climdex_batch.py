@@ -0,0 +1,86 @@
+import pytest
+from tempfile import NamedTemporaryFile
+
+from wps_tools.testing import local_path, run_wps_process, process_err_test
+from quail.processes.wps_climdex_batch import ClimdexBatch
+from .common import build_file_input
+
+
+def build_params(climdex_input, indices, output_file, output_format="rda"):
+    return (
+        f"{build_file_input(climdex_input)}"
+        f"{''.join(f'indices={index};' for index in indices)}"
+        f"output_file={output_file};"
+        f"output_format={output_format};"
+    )
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "indices"),
+    [
+        (local_path("climdexInput.rda"), ["su", "id", "fd", "tr"]),
+        (
+            local_path("climdexInput.rds"),
+            ["rx1day(freq:annual)", "rx5day(freq:monthly)", "rnnmm(threshold:15)"],
+        ),
+        (
+            [
+                local_path("climdexInput.rds"),
+                local_path("climdexInput.rda"),
+                local_path("climdex_input_multiple.rda"),
+            ],
+            ["su", "wsdi(spells_can_span_years:TRUE)", "gsl", "sdii"],
+        ),
+    ],
+)
+def test_wps_climdex_batch(climdex_input, indices):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(climdex_input, indices, out_file.name)
+        run_wps_process(ClimdexBatch(), datainputs)
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "indices"),
+    [
+        (
+            [local_path("climdexInput.rds"), local_path("climdex_input_multiple.rda")],
+            ["su", "rx5day(freq:monthly)", "gsl"],
+        ),
+    ],
+)
+def test_wps_climdex_batch_netcdf(climdex_input, indices):
+    with NamedTemporaryFile(
+        suffix=".nc", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(climdex_input, indices, out_file.name, "netcdf")
+        run_wps_process(ClimdexBatch(), datainputs)
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "indices"),
+    [(local_path("climdexInput.rda"), ["su", "rx1day(freq:annual)"])],
+)
+def test_wps_climdex_batch_json(climdex_input, indices):
+    datainputs = build_params(climdex_input, indices, "output.rda", "json")
+    run_wps_process(ClimdexBatch(), datainputs)
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "indices"),
+    [
+        (local_path("expected_days_data.rda"), ["su"]),
+        (local_path("bad_file_type.gz"), ["su", "id"]),
+        (local_path("climdexInput.rda"), ["su", "not_an_index"]),
+        (local_path("climdexInput.rda"), ["su", "su"]),
+        (local_path("climdexInput.rda"), ["rnnmm(threshold)"]),
+        (local_path("climdexInput.rda"), ["su(not_an_argument:1)"]),
+    ],
+)
+def test_wps_climdex_batch_err(climdex_input, indices):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(climdex_input, indices, out_file.name)
+        process_err_test(ClimdexBatch, datainputs)
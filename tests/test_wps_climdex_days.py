@@ -6,10 +6,11 @@ from quail.processes.wps_climdex_days import ClimdexDays
 from .common import build_file_input
 
 
-def build_params(climdex_input, days_type, output_file):
+def build_params(climdex_input, days_type, output_file, engine="R"):
     return (
         f"{build_file_input(climdex_input)}"
         f"days_type={days_type};"
+        f"engine={engine};"
         f"output_file={output_file};"
     )
 
@@ -51,6 +52,28 @@ def test_wps_climdex_days(climdex_input, days_type):
         run_wps_process(ClimdexDays(), datainputs)
 
 
+@pytest.mark.parametrize(
+    ("climdex_input", "days_type"),
+    [
+        (local_path("climdexInput.rda"), "su"),
+        (local_path("climdexInput.rds"), "tr"),
+        (
+            [
+                local_path("climdexInput.rds"),
+                local_path("climdex_input_multiple.rda"),
+            ],
+            "fd",
+        ),
+    ],
+)
+def test_wps_climdex_days_numpy(climdex_input, days_type):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(climdex_input, days_type, out_file.name, "numpy")
+        run_wps_process(ClimdexDays(), datainputs)
+
+
 @pytest.mark.parametrize(
     ("climdex_input", "days_type"),
     [
@@ -1,10 +1,13 @@
+import re
 import pytest
 from rpy2 import robjects
 from itertools import chain
 from tempfile import NamedTemporaryFile
 
 from wps_tools.testing import run_wps_process, local_path, process_err_test
+from quail.processes import processes, index_processes
 from quail.processes.wps_climdex_get_available_indices import GetIndices
+from quail.utils import CLIMDEX_INDICES
 
 
 @pytest.mark.parametrize(
@@ -58,3 +61,16 @@ def test_available_processes(avail_indices):
 
     for index in avail_indices:
         assert index in values
+
+
+@pytest.mark.parametrize(
+    "process", processes, ids=[process.identifier for process in processes]
+)
+def test_index_processes(process):
+    module = type(process).__module__.split(".")[-1]
+    documented = [
+        index
+        for index in re.findall(r"climdex\.([a-zA-Z0-9]*)", type(process).__doc__)
+        if index in CLIMDEX_INDICES
+    ]
+    assert index_processes.get(module, []) == documented
@@ -0,0 +1,48 @@
+import pytest
+from tempfile import NamedTemporaryFile
+
+from wps_tools.testing import local_path, run_wps_process, process_err_test
+from quail.processes.wps_climdex_gridded import ClimdexGridded
+
+
+def build_params(netcdf_file, indices, output_file, extra=""):
+    return (
+        f"netcdf_file=@xlink:href={netcdf_file};"
+        f"{''.join(f'indices={index};' for index in indices)}"
+        "base_range=c(1991, 2000);"
+        f"output_file={output_file};"
+        f"{extra}"
+    )
+
+
+@pytest.mark.parametrize(
+    ("netcdf_file", "indices", "extra"),
+    [
+        (local_path("gridded.nc"), ["su", "prcptot"], ""),
+        (local_path("gridded.nc"), ["txx(freq:annual)", "tn10p"], "chunk_size=1;"),
+        (local_path("gridded.nc"), ["rx5day(freq:monthly)", "gsl"], "chunk_size=3;"),
+    ],
+)
+def test_wps_climdex_gridded(netcdf_file, indices, extra):
+    with NamedTemporaryFile(
+        suffix=".nc", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(netcdf_file, indices, out_file.name, extra)
+        run_wps_process(ClimdexGridded(), datainputs)
+
+
+@pytest.mark.parametrize(
+    ("netcdf_file", "indices", "extra"),
+    [
+        (local_path("climdexInput.rda"), ["su"], ""),
+        (local_path("gridded.nc"), ["su", "su"], ""),
+        (local_path("gridded.nc"), ["su"], "tasmax_var=tas;"),
+        (local_path("gridded.nc"), ["su"], "chunk_size=0;"),
+    ],
+)
+def test_wps_climdex_gridded_err(netcdf_file, indices, extra):
+    with NamedTemporaryFile(
+        suffix=".nc", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(netcdf_file, indices, out_file.name, extra)
+        process_err_test(ClimdexGridded, datainputs)
@@ -53,3 +53,25 @@ def test_wps_climdex_ptot_err(climdex_input, threshold):
     ) as out_file:
         datainputs = build_params(climdex_input, threshold, out_file.name)
         process_err_test(ClimdexPtot, datainputs)
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "threshold", "previous_output"),
+    [
+        (local_path("climdexInput.rda"), 95, local_path("expected_ptot.rda")),
+        (
+            [local_path("climdexInput.rda"), local_path("climdexInput.rds")],
+            None,
+            local_path("expected_ptot.rda"),
+        ),
+    ],
+)
+def test_wps_climdex_ptot_incremental(climdex_input, threshold, previous_output):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = (
+            f"{build_params(climdex_input, threshold, out_file.name)}"
+            f"previous_output=@xlink:href={previous_output};"
+        )
+        run_wps_process(ClimdexPtot(), datainputs)
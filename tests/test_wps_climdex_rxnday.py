@@ -6,10 +6,11 @@ from quail.processes.wps_climdex_rxnday import ClimdexRxnday
 from .common import build_file_input
 
 
-def build_params(climdex_input, freq, num_days, output_file):
+def build_params(climdex_input, freq, num_days, output_file, engine="R"):
     return (
         f"{build_file_input(climdex_input)};"
         f"num_days={num_days};"
+        f"engine={engine};"
         f"output_file={output_file};"
     )
 
@@ -40,6 +41,28 @@ def test_wps_climdex_rxnday(climdex_input, freq, num_days):
         run_wps_process(ClimdexRxnday(), datainputs)
 
 
+@pytest.mark.parametrize(
+    ("climdex_input", "freq", "num_days"),
+    [
+        (local_path("climdexInput.rda"), "annual", 1),
+        (
+            [
+                local_path("climdexInput.rds"),
+                local_path("climdex_input_multiple.rda"),
+            ],
+            "monthly",
+            5,
+        ),
+    ],
+)
+def test_wps_climdex_rxnday_numpy(climdex_input, freq, num_days):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(climdex_input, freq, num_days, out_file.name, "numpy")
+        run_wps_process(ClimdexRxnday(), datainputs)
+
+
 @pytest.mark.parametrize(
     ("climdex_input", "freq", "num_days"),
     [
@@ -43,3 +43,18 @@ def test_wps_climdex_sdii_err(climdex_input):
     ) as out_file:
         datainputs = build_params(climdex_input, out_file.name)
         process_err_test(ClimdexSDII, datainputs)
+
+
+@pytest.mark.parametrize(
+    ("climdex_input", "previous_output"),
+    [(local_path("climdexInput.rda"), local_path("expected_sdii.rda"))],
+)
+def test_wps_climdex_sdii_incremental(climdex_input, previous_output):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = (
+            f"{build_params(climdex_input, out_file.name)}"
+            f"previous_output=@xlink:href={previous_output};"
+        )
+        run_wps_process(ClimdexSDII(), datainputs)
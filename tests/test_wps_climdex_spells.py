@@ -6,11 +6,12 @@ from quail.processes.wps_climdex_spells import ClimdexSpells
 from .common import build_file_input
 
 
-def build_params(climdex_input, func, span_years, output_file):
+def build_params(climdex_input, func, span_years, output_file, engine="R"):
     return (
         f"{build_file_input(climdex_input)}"
         f"func={func};"
         f"span_years={span_years};"
+        f"engine={engine};"
         f"output_file={output_file};"
     )
 
@@ -46,6 +47,31 @@ def test_wps_climdex_spells(climdex_input, func, span_years):
         run_wps_process(ClimdexSpells(), datainputs)
 
 
+@pytest.mark.parametrize(
+    ("climdex_input", "func", "span_years"),
+    [
+        (local_path("climdexInput.rda"), "wsdi", True),
+        (local_path("climdexInput.rds"), "cdd", False),
+        (
+            [
+                local_path("climdexInput.rds"),
+                local_path("climdex_input_multiple.rda"),
+            ],
+            "csdi",
+            False,
+        ),
+    ],
+)
+def test_wps_climdex_spells_numpy(climdex_input, func, span_years):
+    with NamedTemporaryFile(
+        suffix=".rda", prefix="output_", dir="/tmp", delete=True
+    ) as out_file:
+        datainputs = build_params(
+            climdex_input, func, span_years, out_file.name, "numpy"
+        )
+        run_wps_process(ClimdexSpells(), datainputs)
+
+
 @pytest.mark.parametrize(
     ("climdex_input", "func", "span_years"),
     [